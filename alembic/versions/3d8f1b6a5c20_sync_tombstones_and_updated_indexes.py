@@ -0,0 +1,55 @@
+"""sync tombstones and updated indexes
+
+Tombstone table and indexes on the updated columns for the delta sync endpoint.
+
+Revision ID: 3d8f1b6a5c20
+Revises: 5b1e8f3c2a47
+Create Date: 2026-10-19 10:08:12.403518
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3d8f1b6a5c20"
+down_revision: str | None = "5b1e8f3c2a47"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "tombstone",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("table_name", sa.String(length=50), nullable=False),
+        sa.Column("word_id", sa.Integer(), nullable=True),
+        sa.Column("description_id", sa.Integer(), nullable=True),
+        sa.Column("deleted", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_tombstone_deleted"), "tombstone", ["deleted"], unique=False
+    )
+    op.create_index(op.f("ix_word_updated"), "word", ["updated"], unique=False)
+    op.create_index(
+        op.f("ix_description_updated"), "description", ["updated"], unique=False
+    )
+    op.create_index(
+        op.f("ix_word_description_updated"),
+        "word_description",
+        ["updated"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_word_description_updated"), table_name="word_description")
+    op.drop_index(op.f("ix_description_updated"), table_name="description")
+    op.drop_index(op.f("ix_word_updated"), table_name="word")
+    op.drop_index(op.f("ix_tombstone_deleted"), table_name="tombstone")
+    op.drop_table("tombstone")
@@ -0,0 +1,34 @@
+"""word_description on delete cascade
+
+Revision ID: 9c4d2e7a1f60
+Revises: 3d8f1b6a5c20
+Create Date: 2026-10-19 10:24:43.512930
+
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9c4d2e7a1f60"
+down_revision: str | None = "3d8f1b6a5c20"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def _recreate_foreign_keys(ondelete: str | None) -> None:
+    for column, table in (("word_id", "word"), ("description_id", "description")):
+        name = f"word_description_{column}_fkey"
+        op.drop_constraint(name, "word_description", type_="foreignkey")
+        op.create_foreign_key(
+            name, "word_description", table, [column], ["id"], ondelete=ondelete
+        )
+
+
+def upgrade() -> None:
+    _recreate_foreign_keys(ondelete="CASCADE")
+
+
+def downgrade() -> None:
+    _recreate_foreign_keys(ondelete=None)
@@ -0,0 +1,68 @@
+"""compact word_description
+
+Composite (word_id, description_id) primary key instead of the surrogate id,
+reverse (description_id, word_id) index, no updated column.
+
+Revision ID: e2a7c41b9d03
+Revises: 9c4d2e7a1f60
+Create Date: 2026-10-19 13:02:17.846215
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e2a7c41b9d03"
+down_revision: str | None = "9c4d2e7a1f60"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.drop_index("ix_word_description_updated", table_name="word_description")
+    op.drop_constraint("word_description_pkey", "word_description", type_="primary")
+    op.drop_constraint("word_description_id_key", "word_description", type_="unique")
+    op.drop_column("word_description", "id")
+    op.drop_column("word_description", "updated")
+    # The unique index on (word_id, description_id) becomes the primary key
+    op.drop_index("idx_unique_word_description", table_name="word_description")
+    op.create_primary_key(
+        "word_description_pkey", "word_description", ["word_id", "description_id"]
+    )
+    op.create_index(
+        "idx_word_description_reverse",
+        "word_description",
+        ["description_id", "word_id"],
+    )
+    op.create_index(
+        op.f("ix_word_description_created"), "word_description", ["created"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_word_description_created"), table_name="word_description")
+    op.drop_index("idx_word_description_reverse", table_name="word_description")
+    op.drop_constraint("word_description_pkey", "word_description", type_="primary")
+    op.create_index(
+        "idx_unique_word_description",
+        "word_description",
+        ["word_id", "description_id"],
+        unique=True,
+    )
+    op.add_column("word_description", sa.Column("updated", sa.DateTime()))
+    op.execute("UPDATE word_description SET updated = created")
+    # SERIAL fills the id of the existing rows
+    op.execute("ALTER TABLE word_description ADD COLUMN id SERIAL NOT NULL")
+    op.create_unique_constraint("word_description_id_key", "word_description", ["id"])
+    op.create_primary_key(
+        "word_description_pkey",
+        "word_description",
+        ["id", "word_id", "description_id"],
+    )
+    op.create_index(
+        op.f("ix_word_description_updated"), "word_description", ["updated"]
+    )
@@ -0,0 +1,83 @@
+"""
+Benchmark of the application startup: import time of dictionary.main plus time
+to the first response (lifespan startup and the first request), measured in fresh
+Python processes.
+
+NOTE: Uses the database set for the current ENV_STATE (it must be migrated \
+if SCHEMA_CHECK is 'verify').
+
+Usage: python -m dictionary.benchmarks.startup --runs 5 --path /words/all
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+
+def measure_once(path: str) -> dict:
+    "Runs in a fresh process - returns startup timings (in ms)."
+    start = time.perf_counter()
+    from dictionary.main import app
+
+    imported = time.perf_counter()
+
+    from fastapi.testclient import TestClient
+
+    client_imported = time.perf_counter()
+    with TestClient(app) as client:
+        started = time.perf_counter()
+        client.get(path).raise_for_status()
+        first_response = time.perf_counter()
+        client.get(path).raise_for_status()
+        second_response = time.perf_counter()
+
+    return {
+        "import_ms": (imported - start) * 1000,
+        "lifespan_startup_ms": (started - client_imported) * 1000,
+        "first_request_ms": (first_response - started) * 1000,
+        "second_request_ms": (second_response - first_response) * 1000,
+        "time_to_first_response_ms": (
+            (imported - start) + (first_response - client_imported)
+        )
+        * 1000,
+    }
+
+
+def run(runs: int, path: str) -> dict:
+    results = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-m", __spec__.name, "--child", "--path", path],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    return {
+        "runs": runs,
+        "path": path,
+        **{
+            key: {
+                "median": round(statistics.median(r[key] for r in results), 2),
+                "max": round(max(r[key] for r in results), 2),
+            }
+            for key in results[0]
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/words/all")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_once(args.path)))
+    else:
+        print(json.dumps(run(args.runs, args.path), indent=2))
@@ -1,21 +1,148 @@
+import os
 from functools import lru_cache
-from typing import Optional
 
-from pydantic_settings import BaseSettings, SettingsConfigDict
+from dotenv import dotenv_values
+from pydantic_settings import BaseSettings, DotEnvSettingsSource, SettingsConfigDict
+from pydantic_settings.sources.utils import parse_env_vars
 
+from dictionary.enums import LogFormat, ProfileMode, SchemaCheck, TraceExporter
 
-class BaseConfig(BaseSettings):
-    ENV_STATE: Optional[str] = None
 
-    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+@lru_cache()
+def read_env_file(path: str = ".env") -> dict[str, str | None]:
+    "Returns the variables of the .env file - the file is read once per process."
+    return dotenv_values(path)
+
+
+class EnvFileSettingsSource(DotEnvSettingsSource):
+    "Settings source of the already read .env file variables."
+
+    def _load_env_vars(self):
+        return parse_env_vars(
+            read_env_file(),
+            self.case_sensitive,
+            self.env_ignore_empty,
+            self.env_parse_none_str,
+        )
+
+
+class BaseConfig(BaseSettings):
+    ENV_STATE: str | None = None
+
+    # NOTE: No env_file - pydantic-settings would read it for each config class, \
+    # the variables of the .env file are passed by EnvFileSettingsSource instead
+    model_config = SettingsConfigDict(extra="ignore")
+
+    @classmethod
+    def settings_customise_sources(
+        cls,
+        settings_cls,
+        init_settings,
+        env_settings,
+        dotenv_settings,
+        file_secret_settings,
+    ):
+        # Same priority as the default .env source (below the environment)
+        return (
+            init_settings,
+            env_settings,
+            EnvFileSettingsSource(settings_cls),
+            file_secret_settings,
+        )
 
 
 class GlobalConfig(BaseConfig):
-    DATABASE_URL: Optional[str] = None
+    DATABASE_URL: str | None = None
     DB_FORCE_ROLL_BACK: bool = False
+    # PRAGMAs set on each connection of the SQLite backend (see dictionary/sqlite.py)
+    SQLITE_PRAGMAS: dict[str, str | int] = {
+        "journal_mode": "wal",
+        # Durable on application crashes, the last commits may be lost on power loss
+        "synchronous": "normal",
+        "busy_timeout": 5000,
+        # In KiB if negative
+        "cache_size": -32000,
+        "temp_store": "memory",
+        "mmap_size": 268435456,
+    }
+
+    # Format of the log files (console logs are always colored text)
+    LOG_FORMAT: LogFormat = LogFormat.TEXT
+    # Logging handlers run in a background thread (QueueHandler/QueueListener)
+    LOG_QUEUE_ENABLED: bool = True
+    # Maximum number of items/characters of large debug payloads in log messages
+    LOG_PAYLOAD_MAX_ITEMS: int = 20
+    LOG_PAYLOAD_MAX_CHARS: int = 1000
+
+    # The sync token is moved back by this time (in seconds) - changes of write
+    # transactions that started before a sync and committed after it are older
+    # than its token. Such changes (and all others in the window) are returned
+    # again by the next sync, so it must exceed the longest write transaction.
+    SYNC_OVERLAP_SECONDS: float = 60.0
+
+    # Database schema check on application startup (see dictionary/migrations.py)
+    SCHEMA_CHECK: SchemaCheck = SchemaCheck.VERIFY
+
+    # SQL profiler (see dictionary/profiler.py) - for all requests or only for
+    # requests with the X-SQL-Profile header (the header is ignored if disabled)
+    SQL_PROFILER_ENABLED: bool = False
+    SQL_PROFILER_HEADER_ENABLED: bool = False
+    # Executions of the same statement within a request reported as N+1
+    SQL_PROFILER_N_PLUS_ONE_THRESHOLD: int = 5
+    # Number of the last profiles available at GET /debug/sql
+    SQL_PROFILER_HISTORY: int = 100
+
+    # Queries running longer are logged (None disables the slow query log), with
+    # EXPLAIN (ANALYZE, BUFFERS) of the first slow execution of each SELECT
+    # (see dictionary/slow_queries.py)
+    SLOW_QUERY_THRESHOLD_MS: float | None = 200.0
+    SLOW_QUERY_EXPLAIN: bool = False
+
+    # Profiling of single requests (see dictionary/profiling.py) - all requests
+    # or those with the X-Profile header (with X-Profile-Token if the token is set)
+    REQUEST_PROFILING_ENABLED: bool = False
+    REQUEST_PROFILING_MODES: list[ProfileMode] = [ProfileMode.CPU]
+    REQUEST_PROFILING_HEADER_ENABLED: bool = False
+    REQUEST_PROFILING_TOKEN: str | None = None
+    # Directory of the .pstats files and allocation reports
+    REQUEST_PROFILING_DIR: str = "profiles"
+    # Number of lines with the largest allocations in the report
+    REQUEST_PROFILING_TOP_N: int = 25
+
+    # Tracing spans of the requests, queries and serialization exported as JSON
+    # lines, without a collector (see dictionary/tracing.py)
+    TRACING_ENABLED: bool = False
+    TRACING_EXPORTER: TraceExporter = TraceExporter.CONSOLE
+    TRACING_FILE: str = "traces.jsonl"
+
+    # Compression of the list endpoints responses (in bytes)
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    GZIP_LEVEL: int = 6
+    BROTLI_QUALITY: int = 4
+
+    # Number of orphan descriptions deleted (and committed) at once
+    ORPHAN_SWEEP_BATCH_SIZE: int = 1000
+
+    # Write-behind buffer of the study updates (master level changes).
+    # Buffered updates are flushed every FLUSH_INTERVAL_MS or when MAX_ITEMS words
+    # are pending - up to that many updates are lost if the process crashes.
+    WRITE_BEHIND_ENABLED: bool = False
+    WRITE_BEHIND_FLUSH_INTERVAL_MS: int = 500
+    WRITE_BEHIND_MAX_ITEMS: int = 500
+    # Failed flushes in a row after which updates are written directly
+    WRITE_BEHIND_MAX_FAILED_FLUSHES: int = 3
+
+    # Snapshot of the dictionary loaded on startup (see dictionary/snapshot.py) -
+    # read-only endpoints are served from it if the database is unavailable
+    SNAPSHOT_FILE: str | None = None
+    # State of the shuffle (recent words) saved on shutdown and restored on startup
+    SHUFFLE_STATE_FILE: str | None = None
 
 
 class DevConfig(GlobalConfig):
+    SQL_PROFILER_HEADER_ENABLED: bool = True
+    REQUEST_PROFILING_HEADER_ENABLED: bool = True
+
     model_config = SettingsConfigDict(env_prefix="DEV_")
 
 
@@ -25,6 +152,15 @@ class ProdConfig(GlobalConfig):
 
 class TestConfig(GlobalConfig):
     DB_FORCE_ROLL_BACK: bool = True
+    # Log records written synchronously (in the order of the test steps)
+    LOG_QUEUE_ENABLED: bool = False
+    # The test database schema is created by the tests fixtures
+    SCHEMA_CHECK: SchemaCheck = SchemaCheck.SKIP
+    SQL_PROFILER_HEADER_ENABLED: bool = True
+    REQUEST_PROFILING_HEADER_ENABLED: bool = True
+    # Spans kept in memory if enabled (dictionary/tests/test_tracing.py enables
+    # tracing for its tests only - the ORM results are buffered when traced)
+    TRACING_EXPORTER: TraceExporter = TraceExporter.MEMORY
 
     model_config = SettingsConfigDict(env_prefix="TEST_")
 
@@ -35,4 +171,5 @@ def get_config(env_state: str):
     return configs[env_state]()
 
 
-config = get_config(BaseConfig().ENV_STATE)
+# ENV_STATE from .env file only if not set in the environment
+config = get_config(os.environ.get("ENV_STATE") or BaseConfig().ENV_STATE)
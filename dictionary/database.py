@@ -1,23 +1,149 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+import asyncio
+import weakref
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager, nullcontext
+
+from sqlalchemy import Connection, Engine, RootTransaction, create_engine, event
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
 
 from dictionary.config import config
+from dictionary.sqlite import setup_sqlite
+from dictionary.tracing import traced
 
 # Setting the database
-# Note: if using postgresql (like here), the database must be created in postgresql first
+# Note: if using postgresql (like here), the database must be created in postgresql first,
+# a sqlite database file is created on the first connection (see dictionary/sqlite.py)
 database_url = config.DATABASE_URL
 
 engine = create_engine(database_url)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+if engine.dialect.name == "sqlite":
+    setup_sqlite(engine, config.SQLITE_PRAGMAS)
+
+
+class ForcedRollback:
+    """One connection with an outer transaction which is never committed.
+    Sessions made by calling the object are bound to the connection and join the
+    transaction with savepoints (their commits only release the savepoints),
+    everything written through them since the last rollback() is discarded.
+    The connection is opened by the first session (not on import).
+    NOTE: The sessions share one connection - their savepoints must end in the \
+        reverse order, so they can not be used concurrently. Sessions of the \
+        requests (get_db) wait for each other (see lock()), RuntimeError is raised \
+        when a savepoint of other sessions ends before the later ones. All their \
+        writes are visible to each other before the rollback.
+    """
+
+    def __init__(self, bind: Engine):
+        self.bind = bind
+        self._connection: Connection | None = None
+        self.transaction: RootTransaction | None = None
+        # One lock per event loop (asyncio locks are bound to their loop)
+        self._locks: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    @property
+    def connection(self) -> Connection:
+        if self._connection is None:
+            self._connection = self.bind.connect()
+            event.listen(self._connection, "release_savepoint", self._end_savepoint)
+            event.listen(self._connection, "rollback_savepoint", self._end_savepoint)
+            self.transaction = self._connection.begin()
+        return self._connection
+
+    def __call__(self) -> Session:
+        return Session(
+            bind=self.connection,
+            autoflush=False,
+            join_transaction_mode="create_savepoint",
+        )
+
+    def lock(self) -> asyncio.Lock:
+        "Lock held by each request while it uses its session (one at a time)."
+        return self._locks.setdefault(asyncio.get_running_loop(), asyncio.Lock())
+
+    def _end_savepoint(self, connection: Connection, name: str, context):
+        # Ending a savepoint also ends the later ones (of the other sessions)
+        innermost = connection.get_nested_transaction()
+        if innermost is not None and innermost._savepoint != name:
+            raise RuntimeError(
+                f"Savepoint {name} ended while {innermost._savepoint} is open - "
+                "sessions of the forced rollback mode share one connection and "
+                "can not be used concurrently."
+            )
+
+    def rollback(self):
+        "Discards all changes and begins a new outer transaction."
+        if self._connection is None:
+            return
+        self.transaction.rollback()
+        self.transaction = self._connection.begin()
+
+    def close(self):
+        if self._connection is None:
+            return
+        self.transaction.rollback()
+        self._connection.close()
+        self._connection = None
+
+
+# DB_FORCE_ROLL_BACK (tests) - all sessions run in one outer transaction, which
+# is rolled back instead of committed (see dictionary/tests/conftest.py)
+forced_rollback = ForcedRollback(engine) if config.DB_FORCE_ROLL_BACK else None
+
+if forced_rollback:
+    SessionLocal = forced_rollback
+else:
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
 
 # Creating a database connection
 async def get_db():
-    db = SessionLocal()
+    # Requests share one connection in the forced rollback mode - one at a time
+    async with forced_rollback.lock() if forced_rollback else nullcontext():
+        with traced("get_db"):
+            db = SessionLocal()
+        try:
+            yield db
+        finally:
+            with traced("get_db.close"):
+                db.close()
+
+
+@contextmanager
+def sandbox(bind: Engine = engine) -> Iterator[Callable[[], Session]]:
+    """Yields a session factory for dry runs - the sessions work as usual (their
+    commits included), but nothing is saved: all changes are rolled back at
+    the end."""
+    rollback = ForcedRollback(bind)
     try:
-        yield db
+        yield rollback
     finally:
-        db.close()
+        rollback.close()
+
+
+@contextmanager
+def single_transaction(db: Session, rollback: bool = False) -> Iterator[Session]:
+    """Yields a new session running in one transaction on the bind of the given
+    session. Each commit made with the yielded session only releases a savepoint,
+    the transaction is committed at the end (or rolled back on exception or
+    if rollback is set - dry run)."""
+    bind = db.get_bind()
+    # Sessions of the forced rollback mode (and sandbox) are bound to a connection
+    # already in the outer transaction - the transaction is a savepoint on it
+    connect = nullcontext(bind) if isinstance(bind, Connection) else bind.connect()
+    with connect as connection:
+        if connection.in_transaction():
+            transaction = connection.begin_nested()
+        else:
+            # Write transaction - BEGIN IMMEDIATE on SQLite (see dictionary/sqlite.py)
+            transaction = connection.execution_options(sqlite_begin="IMMEDIATE").begin()
+        with transaction:
+            session = Session(bind=connection, join_transaction_mode="create_savepoint")
+            try:
+                yield session
+            finally:
+                session.close()
+            if rollback:
+                transaction.rollback()
@@ -44,3 +44,55 @@ class MasterLevel(str, Enum):
     MEDIUM = "medium", 0.8
     PERFECT = "prefect", 0.3
     HARD = "hard", 1.5
+
+
+class ConflictAction(str, Enum):
+    UPDATE = "update"
+    NOTHING = "nothing"
+
+
+class UpsertStatus(str, Enum):
+    CREATED = "created"
+    UPDATED = "updated"
+    UNCHANGED = "unchanged"
+
+
+class LinkStatus(str, Enum):
+    LINKED = "linked"
+    ALREADY_LINKED = "already_linked"
+    UNLINKED = "unlinked"
+    NOT_LINKED = "not_linked"
+    WORD_NOT_FOUND = "word_not_found"
+    DESCRIPTION_NOT_FOUND = "description_not_found"
+
+
+class BatchOperationType(str, Enum):
+    ADD_WORD = "add_word"
+    UPDATE_WORD = "update_word"
+    DELETE_WORD = "delete_word"
+    ADD_DESCRIPTION = "add_description"
+    ASSIGN_DESCRIPTION = "assign_description"
+    UPDATE_DESCRIPTION = "update_description"
+    DELETE_DESCRIPTION = "delete_description"
+
+
+class SchemaCheck(str, Enum):
+    VERIFY = "verify"  # database must be migrated to the Alembic head revision
+    CREATE = "create"  # missing tables are created (no migrations, dev only)
+    SKIP = "skip"
+
+
+class LogFormat(str, Enum):
+    TEXT = "text"
+    JSON = "json"  # one JSON object per line
+
+
+class ProfileMode(str, Enum):
+    CPU = "cpu"  # cProfile (.pstats file)
+    MEMORY = "memory"  # tracemalloc (top allocations report)
+
+
+class TraceExporter(str, Enum):
+    CONSOLE = "console"  # JSON lines on stdout
+    FILE = "file"  # JSON lines appended to TRACING_FILE
+    MEMORY = "memory"  # the last spans kept in memory (tests)
@@ -0,0 +1,113 @@
+"""
+Per-request statistics (request ID, database time and number of queries) kept
+in a context variable and collected with SQLAlchemy engine events.
+"""
+
+import re
+import time
+import uuid
+from collections.abc import Callable
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.default import CACHE_HIT, CACHE_MISS
+from starlette.types import Scope
+
+from dictionary.metrics import CACHE_REQUESTS, DB_QUERY_DURATION
+from dictionary.profiler import SqlProfile
+
+# Request IDs given by the clients (X-Request-ID) - also used in file names
+# (see dictionary/profiling.py), other IDs are replaced with generated ones
+REQUEST_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,128}")
+
+# Results of the SQL compilation cache lookups (statements without a cache key
+# and raw SQL strings are not counted)
+SQL_CACHE_RESULTS = {CACHE_HIT: "hit", CACHE_MISS: "miss"}
+
+
+def valid_request_id(request_id: str | None) -> bool:
+    return bool(request_id and REQUEST_ID_PATTERN.fullmatch(request_id))
+
+
+def route_template(scope: Scope) -> str | None:
+    "Returns the path template of the matched route (e.g. /words/{word_id})."
+    return getattr(scope.get("route"), "path", None)
+
+
+@dataclass
+class RequestStats:
+    "Statistics of the request being processed."
+
+    request_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    db_time: float = 0.0  # in seconds
+    db_queries: int = 0
+    # Set only if the request is profiled (see dictionary/profiler.py)
+    profile: SqlProfile | None = None
+    # ASGI scope of the request (the matched route is set on it by the router)
+    scope: Scope | None = field(default=None, repr=False)
+
+    @property
+    def route(self) -> str | None:
+        "Route template of the request (its path if no route matched)."
+        if self.scope is None:
+            return None
+        return route_template(self.scope) or self.scope["path"]
+
+
+request_stats: ContextVar[RequestStats | None] = ContextVar(
+    "request_stats", default=None
+)
+
+
+def current_request_id() -> str | None:
+    "Returns ID of the request being processed (None outside of requests)."
+    stats = request_stats.get()
+    return stats.request_id if stats else None
+
+
+def _operation(statement: str) -> str:
+    "Returns the SQL command of the statement (e.g. SELECT, INSERT)."
+    words = statement.split(None, 1)
+    return words[0].upper() if words else "UNKNOWN"
+
+
+# Called after each query with: connection, statement, parameters, duration
+# (in seconds) and executemany flag (e.g. the slow query log)
+query_hooks: list[Callable[..., None]] = []
+
+
+# Listening on the Engine class - queries of all engines (also the tests ones)
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append((context, time.perf_counter()))
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()[1]
+    DB_QUERY_DURATION.observe(elapsed, operation=_operation(statement))
+    cache_result = SQL_CACHE_RESULTS.get(getattr(context, "cache_hit", None))
+    if cache_result:
+        CACHE_REQUESTS.inc(cache="sql_compilation", result=cache_result)
+    stats = request_stats.get()
+    if stats:
+        stats.db_time += elapsed
+        stats.db_queries += 1
+        if stats.profile is not None:
+            stats.profile.record(statement, elapsed)
+    for hook in query_hooks:
+        hook(conn, statement, parameters, elapsed, executemany)
+
+
+@event.listens_for(Engine, "handle_error")
+def _failed_cursor_execute(exception_context):
+    """Drops the start time of the failed query (it would stay on the pooled
+    connection forever).
+    NOTE: Errors raised before before_cursor_execute or after after_cursor_execute \
+        (e.g. while fetching rows) have no start time of their own."""
+    connection = exception_context.connection
+    starts = connection.info.get("query_start") if connection is not None else None
+    if starts and starts[-1][0] is exception_context.execution_context:
+        starts.pop()
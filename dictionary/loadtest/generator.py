@@ -0,0 +1,197 @@
+"""
+Generator of a synthetic dictionary for load tests: N words with a mix of master
+levels, each with a configurable number of descriptions (fan-out), part of them
+shared by many words. All rows are inserted with bulk INSERTs (in batches).
+
+NOTE: Inserts into the database set for the current ENV_STATE and commits. \
+Words and descriptions get the --prefix, so they do not collide with existing \
+records (the same prefix can not be generated twice). With --dry-run all \
+inserts are rolled back at the end (e.g. to measure the insert time only).
+
+Usage: python -m dictionary.loadtest.generator --words 20000 --fan-out 2 \
+--shared 0.2 --levels new=4,medium=3,hard=2,prefect=1
+"""
+
+import argparse
+import json
+import random
+import time
+from collections.abc import Iterator
+from contextlib import nullcontext
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from dictionary.database import SessionLocal, sandbox
+from dictionary.enums import MasterLevel, WordTypes
+from dictionary.models import Description, Word, WordDescription
+
+SYLLABLES = (
+    ("ba", "be", "bi", "bo", "bu", "ca", "ce", "co", "da", "de", "di", "do")
+    + ("fa", "fe", "fi", "fo", "ga", "ge", "go", "ha", "he", "hi", "ka", "ke")
+    + ("ko", "la", "le", "li", "lo", "lu", "ma", "me", "mi", "mo", "mu", "na")
+    + ("ne", "ni", "no", "pa", "pe", "pi", "po", "ra", "re", "ri", "ro", "sa")
+    + ("se", "si", "so", "ta", "te", "ti", "to", "tu", "va", "ve", "vi", "wa")
+    + ("we", "za", "ze", "zo", "ch", "sh", "th", "st", "tr", "pl", "gr")
+)
+
+DEFAULT_LEVEL_MIX = {
+    MasterLevel.NEW: 4,
+    MasterLevel.MEDIUM: 3,
+    MasterLevel.HARD: 2,
+    MasterLevel.PERFECT: 1,
+}
+
+
+def parse_level_mix(text: str) -> dict[MasterLevel, float]:
+    "Parses 'new=4,hard=1' into weights of the master levels."
+    mix = {}
+    for item in text.split(","):
+        level, _, weight = item.partition("=")
+        mix[MasterLevel(level.strip())] = float(weight)
+    return mix
+
+
+def fake_text(rng: random.Random, words: int) -> str:
+    return " ".join(
+        "".join(rng.choices(SYLLABLES, k=rng.randint(1, 4))) for _ in range(words)
+    )
+
+
+def batched(rows: list, size: int) -> Iterator[list]:
+    for start in range(0, len(rows), size):
+        yield rows[start : start + size]
+
+
+def insert_returning_ids(db: Session, model, rows: list[dict], batch_size: int):
+    "Inserts rows in batches, returns IDs in the order of the rows."
+    ids = []
+    for batch in batched(rows, batch_size):
+        ids.extend(
+            db.scalars(
+                insert(model).returning(model.id, sort_by_parameter_order=True), batch
+            )
+        )
+    return ids
+
+
+def generate(
+    db: Session,
+    words: int,
+    fan_out: float = 2.0,
+    shared: float = 0.2,
+    level_mix: dict[MasterLevel, float] | None = None,
+    prefix: str = "lt",
+    batch_size: int = 5000,
+    seed: int | None = None,
+) -> dict:
+    """Inserts the words, descriptions and their associations.
+    fan_out - average number of descriptions of a word,
+    shared - fraction of the associations pointing to descriptions shared by
+    many words (e.g. common translations).
+    Returns summary of the generated data."""
+    rng = random.Random(seed)
+    level_mix = level_mix or DEFAULT_LEVEL_MIX
+    start = time.perf_counter()
+
+    levels = rng.choices(list(level_mix), weights=list(level_mix.values()), k=words)
+    word_rows = [
+        {
+            # Every tenth entry is a sentence
+            "word": f"{prefix}{i} {fake_text(rng, 6 if i % 10 == 0 else 1)}",
+            "master_level": level,
+            "notes": fake_text(rng, 3) if rng.random() < 0.1 else None,
+        }
+        for i, level in enumerate(levels)
+    ]
+    # Number of descriptions of each word: 1 to 2 * fan_out - 1 (fan_out on average)
+    fan_outs = [rng.randint(1, max(1, round(2 * fan_out - 1))) for _ in range(words)]
+    links = sum(fan_outs)
+    shared_links = round(links * shared)
+    # Shared descriptions are used by ~5 words each
+    shared_count = max(1, shared_links // 5) if shared_links else 0
+    own_count = links - shared_links
+
+    types = list(WordTypes)
+    description_rows = [
+        {
+            "type": rng.choice(types),
+            "in_polish": f"{prefix}{i} {fake_text(rng, rng.randint(1, 4))}",
+            "in_english": fake_text(rng, 3) if rng.random() < 0.5 else None,
+            "example": fake_text(rng, 8) if rng.random() < 0.3 else None,
+        }
+        for i in range(shared_count + own_count)
+    ]
+
+    word_ids = insert_returning_ids(db, Word, word_rows, batch_size)
+    description_ids = insert_returning_ids(
+        db, Description, description_rows, batch_size
+    )
+    shared_ids, own_ids = description_ids[:shared_count], description_ids[shared_count:]
+
+    # Shared links are spread over random words, the own descriptions fill the rest
+    pairs = set()
+    slots = [
+        word_id for word_id, count in zip(word_ids, fan_outs) for _ in range(count)
+    ]
+    rng.shuffle(slots)
+    own = iter(own_ids)
+    for index, word_id in enumerate(slots):
+        if index < shared_links:
+            pairs.add((word_id, rng.choice(shared_ids)))
+        else:
+            pairs.add((word_id, next(own)))
+    association_rows = [
+        {"word_id": word_id, "description_id": description_id}
+        for word_id, description_id in pairs
+    ]
+    for batch in batched(association_rows, batch_size):
+        db.execute(insert(WordDescription), batch)
+    db.commit()
+
+    return {
+        "words": len(word_ids),
+        "descriptions": len(description_ids),
+        "shared_descriptions": shared_count,
+        "associations": len(association_rows),
+        "levels": {level.value: levels.count(level) for level in level_mix},
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--words", type=int, default=10_000)
+    parser.add_argument(
+        "--fan-out", type=float, default=2.0, help="descriptions per word on average"
+    )
+    parser.add_argument(
+        "--shared", type=float, default=0.2, help="fraction of shared associations"
+    )
+    parser.add_argument(
+        "--levels",
+        type=parse_level_mix,
+        default=DEFAULT_LEVEL_MIX,
+        help="weights of the master levels, e.g. new=4,medium=3,hard=2,prefect=1",
+    )
+    parser.add_argument("--prefix", default="lt")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--dry-run", action="store_true", help="save nothing")
+    args = parser.parse_args()
+
+    with (
+        sandbox() if args.dry_run else nullcontext(SessionLocal) as session_factory,
+        session_factory() as db,
+    ):
+        summary = generate(
+            db,
+            args.words,
+            fan_out=args.fan_out,
+            shared=args.shared,
+            level_mix=args.levels,
+            prefix=args.prefix,
+            batch_size=args.batch_size,
+            seed=args.seed,
+        )
+    print(json.dumps(summary, indent=2))
@@ -0,0 +1,222 @@
+"""
+Runner of the load test scenarios (see dictionary/loadtest/scenarios.py) - drives
+the workload with concurrent async HTTP clients and reports throughput and latency
+percentiles per endpoint as JSON.
+
+The application is tested either running (--url) or in-process through ASGI
+(--in-process, no server, uses the database set for the current ENV_STATE).
+Fill the database first with: python -m dictionary.loadtest.generator
+
+Usage: python -m dictionary.loadtest.runner --scenario mixed --concurrency 20 \
+--duration 30 --url http://localhost:8000
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from collections import defaultdict
+
+import httpx
+
+from dictionary.loadtest.scenarios import SCENARIOS, Dataset, Operation
+
+
+def percentile(values: list[float], percent: float) -> float:
+    "Returns the percentile of the sorted values (nearest-rank method)."
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(percent / 100 * len(values)))
+    return values[rank - 1]
+
+
+async def load_dataset(client: httpx.AsyncClient) -> Dataset:
+    "Reads IDs of the words and descriptions used to build the requests."
+    words = (await client.get("/words/all", params={"fields": "id,word"})).json()
+    descriptions = (
+        await client.get("/descriptions/all", params={"fields": "id"})
+    ).json()
+    return Dataset(
+        word_ids=[word["id"] for word in words["words"]],
+        words=[word["word"] for word in words["words"]],
+        description_ids=[
+            description["id"] for description in descriptions["descriptions"]
+        ],
+    )
+
+
+class Results:
+    def __init__(self):
+        # Latencies (in seconds) and status codes per operation name
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.statuses: dict[str, dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.errors: dict[str, int] = defaultdict(int)
+
+    def record(self, name: str, latency: float, status: int | None):
+        self.latencies[name].append(latency)
+        if status is None:
+            self.errors[name] += 1
+        else:
+            self.statuses[name][status] += 1
+            if status >= 500:
+                self.errors[name] += 1
+
+    @staticmethod
+    def summary(latencies: list[float], errors: int, elapsed: float) -> dict:
+        latencies = sorted(latencies)
+        return {
+            "requests": len(latencies),
+            "errors": errors,
+            "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+            "latency_ms": {
+                "mean": round(sum(latencies) / len(latencies) * 1000, 3)
+                if latencies
+                else 0.0,
+                **{
+                    f"p{p}": round(percentile(latencies, p) * 1000, 3)
+                    for p in (50, 90, 95, 99)
+                },
+                "max": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+            },
+        }
+
+    def report(self, elapsed: float) -> dict:
+        return {
+            "total": self.summary(
+                [latency for values in self.latencies.values() for latency in values],
+                sum(self.errors.values()),
+                elapsed,
+            ),
+            "endpoints": {
+                name: {
+                    **self.summary(latencies, self.errors[name], elapsed),
+                    "statuses": dict(sorted(self.statuses[name].items())),
+                }
+                for name, latencies in sorted(self.latencies.items())
+            },
+        }
+
+
+async def _worker(
+    client: httpx.AsyncClient,
+    operations: list[Operation],
+    data: Dataset,
+    results: Results,
+    rng: random.Random,
+    deadline: float,
+    remaining: list[int],
+):
+    weights = [operation.weight for operation in operations]
+    while time.perf_counter() < deadline and remaining[0] != 0:
+        remaining[0] -= 1
+        (operation,) = rng.choices(operations, weights=weights)
+        request = operation.build(rng, data)
+        start = time.perf_counter()
+        try:
+            response = await client.request(
+                request.method, request.url, params=request.params, json=request.json
+            )
+            await response.aread()
+            status = response.status_code
+        except httpx.HTTPError:
+            status = None
+        results.record(operation.name, time.perf_counter() - start, status)
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    scenario: str,
+    concurrency: int = 10,
+    duration: float = 10.0,
+    requests: int | None = None,
+    warmup: float = 0.0,
+    seed: int | None = None,
+) -> dict:
+    """Runs the scenario with concurrency workers for duration seconds (or until
+    the requests are sent). Requests sent during warmup are not reported.
+    Returns the report (throughput and latency percentiles per endpoint)."""
+    operations = SCENARIOS[scenario]
+    data = await load_dataset(client)
+    if not data.word_ids:
+        raise ValueError("No words in the database - run the generator first.")
+    rng = random.Random(seed)
+
+    async def run(results: Results, seconds: float, count: int | None) -> float:
+        remaining = [count if count is not None else -1]
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(
+                _worker(
+                    client,
+                    operations,
+                    data,
+                    results,
+                    random.Random(rng.random()),
+                    start + seconds,
+                    remaining,
+                )
+                for _ in range(concurrency)
+            )
+        )
+        return time.perf_counter() - start
+
+    if warmup:
+        await run(Results(), warmup, None)
+
+    results = Results()
+    elapsed = await run(results, duration if requests is None else math.inf, requests)
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 2),
+        "dataset": {
+            "words": len(data.word_ids),
+            "descriptions": len(data.description_ids),
+        },
+        **results.report(elapsed),
+    }
+
+
+async def main(args: argparse.Namespace) -> dict:
+    if args.in_process:
+        from dictionary.main import app
+
+        transport = httpx.ASGITransport(app=app)
+        base_url = "http://loadtest"
+    else:
+        transport = None
+        base_url = args.url
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(
+        transport=transport, base_url=base_url, limits=limits, timeout=args.timeout
+    ) as client:
+        return await run_scenario(
+            client,
+            args.scenario,
+            concurrency=args.concurrency,
+            duration=args.duration,
+            requests=args.requests,
+            warmup=args.warmup,
+            seed=args.seed,
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--scenario", choices=list(SCENARIOS), default="mixed")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=30.0, help="in seconds")
+    parser.add_argument(
+        "--requests", type=int, default=None, help="stop after that many requests"
+    )
+    parser.add_argument("--warmup", type=float, default=0.0, help="in seconds")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--in-process", action="store_true")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(main(args)), indent=2))
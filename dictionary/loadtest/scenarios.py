@@ -0,0 +1,151 @@
+"""
+Workloads of the load tests - each scenario is a weighted mix of operations.
+An operation builds one request from the dataset (IDs and words read from
+the application before the run).
+"""
+
+import random
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+from dictionary.enums import MasterLevel
+
+
+@dataclass
+class Dataset:
+    "Records of the tested application used to build the requests."
+
+    word_ids: list[int]
+    words: list[str]
+    description_ids: list[int]
+    # Counter of the words created by the write operations
+    created: int = 0
+
+    def search_phrase(self, rng: random.Random) -> str:
+        "Returns a part of an existing word (as typed in a search box)."
+        word = rng.choice(self.words).split()[-1]
+        start = rng.randint(0, max(0, len(word) - 3))
+        return word[start : start + rng.randint(3, 5)]
+
+
+@dataclass
+class Request:
+    method: str
+    url: str
+    params: dict = field(default_factory=dict)
+    json: dict | None = None
+
+
+@dataclass
+class Operation:
+    # Name under which the results are reported (method and route template)
+    name: str
+    weight: float
+    build: Callable[[random.Random, Dataset], Request]
+
+
+def _levels(rng: random.Random) -> str:
+    return rng.choice(list(MasterLevel)).value
+
+
+def _new_word(rng: random.Random, data: Dataset) -> dict:
+    data.created += 1
+    return {
+        "word": f"loadtest {rng.getrandbits(48):x} {data.created}",
+        "master_level": _levels(rng),
+    }
+
+
+RANDOM_WORD = Operation(
+    "GET /shuffle/random_word",
+    8,
+    lambda rng, data: Request("GET", "/shuffle/random_word"),
+)
+RANDOM_DESCRIPTION = Operation(
+    "GET /shuffle/random_desc",
+    2,
+    lambda rng, data: Request("GET", "/shuffle/random_desc"),
+)
+STUDY_LEVEL = Operation(
+    "PATCH /shuffle/level/{word_id}",
+    3,
+    lambda rng, data: Request(
+        "PATCH",
+        f"/shuffle/level/{rng.choice(data.word_ids)}",
+        params={"level": _levels(rng)},
+    ),
+)
+SEARCH = Operation(
+    "GET /words/translations?search",
+    6,
+    lambda rng, data: Request(
+        "GET", "/words/translations", params={"search": data.search_phrase(rng)}
+    ),
+)
+TRANSLATIONS = Operation(
+    "GET /words/translations?word_id",
+    2,
+    lambda rng, data: Request(
+        "GET", "/words/translations", params={"word_id": rng.choice(data.word_ids)}
+    ),
+)
+SINGLE_WORD = Operation(
+    "GET /words/single/{word_id}",
+    2,
+    lambda rng, data: Request("GET", f"/words/single/{rng.choice(data.word_ids)}"),
+)
+ALL_WORDS = Operation(
+    "GET /words/all", 3, lambda rng, data: Request("GET", "/words/all")
+)
+ALL_DESCRIPTIONS = Operation(
+    "GET /descriptions/all", 2, lambda rng, data: Request("GET", "/descriptions/all")
+)
+ALL_DICT_DATA = Operation(
+    "GET /words/descriptions",
+    1,
+    lambda rng, data: Request("GET", "/words/descriptions"),
+)
+SYNC = Operation("GET /sync", 1, lambda rng, data: Request("GET", "/sync"))
+UPSERT_WORD = Operation(
+    "PUT /words/upsert",
+    3,
+    lambda rng, data: Request("PUT", "/words/upsert", json=_new_word(rng, data)),
+)
+UPDATE_NOTES = Operation(
+    "PATCH /words/update/{word_id}",
+    2,
+    lambda rng, data: Request(
+        "PATCH",
+        f"/words/update/{rng.choice(data.word_ids)}",
+        json={"notes": f"load test note {rng.getrandbits(32):x}"},
+    ),
+)
+BULK_LEVELS = Operation(
+    "PATCH /words/levels",
+    1,
+    lambda rng, data: Request(
+        "PATCH",
+        "/words/levels",
+        json={
+            "levels": {
+                word_id: _levels(rng)
+                for word_id in rng.sample(data.word_ids, min(50, len(data.word_ids)))
+            }
+        },
+    ),
+)
+
+SCENARIOS: dict[str, list[Operation]] = {
+    "shuffle": [RANDOM_WORD, RANDOM_DESCRIPTION, STUDY_LEVEL],
+    "search": [SEARCH, TRANSLATIONS, SINGLE_WORD],
+    "bulk_list": [ALL_WORDS, ALL_DESCRIPTIONS, ALL_DICT_DATA, SYNC],
+    "write": [UPSERT_WORD, UPDATE_NOTES, STUDY_LEVEL, BULK_LEVELS],
+}
+# Operations of all the scenarios, each once (with its own weight)
+SCENARIOS["mixed"] = list(
+    {
+        operation.name: operation
+        for operations in SCENARIOS.values()
+        for operation in operations
+    }.values()
+)
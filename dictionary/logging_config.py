@@ -1,8 +1,18 @@
+import atexit
+import datetime
 import logging
 import os
+import queue
+from collections.abc import Sequence
 from logging.config import dictConfig
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any
+
+import orjson
 
 from dictionary.config import DevConfig, TestConfig, config
+from dictionary.enums import LogFormat
+from dictionary.instrumentation import current_request_id
 
 
 class ColoredFormatter(logging.Formatter):
@@ -61,7 +71,127 @@ class ColoredFormatter(logging.Formatter):
         return msg
 
 
+class JSONFormatter(logging.Formatter):
+    """Formats a record as one JSON line. Structured fields passed with
+    extra={"fields": {...}} (e.g. request timings) are added as top-level keys."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.datetime.fromtimestamp(
+                record.created, datetime.timezone.utc
+            ).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "location": f"{record.filename}:{record.lineno}",
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return orjson.dumps(entry, default=str).decode()
+
+
+class RequestIdFilter(logging.Filter):
+    """Adds ID of the request being processed to the record.
+    NOTE: Must run in the thread logging the record (before a QueueHandler)."""
+
+    def filter(self, record):
+        if not hasattr(record, "request_id"):
+            record.request_id = current_request_id()
+        return True
+
+
+class Capped:
+    """Wraps a large debug payload (e.g. list of all words) passed as a logging
+    argument. The payload is rendered only if the record is emitted and is capped
+    to LOG_PAYLOAD_MAX_ITEMS items and LOG_PAYLOAD_MAX_CHARS characters."""
+
+    __slots__ = ("payload", "max_items", "max_chars")
+
+    def __init__(
+        self,
+        payload: Any,
+        max_items: int | None = None,
+        max_chars: int | None = None,
+    ):
+        self.payload = payload
+        self.max_items = (
+            max_items if max_items is not None else config.LOG_PAYLOAD_MAX_ITEMS
+        )
+        self.max_chars = (
+            max_chars if max_chars is not None else config.LOG_PAYLOAD_MAX_CHARS
+        )
+
+    def __str__(self) -> str:
+        payload = self.payload
+        if isinstance(payload, dict):
+            payload = list(payload.items())
+        if isinstance(payload, Sequence) and not isinstance(payload, str):
+            if len(payload) > self.max_items:
+                text = "%s ... (%s items in total)" % (
+                    list(payload[: self.max_items]),
+                    len(payload),
+                )
+            else:
+                text = str(self.payload)
+        else:
+            text = str(payload)
+
+        if len(text) > self.max_chars:
+            text = "%s ... (%s characters in total)" % (
+                text[: self.max_chars],
+                len(text),
+            )
+        return text
+
+    __repr__ = __str__
+
+
+_queue_listener: QueueListener | None = None
+
+
+def _use_queue(logger: logging.Logger) -> None:
+    """Replaces handlers of the logger with a QueueHandler. The original handlers
+    are run by QueueListener in its own thread (off the event loop)."""
+    global _queue_listener
+
+    log_queue = queue.SimpleQueue()
+    _queue_listener = QueueListener(
+        log_queue, *logger.handlers, respect_handler_level=True
+    )
+    queue_handler = QueueHandler(log_queue)
+    # Records no handler would emit are dropped before QueueHandler.prepare()
+    # formats them in the logging thread
+    queue_handler.setLevel(
+        min((handler.level for handler in logger.handlers), default=logging.NOTSET)
+    )
+    queue_handler.addFilter(RequestIdFilter())
+    logger.handlers = [queue_handler]
+    _queue_listener.start()
+
+
+def stop_logging() -> None:
+    "Stops the queue listener (if running) after handling all queued records."
+    global _queue_listener
+
+    if _queue_listener:
+        _queue_listener.stop()
+        _queue_listener = None
+
+
+atexit.register(stop_logging)
+
+
 def configure_logging() -> None:
+    # Handling records queued so far before the handlers are replaced
+    stop_logging()
+
+    file_formatter = "json" if config.LOG_FORMAT == LogFormat.JSON else None
+
     dictConfig(
         {
             "version": 1,
@@ -82,34 +212,46 @@ def configure_logging() -> None:
                     "datefmt": "%Y-%m-%dT%H:%M:%S",
                     "format": "%(asctime)s %(msecs)03d %(levelname)s %(name)s %(filename)s %(lineno)s >>> [%(message)s]",
                 },
+                "json": {
+                    "()": JSONFormatter,
+                },
                 "test": {
                     "class": "logging.Formatter",
                     "datefmt": "%Y-%m-%d %H:%M:%S",
                     "format": "%(asctime)s.%(msecs)03dZ - %(levelname)8s - TEST - %(name)s - %(filename)s:%(lineno)s >>> [%(message)s]",
                 },
             },
+            "filters": {
+                "request_id": {
+                    "()": RequestIdFilter,
+                },
+            },
             "handlers": {
                 "console_libraries": {
                     "class": "logging.StreamHandler",
                     "level": "DEBUG",
+                    "filters": ["request_id"],
                     "formatter": "libraries",
                 },
                 "console_app": {
                     "class": "logging.StreamHandler",
                     "level": "DEBUG",
+                    "filters": ["request_id"],
                     "formatter": "app",
                 },
                 "fixed": {
                     "class": "logging.FileHandler",
                     "level": "ERROR",
-                    "formatter": "file",
+                    "filters": ["request_id"],
+                    "formatter": file_formatter or "file",
                     "filename": "logs_error.log",
                     "encoding": "utf-8",
                 },
                 "rotating": {
                     "class": "logging.handlers.RotatingFileHandler",
                     "level": "DEBUG",
-                    "formatter": "file",
+                    "filters": ["request_id"],
+                    "formatter": file_formatter or "file",
                     "filename": "logs_rotating.log",
                     "mode": "a",
                     "maxBytes": 1024 * 512,  # 0.5MB
@@ -119,7 +261,8 @@ def configure_logging() -> None:
                 "tests": {
                     "class": "logging.handlers.RotatingFileHandler",
                     "level": "DEBUG",
-                    "formatter": "test",
+                    "filters": ["request_id"],
+                    "formatter": file_formatter or "test",
                     "filename": os.path.join(
                         os.path.dirname(__file__), "tests", "logs_test.log"
                     ),
@@ -148,3 +291,6 @@ def configure_logging() -> None:
             },
         }
     )
+
+    if config.LOG_QUEUE_ENABLED:
+        _use_queue(logging.getLogger("dictionary"))
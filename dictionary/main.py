@@ -1,17 +1,67 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
+from dictionary.config import config
 from dictionary.database import engine
-from dictionary.logging_config import configure_logging
-from dictionary.models import Base
+from dictionary.logging_config import configure_logging, stop_logging
+from dictionary.middleware import ProfilingMiddleware, RequestLogMiddleware
+from dictionary.migrations import check_schema
+from dictionary.routers.batch import router as batch_router
+from dictionary.routers.debug import router as debug_router
 from dictionary.routers.description import router as desc_router
+from dictionary.routers.metrics import router as metrics_router
+from dictionary.routers.shuffle import Shuffle
 from dictionary.routers.shuffle import router as shuffle_router
+from dictionary.routers.sync import router as sync_router
 from dictionary.routers.word import router as word_router
+from dictionary.slow_queries import slow_query_log  # noqa: F401 (registers the hook)
+from dictionary.snapshot import load_snapshot, load_state, save_state, unload_snapshot
+from dictionary.tracing import tracer_provider
+from dictionary.write_behind import write_behind
+
 
-configure_logging()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup work is done here (not at import) - once per worker, before
+    # the first request is served
+    configure_logging()
+    check_schema(engine, config.SCHEMA_CHECK)
+    # NOTE: The ORM mappers are configured by SQLAlchemy when they are first \
+    # used (the first query), not on startup
+    if config.WRITE_BEHIND_ENABLED:
+        await write_behind.start()
+    if config.SNAPSHOT_FILE:
+        load_snapshot(config.SNAPSHOT_FILE)
+    if config.SHUFFLE_STATE_FILE:
+        Shuffle.restore_state(load_state(config.SHUFFLE_STATE_FILE))
+    yield
+    # Flushing the buffered study updates before shutting down
+    await write_behind.stop()
+    if config.SHUFFLE_STATE_FILE:
+        save_state(config.SHUFFLE_STATE_FILE, Shuffle.state())
+    unload_snapshot()
+    stop_logging()
 
-Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="Learning English", version="0.1.0")
+app = FastAPI(
+    title="Learning English",
+    version="0.1.0",
+    lifespan=lifespan,
+    # FastAPI spans (request, dependencies, endpoint, serialization) recorded by
+    # the local tracer if enabled (see dictionary/tracing.py)
+    telemetry={"tracer_provider": tracer_provider},
+)
+# The last added middleware runs first (profiling runs inside the request log)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(RequestLogMiddleware)
 app.include_router(shuffle_router)
 app.include_router(desc_router)
 app.include_router(word_router)
+app.include_router(sync_router)
+app.include_router(batch_router)
+app.include_router(metrics_router)
+# Profiles contain SQL of the requests - the debug endpoints are available only
+# if the profiler can be enabled
+if config.SQL_PROFILER_ENABLED or config.SQL_PROFILER_HEADER_ENABLED:
+    app.include_router(debug_router)
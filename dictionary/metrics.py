@@ -0,0 +1,225 @@
+"""
+Application metrics rendered in the Prometheus text exposition format
+(GET /metrics) - no client library or collector process required.
+
+NOTE: Metrics are kept in the memory of the process - with multiple workers \
+each worker exposes its own values.
+"""
+
+import math
+import threading
+from bisect import bisect_left
+from collections.abc import Callable, Iterator
+from typing import TypeVar
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Histogram buckets (in seconds)
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        '%s="%s"'
+        % (
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in labels.items()
+    )
+    return "{%s}" % ",".join(escaped)
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                "Metric '%s' requires labels: %s." % (self.name, self.labelnames)
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def value(self, **labels):
+        "Returns the current value for the given labels (None if not set)."
+        return self._values.get(self._key(labels))
+
+    def samples(self) -> Iterator[tuple[str, dict, float]]:
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in sorted(values):
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        lines.extend(
+            f"{name}{_format_labels(labels)} {_format_value(value)}"
+            for name, labels, value in self.samples()
+        )
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple = (),
+        buckets: tuple[float, ...] = REQUEST_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            # Per bucket counts (not cumulative), sum and count of observations
+            values = self._values.get(key)
+            if values is None:
+                values = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            values[0][bisect_left(self.buckets, value)] += 1
+            values[1] += value
+            values[2] += 1
+
+    def samples(self) -> Iterator[tuple[str, dict, float]]:
+        with self._lock:
+            # Copied under the lock (the values are updated in place)
+            values = [
+                (key, counts.copy(), total, count)
+                for key, (counts, total, count) in self._values.items()
+            ]
+        for key, counts, total, count in sorted(values):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield (
+                    f"{self.name}_bucket",
+                    {**labels, "le": _format_value(bound)},
+                    cumulative,
+                )
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+
+MetricType = TypeVar("MetricType", bound=Metric)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list[Metric] = []
+        # Called before rendering to update the values read on scrape (e.g. gauges)
+        self.collectors: list[Callable[[], None]] = []
+
+    def register(self, metric: MetricType) -> MetricType:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        for collect in self.collectors:
+            collect()
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(
+    Counter(
+        "http_requests_total",
+        "Number of HTTP requests.",
+        ("method", "route", "status"),
+    )
+)
+HTTP_REQUEST_DURATION = REGISTRY.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Duration of HTTP requests (including the response body).",
+        ("method", "route"),
+    )
+)
+DB_QUERY_DURATION = REGISTRY.register(
+    Histogram(
+        "db_query_duration_seconds",
+        "Duration of the database queries.",
+        ("operation",),
+        buckets=QUERY_BUCKETS,
+    )
+)
+DB_POOL_CONNECTIONS = REGISTRY.register(
+    Gauge(
+        "db_pool_connections",
+        "Connections of the database pool by state.",
+        ("state",),
+    )
+)
+SHUFFLE_DRAWS = REGISTRY.register(
+    Counter(
+        "shuffle_draws_total",
+        "Number of random words drawn by master level.",
+        ("level",),
+    )
+)
+CACHE_REQUESTS = REGISTRY.register(
+    Counter(
+        "cache_requests_total",
+        "Number of cache lookups by result (hit/miss).",
+        ("cache", "result"),
+    )
+)
+CACHE_HIT_RATIO = REGISTRY.register(
+    Gauge("cache_hit_ratio", "Ratio of cache hits to all cache lookups.", ("cache",))
+)
+
+
+def _collect_cache_hit_ratio():
+    lookups = {}
+    for _, labels, value in CACHE_REQUESTS.samples():
+        hits, total = lookups.get(labels["cache"], (0, 0))
+        lookups[labels["cache"]] = (
+            hits + (value if labels["result"] == "hit" else 0),
+            total + value,
+        )
+    for cache, (hits, total) in lookups.items():
+        CACHE_HIT_RATIO.set(hits / total if total else 0.0, cache=cache)
+
+
+REGISTRY.collectors.append(_collect_cache_hit_ratio)
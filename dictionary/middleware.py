@@ -0,0 +1,179 @@
+import logging
+import time
+import uuid
+
+from fastapi.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from dictionary.config import config
+from dictionary.instrumentation import (
+    RequestStats,
+    current_request_id,
+    request_stats,
+    route_template,
+    valid_request_id,
+)
+from dictionary.metrics import HTTP_REQUEST_DURATION, HTTP_REQUESTS
+from dictionary.profiler import SqlProfile, profiles
+from dictionary.profiling import RequestProfile, profiling_modes
+
+logger = logging.getLogger(__name__)
+
+REQUEST_ID_HEADER = "X-Request-ID"
+SQL_PROFILE_HEADER = "X-SQL-Profile"
+
+
+def profiling_requested(headers: Headers) -> bool:
+    "Whether the SQL profiler is enabled for the request."
+    if config.SQL_PROFILER_ENABLED:
+        return True
+    return config.SQL_PROFILER_HEADER_ENABLED and headers.get(
+        SQL_PROFILE_HEADER, ""
+    ).lower() in ("1", "true", "yes")
+
+
+def profile_headers(profile: SqlProfile) -> dict[str, str]:
+    "Summary of the SQL profile returned in the response headers."
+    return {
+        "X-SQL-Queries": str(profile.total_queries),
+        "X-SQL-Time-ms": "%.3f" % (profile.total_duration * 1000),
+        "X-SQL-N-Plus-One": str(len(profile.suspected_n_plus_one())),
+    }
+
+
+class RequestLogMiddleware:
+    """Assigns an ID to each request (or takes it from the X-Request-ID header if
+    it matches REQUEST_ID_PATTERN) and logs one line per request with the route
+    template, status, duration, database time and number of queries.
+    Profiled requests (see dictionary/profiler.py) get the SQL summary headers."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        request_id = headers.get(REQUEST_ID_HEADER)
+        stats = RequestStats(scope=scope)
+        if valid_request_id(request_id):
+            stats.request_id = request_id
+        elif request_id:
+            logger.debug(
+                "Invalid request ID %r replaced with %s.",
+                request_id[:200],
+                stats.request_id,
+            )
+        if profiling_requested(headers):
+            stats.profile = SqlProfile(stats.request_id, method=scope["method"])
+        token = request_stats.set(stats)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_with_request_id(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                response_headers = MutableHeaders(scope=message)
+                response_headers.append(REQUEST_ID_HEADER, stats.request_id)
+                # Queries run while streaming the body are not in the headers
+                # (only in the profile at GET /debug/sql/{request_id})
+                if stats.profile is not None:
+                    for name, value in profile_headers(stats.profile).items():
+                        response_headers.append(name, value)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            duration = time.perf_counter() - start
+            request_stats.reset(token)
+            template = route_template(scope)
+            fields = {
+                "request_id": stats.request_id,
+                "method": scope["method"],
+                "route": template or scope["path"],
+                "status": status_code,
+                "duration_ms": round(duration * 1000, 3),
+                "db_ms": round(stats.db_time * 1000, 3),
+                "db_queries": stats.db_queries,
+            }
+            # Not matched paths are not used as labels (unbounded number of values)
+            route = template or "<unmatched>"
+            HTTP_REQUESTS.inc(method=fields["method"], route=route, status=status_code)
+            HTTP_REQUEST_DURATION.observe(
+                duration, method=fields["method"], route=route
+            )
+            if stats.profile is not None:
+                stats.profile.route = fields["route"]
+                profiles.add(stats.profile)
+                for query in stats.profile.suspected_n_plus_one():
+                    logger.warning(
+                        "Suspected N+1 in %s %s: %s executions of %s",
+                        fields["method"],
+                        fields["route"],
+                        query.count,
+                        query.fingerprint,
+                        extra={"request_id": stats.request_id},
+                    )
+            logger.info(
+                "%s %s %s %.1fms (db: %.1fms, %s queries)",
+                fields["method"],
+                fields["route"],
+                fields["status"],
+                fields["duration_ms"],
+                fields["db_ms"],
+                fields["db_queries"],
+                extra={"fields": fields},
+            )
+
+
+class ProfilingMiddleware:
+    """Profiles requests on demand with cProfile and/or tracemalloc (see
+    dictionary/profiling.py). Names of the written files are returned in the
+    X-Profile-Files header. Must run inside RequestLogMiddleware (request ID)."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        modes = profiling_modes(Headers(scope=scope))
+        if not modes:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(current_request_id() or uuid.uuid4().hex, modes)
+        if not profile.start():
+            logger.warning(
+                "%s %s not profiled - another request is being profiled.",
+                scope["method"],
+                scope["path"],
+            )
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_profile_files(message: Message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append(
+                    "X-Profile-Files", ", ".join(profile.file_names)
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile_files)
+        finally:
+            profile.stop()
+            route = route_template(scope) or "<unmatched>"
+            title = (
+                f"{scope['method']} {scope['path']} ({route}), "
+                f"request {profile.request_id}"
+            )
+            paths = await run_in_threadpool(profile.write, title)
+            logger.info("Profile of %s written to: %s", title, ", ".join(paths))
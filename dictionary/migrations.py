@@ -0,0 +1,100 @@
+"""
+Database schema check run on application startup (instead of creating tables
+with every import of the application).
+
+NOTE: The migrations up to now change the PostgreSQL schema of earlier versions. \
+A new (empty) SQLite database is created from the models and stamped with \
+the head revision instead (later migrations run in Alembic batch mode).
+"""
+
+import logging
+from pathlib import Path
+
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import Engine, inspect
+
+from alembic import command
+from dictionary.database import Base
+from dictionary.enums import SchemaCheck
+from dictionary.exceptions import DatabaseError
+
+logger = logging.getLogger(__name__)
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+
+def alembic_config() -> Config:
+    "Alembic configuration of the project (independent of the working directory)."
+    config = Config(str(PROJECT_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(PROJECT_DIR / "alembic"))
+    return config
+
+
+def alembic_scripts() -> ScriptDirectory:
+    return ScriptDirectory.from_config(alembic_config())
+
+
+def alembic_heads() -> set[str]:
+    "Returns head revisions of the Alembic migration scripts."
+    return set(alembic_scripts().get_heads())
+
+
+def create_sqlite_schema(engine: Engine) -> bool:
+    """Creates the tables of an empty SQLite database at the head revision.
+    Returns True if the schema was created."""
+    with engine.begin() as connection:
+        if connection.dialect.name != "sqlite" or inspect(connection).get_table_names():
+            return False
+        Base.metadata.create_all(bind=connection)
+        MigrationContext.configure(connection).stamp(alembic_scripts(), "heads")
+
+    logger.info("SQLite database schema created at the head revision.")
+    return True
+
+
+def create_schema(engine: Engine):
+    """Builds the schema of an empty database (e.g. one created for a benchmark)
+    at the head revision: with create_sqlite_schema on SQLite, with the migrations
+    (alembic upgrade heads) otherwise."""
+    if inspect(engine).get_table_names():
+        raise DatabaseError(
+            "Database is not empty: %s." % engine.url.render_as_string()
+        )
+    if create_sqlite_schema(engine):
+        return
+
+    config = alembic_config()
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        config.attributes["configure_logger"] = False
+        command.upgrade(config, "heads")
+    logger.info("Database schema created at the head revision.")
+
+
+def check_schema(engine: Engine, mode: SchemaCheck):
+    """Makes sure that the database schema matches the models.
+    VERIFY only reads the revision stored in the database (no DDL), so any number
+    of workers can start at the same time. Migrations must be run separately
+    (alembic upgrade head)."""
+    if mode == SchemaCheck.SKIP:
+        return
+
+    if mode == SchemaCheck.CREATE:
+        Base.metadata.create_all(bind=engine)
+        return
+
+    create_sqlite_schema(engine)
+    heads = alembic_heads()
+    with engine.connect() as connection:
+        current = set(MigrationContext.configure(connection).get_current_heads())
+
+    if current != heads:
+        raise DatabaseError(
+            "Database schema is not up to date (revision: %s, expected: %s). "
+            "Run 'alembic upgrade head' first."
+            % (", ".join(sorted(current)) or None, ", ".join(sorted(heads)))
+        )
+
+    logger.debug("Database schema is up to date (revision: %s).", ", ".join(heads))
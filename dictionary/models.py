@@ -10,13 +10,30 @@ from sqlalchemy import (
     String,
     func,
 )
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql.functions import GenericFunction
 from sqlalchemy.types import TypeDecorator
 
 from dictionary.database import Base
 from dictionary.enums import MasterLevel, WordTypes
 
 
+class statement_timestamp(GenericFunction):
+    """Time of the current statement - func.statement_timestamp().
+    NOTE: CURRENT_TIMESTAMP of PostgreSQL is the start of the transaction, \
+        records written at the end of a long transaction would get an older time."""
+
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(statement_timestamp, "sqlite")
+def sqlite_statement_timestamp(element, compiler, **kw):
+    # CURRENT_TIMESTAMP of SQLite is the time of the statement (dictionary/sqlite.py)
+    return compiler.process(func.current_timestamp(), **kw)
+
+
 # Creating database tables
 class StrippedString(TypeDecorator):
     """For stripping trailing and leading whitespaces from string values
@@ -41,14 +58,21 @@ class Word(Base):
     word = Column(StrippedString(150), unique=True, nullable=False)
     master_level = Column(Enum(MasterLevel), default=MasterLevel.NEW)
     notes = Column(StrippedString(250))
-    created = Column(DateTime, default=func.current_timestamp())
+    created = Column(DateTime, default=func.statement_timestamp())
     updated = Column(
-        DateTime, onupdate=func.current_timestamp(), default=func.current_timestamp()
+        DateTime,
+        onupdate=func.statement_timestamp(),
+        default=func.statement_timestamp(),
+        index=True,
     )
 
     # Relationship with WordDescription association table
+    # Associations are removed by the database (ON DELETE CASCADE)
     descriptions = relationship(
-        "Description", secondary="word_description", back_populates="words"
+        "Description",
+        secondary="word_description",
+        back_populates="words",
+        passive_deletes=True,
     )
 
 
@@ -60,35 +84,57 @@ class Description(Base):
     in_polish = Column(StrippedString(300), nullable=False, unique=True)
     in_english = Column(StrippedString(300))
     example = Column(StrippedString(300))
-    created = Column(DateTime, default=func.current_timestamp())
+    created = Column(DateTime, default=func.statement_timestamp())
     updated = Column(
-        DateTime, onupdate=func.current_timestamp(), default=func.current_timestamp()
+        DateTime,
+        onupdate=func.statement_timestamp(),
+        default=func.statement_timestamp(),
+        index=True,
     )
 
     # Relationship with WordDescription association table
+    # Associations are removed by the database (ON DELETE CASCADE)
     words = relationship(
-        "Word", secondary="word_description", back_populates="descriptions"
+        "Word",
+        secondary="word_description",
+        back_populates="descriptions",
+        passive_deletes=True,
     )
 
 
 class WordDescription(Base):
     __tablename__ = "word_description"
 
-    id = Column(Integer, primary_key=True, unique=True, autoincrement=True)
-    word_id = Column(ForeignKey("word.id"), primary_key=True, nullable=False)
-    description_id = Column(
-        ForeignKey("description.id"), primary_key=True, nullable=False
+    # The primary key (word_id, description_id) serves the word -> descriptions joins
+    word_id = Column(
+        ForeignKey("word.id", ondelete="CASCADE"), primary_key=True, nullable=False
     )
-    created = Column(DateTime, default=func.current_timestamp())
-    updated = Column(
-        DateTime, onupdate=func.current_timestamp(), default=func.current_timestamp()
+    description_id = Column(
+        ForeignKey("description.id", ondelete="CASCADE"),
+        primary_key=True,
+        nullable=False,
     )
+    # Associations are only created and deleted (never updated)
+    created = Column(DateTime, default=func.statement_timestamp(), index=True)
 
     __table_args__ = (
-        Index("idx_unique_word_description", word_id, description_id, unique=True),
+        # Covers the description -> words joins (index only scans)
+        Index("idx_word_description_reverse", description_id, word_id),
     )
 
 
+class Tombstone(Base):
+    """Keeps track of deleted records for the delta sync endpoint."""
+
+    __tablename__ = "tombstone"
+
+    id = Column(Integer, primary_key=True, unique=True, autoincrement=True)
+    table_name = Column(String(50), nullable=False)
+    word_id = Column(Integer, nullable=True)
+    description_id = Column(Integer, nullable=True)
+    deleted = Column(DateTime, default=func.statement_timestamp(), index=True)
+
+
 class LevelWeight(Base):
     __tablename__ = "level_weight"
 
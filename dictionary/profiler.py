@@ -0,0 +1,134 @@
+"""
+Per-request SQL profiler with N+1 detection.
+
+When enabled (SQL_PROFILER_ENABLED or the X-SQL-Profile header in dev), every
+statement executed during a request is recorded with its duration and a
+normalized fingerprint (literals and parameters replaced with '?'). Fingerprints
+executed at least SQL_PROFILER_N_PLUS_ONE_THRESHOLD times are reported as
+suspected N+1 queries (e.g. a query run in a loop for each word).
+
+A summary is returned in the response headers and the last SQL_PROFILER_HISTORY
+profiles are available at GET /debug/sql/{request_id}.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from dictionary.config import config
+
+# Bound parameters of all DBAPI styles (pyformat, format, qmark, named, numeric)
+_PARAMETERS = re.compile(r"%\(\w+\)s|%s|\?|(?<!:):\w+|\$\d+")
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r"\b\d+(?:\.\d+)?\b")
+# Lists of parameters - IN (?, ?, ?) and VALUES (?, ?), (?, ?)
+_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_ROWS = re.compile(r"\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+")
+_SPACES = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """Returns the statement with literals and parameters replaced, so the same
+    query with different values has the same fingerprint."""
+    statement = _STRINGS.sub("?", statement)
+    statement = _PARAMETERS.sub("?", statement)
+    statement = _NUMBERS.sub("?", statement)
+    statement = _LISTS.sub("(...)", statement)
+    statement = _ROWS.sub("(...)", statement)
+    return _SPACES.sub(" ", statement).strip()
+
+
+@dataclass
+class QueryProfile:
+    "All executions of one fingerprint within the request."
+
+    fingerprint: str
+    count: int = 0
+    duration: float = 0.0  # in seconds
+
+
+@dataclass
+class SqlProfile:
+    "Statements executed while processing one request."
+
+    request_id: str
+    method: str = ""
+    route: str = ""
+    queries: dict[str, QueryProfile] = field(default_factory=dict)
+
+    def record(self, statement: str, duration: float):
+        key = fingerprint(statement)
+        query = self.queries.get(key)
+        if query is None:
+            query = self.queries[key] = QueryProfile(key)
+        query.count += 1
+        query.duration += duration
+
+    @property
+    def total_queries(self) -> int:
+        return sum(query.count for query in self.queries.values())
+
+    @property
+    def total_duration(self) -> float:
+        return sum(query.duration for query in self.queries.values())
+
+    def suspected_n_plus_one(self, threshold: int | None = None) -> list[QueryProfile]:
+        "Returns fingerprints executed at least threshold times (most frequent first)."
+        if threshold is None:
+            threshold = config.SQL_PROFILER_N_PLUS_ONE_THRESHOLD
+        return sorted(
+            (query for query in self.queries.values() if query.count >= threshold),
+            key=lambda query: query.count,
+            reverse=True,
+        )
+
+    def summary(self) -> dict:
+        return {
+            "request_id": self.request_id,
+            "method": self.method,
+            "route": self.route,
+            "queries": self.total_queries,
+            "duration_ms": round(self.total_duration * 1000, 3),
+            "n_plus_one": [query.fingerprint for query in self.suspected_n_plus_one()],
+            "statements": [
+                {
+                    "fingerprint": query.fingerprint,
+                    "count": query.count,
+                    "duration_ms": round(query.duration * 1000, 3),
+                }
+                for query in sorted(
+                    self.queries.values(),
+                    key=lambda query: query.duration,
+                    reverse=True,
+                )
+            ],
+        }
+
+
+class ProfileHistory:
+    "The last max_items profiles by request ID."
+
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self._profiles: OrderedDict[str, SqlProfile] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile: SqlProfile):
+        with self._lock:
+            self._profiles[profile.request_id] = profile
+            self._profiles.move_to_end(profile.request_id)
+            while len(self._profiles) > self.max_items:
+                self._profiles.popitem(last=False)
+
+    def get(self, request_id: str) -> SqlProfile | None:
+        with self._lock:
+            return self._profiles.get(request_id)
+
+    def all(self) -> list[SqlProfile]:
+        "Returns the profiles, the most recent first."
+        with self._lock:
+            return list(reversed(self._profiles.values()))
+
+
+profiles = ProfileHistory(config.SQL_PROFILER_HISTORY)
@@ -0,0 +1,159 @@
+"""
+On-demand profiling of single requests - CPU with cProfile (a .pstats file) and
+memory with tracemalloc (a report of the top allocations made by the request).
+
+A request is profiled if REQUEST_PROFILING_ENABLED is set (with the modes from
+REQUEST_PROFILING_MODES) or if it has the X-Profile header (e.g. 'cpu,memory')
+and REQUEST_PROFILING_HEADER_ENABLED is set. If REQUEST_PROFILING_TOKEN is set,
+the header must come with the same X-Profile-Token.
+
+Files are written to REQUEST_PROFILING_DIR, named after the request ID (only
+IDs matching REQUEST_ID_PATTERN are used, see dictionary/middleware.py):
+    python -m pstats profiles/<request_id>.pstats
+
+NOTE: Only one request is profiled at a time (other requests are served \
+without profiling meanwhile). Both profilers see the whole process, so \
+requests served concurrently with the profiled one are included too.
+"""
+
+import cProfile
+import logging
+import os
+import secrets
+import threading
+import tracemalloc
+
+from starlette.datastructures import Headers
+
+from dictionary.config import config
+from dictionary.enums import ProfileMode
+from dictionary.instrumentation import valid_request_id
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_TOKEN_HEADER = "X-Profile-Token"
+
+# Frames of the profiling itself left out of the allocation report
+_ALLOCATION_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+# Held while a request is profiled
+_profiling = threading.Lock()
+
+
+def profiling_modes(headers: Headers) -> set[ProfileMode]:
+    "Returns the profiling modes requested for the request (empty if none)."
+    if config.REQUEST_PROFILING_ENABLED:
+        return set(config.REQUEST_PROFILING_MODES)
+
+    requested = headers.get(PROFILE_HEADER)
+    if not config.REQUEST_PROFILING_HEADER_ENABLED or not requested:
+        return set()
+    if config.REQUEST_PROFILING_TOKEN and not secrets.compare_digest(
+        headers.get(PROFILE_TOKEN_HEADER, ""), config.REQUEST_PROFILING_TOKEN
+    ):
+        logger.warning("Profiling requested with an invalid token - ignored.")
+        return set()
+
+    modes = set()
+    for mode in requested.split(","):
+        try:
+            modes.add(ProfileMode(mode.strip().lower()))
+        except ValueError:
+            logger.warning("Unknown profiling mode '%s' - ignored.", mode)
+    return modes
+
+
+class RequestProfile:
+    def __init__(
+        self,
+        request_id: str,
+        modes: set[ProfileMode],
+        directory: str | None = None,
+        top_n: int | None = None,
+    ):
+        # The ID is a part of the file names - no path separators or dots
+        if not valid_request_id(request_id):
+            raise ValueError(f"Invalid request ID for the file names: {request_id!r}")
+        self.request_id = request_id
+        self.modes = modes
+        self.directory = directory or config.REQUEST_PROFILING_DIR
+        self.top_n = top_n or config.REQUEST_PROFILING_TOP_N
+        self._cpu_profile: cProfile.Profile | None = None
+        self._started_tracing = False
+        self._snapshots: list[tracemalloc.Snapshot] = []
+
+    @property
+    def file_names(self) -> list[str]:
+        names = []
+        if ProfileMode.CPU in self.modes:
+            names.append(f"{self.request_id}.pstats")
+        if ProfileMode.MEMORY in self.modes:
+            names.append(f"{self.request_id}.allocations.txt")
+        return names
+
+    def start(self) -> bool:
+        "Starts profiling. Returns False if another request is being profiled."
+        if not _profiling.acquire(blocking=False):
+            return False
+
+        if ProfileMode.MEMORY in self.modes:
+            self._started_tracing = not tracemalloc.is_tracing()
+            if self._started_tracing:
+                tracemalloc.start()
+            self._snapshots = [tracemalloc.take_snapshot()]
+        if ProfileMode.CPU in self.modes:
+            self._cpu_profile = cProfile.Profile()
+            try:
+                self._cpu_profile.enable()
+            except ValueError:
+                # Another profiler (e.g. a debugger or coverage) is active
+                logger.warning("CPU profiling not available - another profiler active.")
+                self._cpu_profile = None
+                self.modes = self.modes - {ProfileMode.CPU}
+        return True
+
+    def stop(self):
+        "Stops profiling (must be called by the thread that started it)."
+        try:
+            if self._cpu_profile:
+                self._cpu_profile.disable()
+            if ProfileMode.MEMORY in self.modes:
+                self._snapshots.append(tracemalloc.take_snapshot())
+                if self._started_tracing:
+                    tracemalloc.stop()
+        finally:
+            _profiling.release()
+
+    def allocations_report(self, title: str) -> str:
+        "Returns the top_n source lines by memory allocated during the request."
+        before, after = (
+            snapshot.filter_traces(_ALLOCATION_FILTERS) for snapshot in self._snapshots
+        )
+        differences = after.compare_to(before, "lineno")
+        total = sum(difference.size_diff for difference in differences)
+        lines = [
+            title,
+            f"Allocated in total: {total / 1024:.1f} KiB",
+            f"Top {self.top_n} lines:",
+        ]
+        lines.extend(str(difference) for difference in differences[: self.top_n])
+        return "\n".join(lines) + "\n"
+
+    def write(self, title: str) -> list[str]:
+        "Writes the profile files. Returns their paths."
+        os.makedirs(self.directory, exist_ok=True)
+        paths = []
+        for name in self.file_names:
+            path = os.path.join(self.directory, name)
+            if name.endswith(".pstats"):
+                self._cpu_profile.dump_stats(path)
+            else:
+                with open(path, "w", encoding="utf-8") as file:
+                    file.write(self.allocations_report(title))
+            paths.append(path)
+        return paths
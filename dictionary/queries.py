@@ -0,0 +1,287 @@
+"""
+Core (non-ORM) queries shared by the routers: the column sets returned by the
+word/description endpoints, fetch helpers returning plain rows and the
+portable fallbacks of PostgreSQL-only SQL for SQLite (see dictionary/sqlite.py).
+
+NOTE: Kept apart from the routers, so a router can use them without importing \
+another router (e.g. the word router creates and returns descriptions).
+"""
+
+from collections.abc import Iterable, Sequence
+
+from sqlalchemy import (
+    Boolean,
+    Engine,
+    Integer,
+    any_,
+    case,
+    cast,
+    column,
+    delete,
+    exists,
+    func,
+    insert,
+    literal,
+    literal_column,
+    select,
+    update,
+    values,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session, aliased
+
+from dictionary.enums import MasterLevel
+from dictionary.models import Description, Tombstone, Word, WordDescription
+from dictionary.responses import rows_to_dicts
+
+# Columns returned by the word/description endpoints (WordReturn/DescriptionReturn)
+WORD_COLUMNS = (Word.id, Word.word, Word.master_level, Word.notes)
+
+DESCRIPTION_COLUMNS = (
+    Description.id,
+    Description.type,
+    Description.in_polish,
+    Description.in_english,
+    Description.example,
+)
+
+
+def is_postgresql(db: Session) -> bool:
+    "PostgreSQL or SQLite (dictionary/sqlite.py) - for the portable fallbacks."
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def in_ids(db: Session, column, ids: list[int]):
+    """column = ANY(:ids) - one parameter for any number of IDs (the same cached
+    statement) on PostgreSQL, column IN (...) on SQLite."""
+    if is_postgresql(db):
+        return column == any_(literal(ids, ARRAY(Integer)))
+    return column.in_(ids)
+
+
+def begin_write(db: Session):
+    """Begins the transaction of the session as a write transaction - with BEGIN
+    IMMEDIATE on SQLite (waits for the write lock up to busy_timeout), so its
+    reads are not invalidated by other writers before its first write.
+    NOTE: No-op on PostgreSQL, if the transaction has begun already or if the \
+        session is bound to a connection (batch, forced rollback)."""
+    if (
+        not is_postgresql(db)
+        and not db.in_transaction()
+        and isinstance(db.get_bind(), Engine)
+    ):
+        db.connection(execution_options={"sqlite_begin": "IMMEDIATE"})
+
+
+def upsert(db: Session, model: type[Word | Description | WordDescription]):
+    "INSERT supporting ON CONFLICT (PostgreSQL or SQLite syntax)."
+    if is_postgresql(db):
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+
+def upsert_inserted(db: Session, model: type[Word | Description]):
+    """Column returned by the upsert - true if the row was inserted (not updated).
+    NOTE: Call before the upsert."""
+    if is_postgresql(db):
+        # xmax of an inserted row is 0, of an updated row - the updating transaction
+        return literal_column("xmax = 0", Boolean).label("inserted")
+    # SQLite - IDs of the new rows (rowid) are greater than any existing ID. The
+    # write lock is taken before the read, no other connection writes until commit.
+    begin_write(db)
+    last_id = db.scalar(select(func.max(model.id))) or 0
+    return (model.id > last_id).label("inserted")
+
+
+def fetch_all_words(db: Session, columns: Sequence = WORD_COLUMNS) -> list[dict]:
+    "Fetches all words (only given columns) as plain dicts, without ORM objects."
+    result = db.execute(select(*columns).order_by(Word.id))
+    return rows_to_dicts(result)
+
+
+def fetch_all_descriptions(
+    db: Session, columns: Sequence = DESCRIPTION_COLUMNS
+) -> list[dict]:
+    "Fetches all descriptions (only given columns) as plain dicts, without ORM objects."
+    result = db.execute(select(*columns).order_by(Description.id))
+    return rows_to_dicts(result)
+
+
+def fetch_descriptions_by_word(
+    db: Session, columns: Sequence = DESCRIPTION_COLUMNS
+) -> dict[int, list[dict]]:
+    """Fetches descriptions of all words (only given columns) with one query.
+    Returns plain dicts (None values excluded) grouped by the word ID."""
+    result = db.execute(
+        select(WordDescription.word_id.label("_word_id"), *columns)
+        .join(Description, Description.id == WordDescription.description_id)
+        .order_by(WordDescription.word_id, WordDescription.description_id)
+    )
+    descriptions = {}
+    for row in rows_to_dicts(result):
+        descriptions.setdefault(row.pop("_word_id"), []).append(row)
+    return descriptions
+
+
+def fetch_existing_ids(db: Session, column, ids: Iterable[int]) -> set[int]:
+    "Returns those of the given IDs that exist in the column (one query)."
+    ids = list(ids)
+    if not ids:
+        return set()
+    return set(db.scalars(select(column).where(in_ids(db, column, ids))))
+
+
+def fetch_word(db: Session, word_id: int):
+    "Fetches the word by its ID (None if not found)."
+    return (
+        db.execute(select(*WORD_COLUMNS).where(Word.id == word_id)).mappings().first()
+    )
+
+
+def fetch_word_with_descriptions(
+    db: Session, word_id: int
+) -> tuple[dict | None, list[dict]]:
+    """Fetches the word and all its descriptions with one query (outer join).
+    Returns (None, []) if the word is not found."""
+    result = db.execute(
+        select(Word.id.label("_word_id"), *WORD_COLUMNS[1:], *DESCRIPTION_COLUMNS)
+        .outerjoin(WordDescription, WordDescription.word_id == Word.id)
+        .outerjoin(Description, Description.id == WordDescription.description_id)
+        .where(Word.id == word_id)
+        .order_by(WordDescription.description_id)
+    )
+    word, descriptions = None, []
+    for row in result.mappings():
+        word = {"id": row["_word_id"], **{c.key: row[c.key] for c in WORD_COLUMNS[1:]}}
+        if row["id"] is not None:
+            descriptions.append({c.key: row[c.key] for c in DESCRIPTION_COLUMNS})
+    return word, descriptions
+
+
+def fetch_word_translations(db: Session, condition) -> list[dict]:
+    """Fetches the words matching the condition (only ID and text) with the Polish
+    translations of their descriptions - one query (outer join), ordered by ID."""
+    result = db.execute(
+        select(Word.id, Word.word, Description.in_polish)
+        .outerjoin(WordDescription, WordDescription.word_id == Word.id)
+        .outerjoin(Description, Description.id == WordDescription.description_id)
+        .where(condition)
+        .order_by(Word.id, WordDescription.description_id)
+    )
+    words = {}
+    for word_id, word, in_polish in result:
+        entry = words.setdefault(
+            word_id, {"id": word_id, "word": word, "translation": []}
+        )
+        if in_polish is not None:
+            entry["translation"].append(in_polish)
+    return list(words.values())
+
+
+def fetch_word_descriptions(db: Session, word_id: int) -> list:
+    "Fetches all descriptions of the word."
+    return (
+        db.execute(
+            select(*DESCRIPTION_COLUMNS)
+            .join(WordDescription, WordDescription.description_id == Description.id)
+            .where(WordDescription.word_id == word_id)
+        )
+        .mappings()
+        .all()
+    )
+
+
+def update_word_levels(db: Session, levels: dict[int, MasterLevel]) -> list[int]:
+    """Sets master levels of many words with one UPDATE ... FROM (VALUES ...)
+    (UPDATE ... SET master_level = CASE id ... on SQLite).
+    Words already on the given level are not touched.
+    Returns IDs of the updated words."""
+    if not levels:
+        return []
+    if is_postgresql(db):
+        new_levels = values(
+            column("id", Integer),
+            column("master_level", Word.master_level.type),
+            name="new_levels",
+        ).data(list(levels.items()))
+        new_level = cast(new_levels.c.master_level, Word.master_level.type)
+        condition = Word.id == new_levels.c.id
+    else:
+        new_level = case(
+            {
+                word_id: literal(level, Word.master_level.type)
+                for word_id, level in levels.items()
+            },
+            value=Word.id,
+        )
+        condition = Word.id.in_(levels)
+    return db.scalars(
+        update(Word)
+        .where(condition, Word.master_level.is_distinct_from(new_level))
+        .values(master_level=new_level)
+        .returning(Word.id)
+    ).all()
+
+
+def record_tombstones(
+    db: Session,
+    model: type[Word | Description | WordDescription],
+    ids: Iterable[int] | Iterable[tuple[int, int]],
+):
+    """Records deleted words/descriptions (IDs) or word-description associations
+    ((word_id, description_id) pairs) for the sync endpoint."""
+    if model is WordDescription:
+        rows = [
+            {
+                "table_name": model.__tablename__,
+                "word_id": word_id,
+                "description_id": desc_id,
+            }
+            for word_id, desc_id in ids
+        ]
+    else:
+        key = "word_id" if model is Word else "description_id"
+        rows = [{"table_name": model.__tablename__, key: id_} for id_ in ids]
+    if rows:
+        db.execute(insert(Tombstone), rows)
+
+
+def delete_orphan_descriptions(
+    db: Session,
+    batch_size: int,
+    description_ids: Iterable[int] | None = None,
+    commit: bool = True,
+) -> list[int]:
+    """Deletes descriptions not assigned to any word (optionally only the given ones)
+    in batches of batch_size rows. Each batch is committed separately (unless
+    commit is False - then the caller commits all batches with its own changes)
+    and rows locked by other transactions are skipped, so locks are held only
+    briefly.
+    Returns IDs of the deleted descriptions."""
+    orphan = aliased(Description, name="orphan")
+    orphans = select(orphan.id).where(
+        ~exists().where(WordDescription.description_id == orphan.id)
+    )
+    if description_ids is not None:
+        description_ids = list(description_ids)
+        if not description_ids:
+            return []
+        orphans = orphans.where(in_ids(db, orphan.id, description_ids))
+    orphans = (
+        orphans.order_by(orphan.id).limit(batch_size).with_for_update(skip_locked=True)
+    )
+
+    deleted = []
+    while True:
+        batch = db.scalars(
+            delete(Description)
+            .where(Description.id.in_(orphans))
+            .returning(Description.id)
+        ).all()
+        record_tombstones(db, Description, batch)
+        if commit:
+            db.commit()
+        deleted.extend(batch)
+        if len(batch) < batch_size:
+            return sorted(deleted)
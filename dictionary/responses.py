@@ -0,0 +1,111 @@
+import datetime
+import gzip
+from typing import Any
+
+import brotli
+import msgpack
+import orjson
+from fastapi import Request, Response
+from sqlalchemy import Result
+
+from dictionary.config import config
+from dictionary.tracing import traced
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+
+
+def rows_to_dicts(result: Result) -> list[dict[str, Any]]:
+    "Converts Core rows into dicts with None values excluded."
+    return [
+        {key: value for key, value in row.items() if value is not None}
+        for row in result.mappings()
+    ]
+
+
+def _msgpack_default(obj: Any) -> Any:
+    "Encodes values that MessagePack does not support the same way as JSON does."
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return obj.isoformat()
+    raise TypeError("Object of type %s is not serializable." % type(obj).__name__)
+
+
+def _qualities(header: str) -> dict[str, float]:
+    """Parses the Accept/Accept-Encoding header into quality of each value
+    (e.g. 'br;q=0.5, gzip' -> {'br': 0.5, 'gzip': 1.0}). Invalid q is 0."""
+    qualities = {}
+    for item in header.split(","):
+        value, *params = (part.strip() for part in item.split(";"))
+        if not value:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, number = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = min(max(float(number), 0.0), 1.0)
+                except ValueError:
+                    quality = 0.0
+        qualities[value.lower()] = quality
+    return qualities
+
+
+def _accepted_media_type(request: Request) -> str:
+    """Returns MessagePack if the client asks for it (with quality > 0) and
+    does not prefer JSON, JSON otherwise."""
+    qualities = _qualities(request.headers.get("accept", ""))
+    msgpack_quality = qualities.get(MSGPACK, 0.0)
+    json_quality = next(
+        (
+            qualities[media_range]
+            for media_range in (JSON, "application/*", "*/*")
+            if media_range in qualities
+        ),
+        0.0,
+    )
+    if msgpack_quality > 0 and msgpack_quality >= json_quality:
+        return MSGPACK
+    return JSON
+
+
+def _accepted_encoding(request: Request) -> str | None:
+    """Returns the compression preferred by the client (br over gzip if equally
+    preferred), None if neither is accepted."""
+    qualities = _qualities(request.headers.get("accept-encoding", ""))
+    encoding = max(("br", "gzip"), key=lambda name: qualities.get(name, 0.0))
+    return encoding if qualities.get(encoding, 0.0) > 0 else None
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=config.BROTLI_QUALITY)
+    return gzip.compress(body, config.GZIP_LEVEL, mtime=0)
+
+
+def negotiated_response(
+    request: Request, content: Any, status_code: int = 200
+) -> Response:
+    """Renders JSON ready content as MessagePack (if requested in Accept header)
+    or JSON, and compresses it with brotli/gzip (if accepted by the client)
+    when the body exceeds COMPRESSION_MINIMUM_SIZE.
+    NOTE: The whole body is rendered and compressed in memory (not streamed). \
+    Skips the response_model validation - the content must be built from \
+    already validated data."""
+    media_type = _accepted_media_type(request)
+    with traced("serialization", **{"http.response.content_type": media_type}) as span:
+        if media_type == MSGPACK:
+            body = msgpack.packb(content, default=_msgpack_default)
+        else:
+            body = orjson.dumps(content)
+        span.set_attribute("http.response.body.size", len(body))
+
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    encoding = (
+        _accepted_encoding(request)
+        if len(body) >= config.COMPRESSION_MINIMUM_SIZE
+        else None
+    )
+    if encoding:
+        headers["Content-Encoding"] = encoding
+        body = _compress(body, encoding)
+    return Response(body, status_code, headers, media_type)
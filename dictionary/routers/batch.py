@@ -0,0 +1,205 @@
+import logging
+from collections.abc import Awaitable, Callable
+from typing import Annotated, Any, NamedTuple
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.orm import Session
+
+from dictionary.database import get_db, single_transaction
+from dictionary.enums import BatchOperationType
+from dictionary.routers.description import (
+    add_a_new_description,
+    assign_description_to_a_word,
+    delete_a_description,
+    update_description,
+)
+from dictionary.routers.word import (
+    add_a_new_word,
+    delete_a_word,
+    update_word,
+)
+from dictionary.schemas import (
+    BatchOperation,
+    BatchResult,
+    DescriptionModel,
+    DescriptionReturn,
+    DescriptionUpdate,
+    WordDescriptionsModel,
+    WordModel,
+    WordReturn,
+    WordUpdate,
+)
+
+logger = logging.getLogger(__name__)
+
+
+router = APIRouter(prefix="/batch", tags=["batch"])
+
+
+db_dependency = Annotated[Session, Depends(get_db)]
+
+
+class Operation(NamedTuple):
+    "Maps batch operation to the router handler."
+
+    handler: Callable[..., Awaitable[Any]]
+    path_params: tuple[str, ...]
+    body: tuple[str, type[BaseModel]] | None
+    response_model: type[BaseModel] | None
+
+
+OPERATIONS = {
+    BatchOperationType.ADD_WORD: Operation(
+        add_a_new_word, (), ("new_word", WordModel), WordReturn
+    ),
+    BatchOperationType.UPDATE_WORD: Operation(
+        update_word, ("word_id",), ("update", WordUpdate), WordReturn
+    ),
+    BatchOperationType.DELETE_WORD: Operation(delete_a_word, ("word_id",), None, None),
+    BatchOperationType.ADD_DESCRIPTION: Operation(
+        add_a_new_description,
+        ("word_id",),
+        ("new_desc", DescriptionModel),
+        WordDescriptionsModel,
+    ),
+    BatchOperationType.ASSIGN_DESCRIPTION: Operation(
+        assign_description_to_a_word,
+        ("word_id", "desc_id"),
+        None,
+        WordDescriptionsModel,
+    ),
+    BatchOperationType.UPDATE_DESCRIPTION: Operation(
+        update_description,
+        ("desc_id",),
+        ("update", DescriptionUpdate),
+        DescriptionReturn,
+    ),
+    BatchOperationType.DELETE_DESCRIPTION: Operation(
+        delete_a_description, ("desc_id",), None, None
+    ),
+}
+
+
+def _resolve_params(
+    index: int, operation: BatchOperation, results: list[BatchResult]
+) -> dict[str, int]:
+    "Validates path parameters and replaces '$<index>' references with IDs."
+    path_params = OPERATIONS[operation.op].path_params
+    if set(operation.params) != set(path_params):
+        raise HTTPException(400, "Required parameters: %s." % list(path_params))
+
+    params = {}
+    for name, value in operation.params.items():
+        if isinstance(value, str):
+            if not value.startswith("$"):
+                raise HTTPException(
+                    400,
+                    "Invalid value '%s' - use an integer ID or a '$<index>' "
+                    "reference." % value,
+                )
+            ref = value[1:]
+            if not ref.isdigit() or int(ref) >= index or results[int(ref)].id is None:
+                raise HTTPException(
+                    400,
+                    "Invalid reference '%s' - only IDs of the previous operations "
+                    "can be used." % value,
+                )
+            value = results[int(ref)].id
+        params[name] = value
+    return params
+
+
+def _operation_id(
+    operation: BatchOperation, params: dict[str, int], result: dict[str, Any] | None
+) -> int | None:
+    "Returns the ID of the record created/affected by the operation."
+    if operation.op == BatchOperationType.ADD_DESCRIPTION:
+        # The new description (returned by its INSERT) is the last one of the word
+        return result["description"][-1]["id"]
+    if result and "id" in result:
+        return result["id"]
+    path_params = OPERATIONS[operation.op].path_params
+    return params[path_params[-1]] if path_params else None
+
+
+async def _run_operation(
+    db: Session, index: int, operation: BatchOperation, results: list[BatchResult]
+) -> BatchResult:
+    handler, _, body_param, response_model = OPERATIONS[operation.op]
+
+    params = _resolve_params(index, operation, results)
+    kwargs = dict(params)
+    if body_param:
+        name, model = body_param
+        try:
+            body = model.model_validate(operation.body or {})
+        except ValidationError as exc_info:
+            raise HTTPException(
+                422,
+                {
+                    "index": index,
+                    "op": operation.op.value,
+                    "errors": jsonable_encoder(exc_info.errors(include_url=False)),
+                },
+            )
+        kwargs[name] = body
+
+    result = await handler(db=db, **kwargs)
+    if response_model:
+        result = response_model.model_validate(result).model_dump(exclude_none=True)
+
+    return BatchResult(
+        index=index,
+        op=operation.op,
+        id=_operation_id(operation, params, result),
+        result=result,
+    )
+
+
+@router.post(
+    "",
+    response_model=list[BatchResult],
+    response_model_exclude_none=True,
+    status_code=200,
+    description="Run multiple word/description operations in one transaction. \
+        If any operation fails, none of the operations is saved. \
+        With dry_run, the operations are run and their results returned, \
+        but nothing is saved (e.g. to validate an import).",
+)
+async def run_batch(
+    db: db_dependency, operations: list[BatchOperation], dry_run: bool = False
+):
+    results = []
+
+    with single_transaction(db, rollback=dry_run) as batch_db:
+        for index, operation in enumerate(operations):
+            try:
+                results.append(
+                    await _run_operation(batch_db, index, operation, results)
+                )
+            except HTTPException as exc_info:
+                logger.debug(
+                    "Batch operation %s (%s) failed: %s",
+                    index,
+                    operation.op.value,
+                    exc_info.detail,
+                )
+                if isinstance(exc_info.detail, dict):
+                    raise
+                raise HTTPException(
+                    exc_info.status_code,
+                    {
+                        "index": index,
+                        "op": operation.op.value,
+                        "detail": exc_info.detail,
+                    },
+                )
+
+    if dry_run:
+        logger.debug("Dry run of %s operations was rolled back.", len(results))
+    else:
+        logger.debug("Batch of %s operations was successfully committed.", len(results))
+
+    return results
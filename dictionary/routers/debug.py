@@ -0,0 +1,35 @@
+import logging
+
+from fastapi import APIRouter, HTTPException
+
+from dictionary.profiler import profiles
+
+logger = logging.getLogger(__name__)
+
+
+router = APIRouter(prefix="/debug", tags=["debug"])
+
+
+@router.get(
+    "/sql",
+    status_code=200,
+    description="Summaries of the last profiled requests (the most recent first).",
+)
+async def get_sql_profiles():
+    return [
+        {key: value for key, value in profile.summary().items() if key != "statements"}
+        for profile in profiles.all()
+    ]
+
+
+@router.get(
+    "/sql/{request_id}",
+    status_code=200,
+    description="SQL profile of the request: statements grouped by fingerprint \
+        with number of executions and total duration, and suspected N+1 queries.",
+)
+async def get_sql_profile(request_id: str):
+    profile = profiles.get(request_id)
+    if profile is None:
+        raise HTTPException(404, f"No SQL profile of request {request_id}.")
+    return profile.summary()
@@ -1,21 +1,43 @@
-import datetime
 import logging
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import delete, func, insert, select, tuple_
+from sqlalchemy import update as update_statement
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+from dictionary.config import config
 from dictionary.database import get_db
+from dictionary.enums import ConflictAction, LinkStatus, UpsertStatus
+from dictionary.logging_config import Capped
 from dictionary.models import Description, Word, WordDescription
+from dictionary.queries import (
+    DESCRIPTION_COLUMNS,
+    delete_orphan_descriptions,
+    fetch_all_descriptions,
+    fetch_existing_ids,
+    fetch_word,
+    fetch_word_descriptions,
+    fetch_word_with_descriptions,
+    record_tombstones,
+    upsert,
+    upsert_inserted,
+)
+from dictionary.responses import negotiated_response
 from dictionary.schemas import (
     AllDescriptions,
+    BulkDeleteReturn,
     DescriptionModel,
     DescriptionReturn,
     DescriptionUpdate,
+    DescriptionUpsertReturn,
+    OrphanSweepReturn,
+    WordDescriptionLink,
+    WordDescriptionLinkResult,
     WordDescriptionsModel,
 )
-from dictionary.utils import integrity_error_handler
+from dictionary.utils import integrity_error_handler, sparse_fields
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +47,8 @@ router = APIRouter(prefix="/descriptions", tags=["descriptions"])
 
 db_dependency = Annotated[Session, Depends(get_db)]
 
+fields_dependency = Annotated[list, Depends(sparse_fields(*DESCRIPTION_COLUMNS))]
+
 
 @router.get(
     "/all",
@@ -34,13 +58,18 @@ db_dependency = Annotated[Session, Depends(get_db)]
     status_code=200,
     description="Fetch all the data from the Words table.",
 )
-async def get_all_descriptions(db: db_dependency):
-    query = db.query(Description)
+async def get_all_descriptions(
+    db: db_dependency, request: Request, fields: fields_dependency
+):
+    descriptions = fetch_all_descriptions(db, fields)
 
-    if not query.all():
+    if not descriptions:
         raise HTTPException(404, "No descriptions stored in the database.")
 
-    return {"number_of_descriptions": query.count(), "descriptions": query.all()}
+    return negotiated_response(
+        request,
+        {"number_of_descriptions": len(descriptions), "descriptions": descriptions},
+    )
 
 
 @router.get(
@@ -59,38 +88,117 @@ async def get_single_description(db: db_dependency, desc_id: int):
     return desc
 
 
-@router.post("/add/{word_id}", response_model=WordDescriptionsModel, status_code=201)
+@router.post(
+    "/add/{word_id}",
+    response_model=WordDescriptionsModel,
+    status_code=201,
+    description="Add a new description to the word. Returns the word with all its \
+        descriptions - the new description is the last one.",
+)
 async def add_a_new_description(
     db: db_dependency, word_id: int, new_desc: DescriptionModel
 ):
-    word = db.query(Word).filter_by(id=word_id).first()
+    word, desc = fetch_word_with_descriptions(db, word_id)
     if not word:
         raise HTTPException(404, "Word not found.")
 
     try:
-        description = Description(**new_desc.model_dump())
-        db.add(description)
+        description = (
+            db.execute(
+                insert(Description)
+                .values(**new_desc.model_dump())
+                .returning(*DESCRIPTION_COLUMNS)
+            )
+            .mappings()
+            .one()
+        )
+        db.execute(
+            insert(WordDescription).values(
+                word_id=word_id, description_id=description["id"]
+            )
+        )
         db.commit()
 
-        association_table = WordDescription(
-            word_id=word_id, description_id=description.id
+    except IntegrityError as exc:
+        integrity_error_handler(exc)
+
+    logger.debug("Description with ID: %s was successfully created.", description["id"])
+
+    return {"word": word, "description": [*desc, description]}
+
+
+@router.put(
+    "/upsert",
+    response_model=DescriptionUpsertReturn,
+    response_model_exclude_none=True,
+    status_code=200,
+    description="Add a new description or, if the description (in_polish) already \
+        exists, update it (on_conflict=update) or leave it unchanged \
+        (on_conflict=nothing). Returns 201 only if the description was created.",
+)
+async def upsert_description(
+    db: db_dependency,
+    response: Response,
+    new_desc: DescriptionModel,
+    on_conflict: ConflictAction = ConflictAction.UPDATE,
+):
+    statement = upsert(db, Description).values(**new_desc.model_dump())
+    if on_conflict == ConflictAction.UPDATE:
+        # Updating only if any value differs - repeated calls do not touch the row
+        excluded = statement.excluded
+        statement = statement.on_conflict_do_update(
+            index_elements=[Description.in_polish],
+            set_={
+                "type": excluded.type,
+                "in_english": excluded.in_english,
+                "example": excluded.example,
+                "updated": func.statement_timestamp(),
+            },
+            where=Description.type.is_distinct_from(excluded.type)
+            | Description.in_english.is_distinct_from(excluded.in_english)
+            | Description.example.is_distinct_from(excluded.example),
         )
-        db.add(association_table)
-        db.commit()
+    else:
+        statement = statement.on_conflict_do_nothing(
+            index_elements=[Description.in_polish]
+        )
+
+    inserted = upsert_inserted(db, Description)
+    description = (
+        db.execute(statement.returning(*DESCRIPTION_COLUMNS, inserted))
+        .mappings()
+        .first()
+    )
 
-        desc = (
-            db.query(Description)
-            .join(WordDescription, WordDescription.description_id == Description.id)
-            .filter(WordDescription.word_id == word_id)
-            .all()
+    if description:
+        status = (
+            UpsertStatus.CREATED if description["inserted"] else UpsertStatus.UPDATED
         )
+    else:
+        status = UpsertStatus.UNCHANGED
+        description = (
+            db.execute(
+                select(*DESCRIPTION_COLUMNS).where(
+                    Description.in_polish == new_desc.in_polish
+                )
+            )
+            .mappings()
+            .one_or_none()
+        )
+        if not description:
+            # Deleted by another request after the conflict was detected
+            raise HTTPException(
+                404,
+                f"Description '{new_desc.in_polish}' was deleted meanwhile, try again.",
+            )
+    db.commit()
 
-    except IntegrityError as exc:
-        integrity_error_handler(exc)
+    if status == UpsertStatus.CREATED:
+        response.status_code = 201
 
-    logger.debug("Description with ID: %s was successfully created." % (description.id))
+    logger.debug("Description with ID: %s upsert: %s.", description["id"], status)
 
-    return {"word": word, "description": desc}
+    return {"status": status, "description": description}
 
 
 @router.post(
@@ -100,38 +208,125 @@ async def add_a_new_description(
     description="Assign an existing description to the existing word.",
 )
 async def assign_description_to_a_word(db: db_dependency, word_id: int, desc_id: int):
-    word = db.query(Word).filter_by(id=word_id).first()
+    word = fetch_word(db, word_id)
     if not word:
         raise HTTPException(404, f"Word with ID: {word_id} was not found.")
 
-    description = db.query(Description).filter_by(id=desc_id).first()
-    if not description:
+    if not db.scalar(select(Description.id).where(Description.id == desc_id)):
         raise HTTPException(404, f"Description with ID: {desc_id} was not found.")
 
-    association_table = WordDescription(word_id=word_id, description_id=desc_id)
-
     try:
-        db.add(association_table)
-        db.commit()
-
-        desc = (
-            db.query(Description)
-            .join(WordDescription, WordDescription.description_id == Description.id)
-            .filter(WordDescription.word_id == word_id)
-            .all()
+        db.execute(
+            insert(WordDescription).values(word_id=word_id, description_id=desc_id)
         )
+        desc = fetch_word_descriptions(db, word_id)
+        db.commit()
 
     except IntegrityError as exc:
         integrity_error_handler(exc)
 
     logger.debug(
-        "Description with ID: %s was successfully assigned to a word (id: %s)."
-        % (description.id, word.id)
+        "Description with ID: %s was successfully assigned to a word (id: %s).",
+        desc_id,
+        word_id,
     )
 
     return {"word": word, "description": desc}
 
 
+@router.post(
+    "/assign",
+    response_model=list[WordDescriptionLinkResult],
+    status_code=200,
+    description="Assign many existing descriptions to existing words. \
+        Returns the status of each word-description pair.",
+)
+async def assign_descriptions_to_words(
+    db: db_dependency, links: list[WordDescriptionLink]
+):
+    pairs = list(dict.fromkeys((link.word_id, link.description_id) for link in links))
+    word_ids = fetch_existing_ids(db, Word.id, {pair[0] for pair in pairs})
+    desc_ids = fetch_existing_ids(db, Description.id, {pair[1] for pair in pairs})
+
+    not_found, valid_pairs = {}, []
+    for word_id, desc_id in pairs:
+        if word_id not in word_ids:
+            not_found[(word_id, desc_id)] = LinkStatus.WORD_NOT_FOUND
+        elif desc_id not in desc_ids:
+            not_found[(word_id, desc_id)] = LinkStatus.DESCRIPTION_NOT_FOUND
+        else:
+            valid_pairs.append((word_id, desc_id))
+
+    linked = set()
+    if valid_pairs:
+        rows = db.execute(
+            upsert(db, WordDescription)
+            .on_conflict_do_nothing(
+                index_elements=[WordDescription.word_id, WordDescription.description_id]
+            )
+            .returning(WordDescription.word_id, WordDescription.description_id),
+            [
+                {"word_id": word_id, "description_id": desc_id}
+                for word_id, desc_id in valid_pairs
+            ],
+        ).all()
+        linked = {(word_id, desc_id) for word_id, desc_id in rows}
+        db.commit()
+
+    statuses = {
+        pair: not_found.get(pair)
+        or (LinkStatus.LINKED if pair in linked else LinkStatus.ALREADY_LINKED)
+        for pair in pairs
+    }
+
+    logger.debug(
+        "Bulk assign of %s word-description pairs: %s", len(pairs), Capped(statuses)
+    )
+
+    return [
+        {"word_id": word_id, "description_id": desc_id, "status": status}
+        for (word_id, desc_id), status in statuses.items()
+    ]
+
+
+@router.post(
+    "/unassign",
+    response_model=list[WordDescriptionLinkResult],
+    status_code=200,
+    description="Remove many descriptions from words (descriptions are not deleted). \
+        Returns the status of each word-description pair.",
+)
+async def unassign_descriptions_from_words(
+    db: db_dependency, links: list[WordDescriptionLink]
+):
+    pairs = list(dict.fromkeys((link.word_id, link.description_id) for link in links))
+    statuses = dict.fromkeys(pairs, LinkStatus.NOT_LINKED)
+
+    if pairs:
+        unlinked = db.execute(
+            delete(WordDescription)
+            .where(
+                tuple_(WordDescription.word_id, WordDescription.description_id).in_(
+                    pairs
+                )
+            )
+            .returning(WordDescription.word_id, WordDescription.description_id)
+        ).all()
+        record_tombstones(db, WordDescription, unlinked)
+        for word_id, desc_id in unlinked:
+            statuses[(word_id, desc_id)] = LinkStatus.UNLINKED
+        db.commit()
+
+    logger.debug(
+        "Bulk unassign of %s word-description pairs: %s", len(pairs), Capped(statuses)
+    )
+
+    return [
+        {"word_id": word_id, "description_id": desc_id, "status": status}
+        for (word_id, desc_id), status in statuses.items()
+    ]
+
+
 @router.patch(
     "/update/{desc_id}",
     status_code=200,
@@ -144,34 +339,87 @@ async def assign_description_to_a_word(db: db_dependency, word_id: int, desc_id:
 async def update_description(
     db: db_dependency, desc_id: int, update: DescriptionUpdate
 ):
-    description = db.query(Description).filter_by(id=desc_id).first()
-    if not description:
-        raise HTTPException(404, f"Description with ID: {desc_id} was not found.")
-
     fields_to_update = update.model_dump(exclude_unset=True)
-    for field, value in fields_to_update.items():
-        setattr(description, field, value)
-    description.updated = datetime.datetime.now()
 
     try:
+        description = (
+            db.execute(
+                update_statement(Description)
+                .where(Description.id == desc_id)
+                .values(**fields_to_update)
+                .returning(*DESCRIPTION_COLUMNS)
+            )
+            .mappings()
+            .first()
+        )
         db.commit()
-        db.refresh(description)
 
     except IntegrityError as exc:
         integrity_error_handler(exc)
 
-    logger.debug("Description with ID: %s was successfully updated." % (description.id))
+    if not description:
+        raise HTTPException(404, f"Description with ID: {desc_id} was not found.")
+
+    logger.debug("Description with ID: %s was successfully updated.", desc_id)
 
     return description
 
 
 @router.delete("/delete/{desc_id}", status_code=204)
 async def delete_a_description(db: db_dependency, desc_id: int):
-    description = db.query(Description).filter_by(id=desc_id).first()
+    # Associations are removed by the database (ON DELETE CASCADE)
+    description = db.execute(
+        delete(Description).where(Description.id == desc_id).returning(Description.id)
+    ).first()
     if not description:
         raise HTTPException(404, f"Description with the ID: {desc_id} was not found.")
 
-    db.delete(description)
+    record_tombstones(db, Description, [description.id])
+    db.commit()
+
+    logger.debug("Description with ID: %s was successfully deleted.", description.id)
+
+
+@router.delete(
+    "/delete_many",
+    status_code=200,
+    response_model=BulkDeleteReturn,
+    response_model_exclude_none=True,
+    description="Delete many descriptions at once (with their word assignments).",
+)
+async def delete_many_descriptions(
+    db: db_dependency, ids: Annotated[list[int], Query()]
+):
+    ids = list(dict.fromkeys(ids))
+    deleted = db.scalars(
+        delete(Description).where(Description.id.in_(ids)).returning(Description.id)
+    ).all()
+    record_tombstones(db, Description, deleted)
     db.commit()
 
-    logger.debug("Description with ID: %s was successfully deleted." % (description.id))
+    result = {
+        "deleted": sorted(deleted),
+        "not_found": sorted(set(ids) - set(deleted)),
+    }
+
+    logger.debug("Bulk delete of descriptions: %s", Capped(result))
+
+    return result
+
+
+@router.delete(
+    "/orphans",
+    status_code=200,
+    response_model=OrphanSweepReturn,
+    description="Delete all descriptions not assigned to any word. Descriptions are \
+        deleted in batches (each committed separately) of 'batch_size' rows.",
+)
+async def delete_orphan_descriptions_sweep(
+    db: db_dependency,
+    batch_size: int = Query(default=config.ORPHAN_SWEEP_BATCH_SIZE, ge=1),
+):
+    deleted = delete_orphan_descriptions(db, batch_size)
+
+    logger.debug("Orphan sweep deleted %s descriptions.", len(deleted))
+
+    return {"number_of_descriptions": len(deleted), "descriptions": deleted}
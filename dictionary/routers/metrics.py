@@ -0,0 +1,39 @@
+import logging
+
+from fastapi import APIRouter, Response
+
+from dictionary.database import engine
+from dictionary.metrics import CONTENT_TYPE, DB_POOL_CONNECTIONS, REGISTRY
+
+logger = logging.getLogger(__name__)
+
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+# Pool statistics are read on scrape (QueuePool methods)
+POOL_STATES = {
+    "size": "size",
+    "checked_in": "checkedin",
+    "checked_out": "checkedout",
+    "overflow": "overflow",
+}
+
+
+def collect_pool_connections():
+    for state, method in POOL_STATES.items():
+        if hasattr(engine.pool, method):
+            DB_POOL_CONNECTIONS.set(getattr(engine.pool, method)(), state=state)
+
+
+REGISTRY.collectors.append(collect_pool_connections)
+
+
+@router.get(
+    "",
+    response_class=Response,
+    status_code=200,
+    description="Application metrics in the Prometheus text exposition format.",
+)
+async def get_metrics():
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
@@ -1,15 +1,23 @@
 import logging
 import random
+from collections.abc import Callable
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 
+from dictionary.config import config
 from dictionary.database import get_db
 from dictionary.enums import MasterLevel
 from dictionary.exceptions import DatabaseError
+from dictionary.logging_config import Capped
+from dictionary.metrics import SHUFFLE_DRAWS
 from dictionary.models import Description, LevelWeight, Word
-from dictionary.schemas import LevelReturn
+from dictionary.responses import negotiated_response
+from dictionary.schemas import LevelReturn, StudyLevelReturn
+from dictionary.snapshot import LEVELS, LoadedSnapshot, snapshot_fallback
+from dictionary.write_behind import write_behind
 
 logger = logging.getLogger(__name__)
 
@@ -45,6 +53,49 @@ class Shuffle:
         word_list.insert(0, word)
         cls.recent_words = word_list[:3]
 
+    @classmethod
+    def state(cls) -> dict:
+        "State of the shuffle kept across restarts (SHUFFLE_STATE_FILE)."
+        return {
+            "recent_words": cls.recent_words,
+            "last_description": cls.last_description,
+        }
+
+    @classmethod
+    def restore_state(cls, state: dict):
+        cls.recent_words = list(state.get("recent_words", []))[:3]
+        cls.last_description = state.get("last_description")
+
+    @classmethod
+    def _draw_new_word(
+        cls, draw: Callable[[], tuple[int, str]], count: int
+    ) -> tuple[int, str]:
+        """Draws words until a word not in recent_words is drawn (if there are
+        more than 3 words) and adds it to recent_words.
+        Returns word ID and the word as a tuple."""
+        # Looping over the random words to add a new word to the recent_words list
+        # Goal: if the database has more than 3 records, last 3 random words should be unique
+        logger.debug("recent_words list at the beginning: %s", cls.recent_words)
+        if count > 3:
+            new_word = False
+            while not new_word:
+                selected_word = draw()
+                logger.debug(
+                    "Random word: %s (ID: %s)", selected_word[1], selected_word[0]
+                )
+                try:
+                    cls._update_recent_words(selected_word[1])
+                    new_word = True
+                except ValueError:
+                    continue
+        else:
+            selected_word = draw()
+            cls.recent_words.insert(0, selected_word[1])
+            cls.recent_words = cls.recent_words[:3]
+        logger.debug("recent_words list at the end: %s", cls.recent_words)
+
+        return selected_word
+
     @classmethod
     def update_level(cls, db: Session, level: MasterLevel, value: float):
         """Sets a new value or updates the value of the master level weight.
@@ -70,7 +121,23 @@ class Shuffle:
         db.commit()
         db.refresh(db_level)
 
-        logger.debug("Level '%s' weight updated to '%s'." % (level, value))
+        logger.debug("Level '%s' weight updated to '%s'.", level, value)
+
+    @classmethod
+    def level_weights(cls, db: Session) -> dict[MasterLevel, float]:
+        """Returns weight of each master level (new weight if set, default weight
+        otherwise)."""
+        levels = cls.database_levels(db)
+        if not levels:
+            raise DatabaseError("No levels specified in the database.", status_code=404)
+
+        # Use new_weight if not None, fall back to default_weight
+        return {
+            level.level: level.new_weight
+            if level.new_weight is not None
+            else level.default_weight
+            for level in levels
+        }
 
     @classmethod
     def fetch_word(cls, db: Session):
@@ -85,54 +152,26 @@ class Shuffle:
         if not words:
             raise DatabaseError("No words found in the database.", status_code=404)
 
-        levels = cls.database_levels(db)
-        if not levels:
-            raise DatabaseError("No levels specified in the database.", status_code=404)
-
-        # Mapping the levels with weights
-        level_weights = {
-            level.level: {"default": level.default_weight, "new": level.new_weight}
-            for level in levels
-        }
-        logger.debug("Level weights: %s." % level_weights)
+        level_weights = cls.level_weights(db)
+        logger.debug("Level weights: %s.", level_weights)
 
         # Creating a list of tuples with two values (word itself, level weight)
         word_with_weight_list = [
-            (
-                (word.id, word.word),
-                level_weights[word.master_level]["new"]  # Use new_weight if not None
-                if level_weights[word.master_level]["new"] is not None
-                else level_weights[word.master_level][
-                    "default"
-                ],  # Fall back to default_weight
-            )
-            for word in words
+            ((word.id, word.word), level_weights[word.master_level]) for word in words
         ]
-        logger.debug("List of words with weights: %s" % word_with_weight_list)
+        logger.debug("List of words with weights: %s", Capped(word_with_weight_list))
 
         # Unpacking the words and their corresponding weights into separate lists
         words_list, weights = zip(*word_with_weight_list)
 
-        # Looping over the random words to add a new word to the recent_words list
-        # Goal: if the database has more than 3 records, last 3 random words should be unique
-        logger.debug("recent_words list at the beginning: %s" % cls.recent_words)
-        if len(words) > 3:
-            new_word = False
-            while not new_word:
-                selected_word = random.choices(words_list, weights=weights, k=1)[0]
-                logger.debug(
-                    "Random word: %s (ID: %s)" % (selected_word[1], selected_word[0])
-                )
-                try:
-                    cls._update_recent_words(selected_word[1])
-                    new_word = True
-                except ValueError:
-                    continue
-        else:
-            selected_word = random.choices(words_list, weights=weights, k=1)[0]
-            cls.recent_words.insert(0, selected_word[1])
-            cls.recent_words = cls.recent_words[:3]
-        logger.debug("recent_words list at the end: %s" % cls.recent_words)
+        selected_word = cls._draw_new_word(
+            lambda: random.choices(words_list, weights=weights, k=1)[0], len(words)
+        )
+
+        selected_level = next(
+            word.master_level for word in words if word.id == selected_word[0]
+        )
+        SHUFFLE_DRAWS.inc(level=selected_level.value)
 
         return selected_word
 
@@ -152,20 +191,78 @@ class Shuffle:
 
         new = False
         while not new:
-            logger.debug("Last decription: %s" % cls.last_description)
+            logger.debug("Last decription: %s", cls.last_description)
             selected_description = random.choice(descriptions)
             if selected_description[1] != cls.last_description:
                 cls.last_description = selected_description[1]
                 new = True
-        logger.debug("New decription: %s" % cls.last_description)
+        logger.debug("New decription: %s", cls.last_description)
 
         return selected_description
 
+    @classmethod
+    def fetch_word_from_snapshot(cls, loaded: LoadedSnapshot):
+        """Extract random word/sentence from the snapshot (database unavailable),
+        with the master level weights of the snapshot.
+        Returns word ID and the word as a tuple."""
+        snapshot = loaded.snapshot
+        if not len(snapshot):
+            raise DatabaseError("No words found in the snapshot.", status_code=404)
+
+        def draw() -> tuple[int, str]:
+            index = loaded.shuffle.draw(loaded.rng)
+            return snapshot.word_ids[index], snapshot.word_text(index)
+
+        selected_word = cls._draw_new_word(draw, len(snapshot))
+        index = snapshot.word_index(selected_word[0])
+        SHUFFLE_DRAWS.inc(level=LEVELS[snapshot.word_levels[index]].value)
+
+        return selected_word
+
+    @classmethod
+    def fetch_description_from_snapshot(cls, loaded: LoadedSnapshot):
+        """Extract random description from the snapshot (database unavailable).
+        Returns description ID and description in Polish as a tuple."""
+        snapshot = loaded.snapshot
+        count = len(snapshot.description_ids)
+        if not count:
+            raise DatabaseError(
+                "No descriptions found in the snapshot.", status_code=404
+            )
+
+        while True:
+            index = loaded.rng.randrange(count)
+            selected_description = (
+                snapshot.description_ids[index],
+                snapshot.in_polish(index),
+            )
+            if count == 1 or selected_description[1] != cls.last_description:
+                cls.last_description = selected_description[1]
+                return selected_description
+
+
+def random_word_from_snapshot(loaded: LoadedSnapshot) -> dict:
+    try:
+        word = Shuffle.fetch_word_from_snapshot(loaded)
+    except DatabaseError as exc_info:
+        raise HTTPException(exc_info.status_code, str(exc_info))
+    return {"word": word[1], "id": word[0]}
+
+
+def random_description_from_snapshot(loaded: LoadedSnapshot) -> dict:
+    try:
+        desc = Shuffle.fetch_description_from_snapshot(loaded)
+    except DatabaseError as exc_info:
+        raise HTTPException(exc_info.status_code, str(exc_info))
+    return {"description": desc[1], "id": desc[0]}
+
 
 @router.get("/all_levels", response_model=LevelReturn)
-async def get_all_levels(db: db_dependency):
+async def get_all_levels(db: db_dependency, request: Request):
     levels = Shuffle.database_levels(db)
-    return {"levels": levels}
+    return negotiated_response(
+        request, LevelReturn.model_validate({"levels": levels}).model_dump()
+    )
 
 
 @router.post("/lvl_weight/update")
@@ -178,6 +275,7 @@ async def update_level_weight(
 
 
 @router.get("/random_word")
+@snapshot_fallback(random_word_from_snapshot)
 async def get_random_word(db: db_dependency):
     try:
         word = Shuffle.fetch_word(db)
@@ -189,6 +287,7 @@ async def get_random_word(db: db_dependency):
 
 
 @router.get("/random_desc")
+@snapshot_fallback(random_description_from_snapshot)
 async def get_random_description(db: db_dependency):
     try:
         desc = Shuffle.fetch_description(db)
@@ -197,3 +296,35 @@ async def get_random_description(db: db_dependency):
         raise HTTPException(
             exc_info.status_code if exc_info.status_code else 404, str(exc_info)
         )
+
+
+@router.patch(
+    "/level/{word_id}",
+    response_model=StudyLevelReturn,
+    status_code=200,
+    description="Set the master level of the word while studying. With the \
+        write-behind buffer enabled the change is saved later (202 returned) and \
+        changes of not existing words are skipped silently. If the buffer can not \
+        be flushed, changes are saved directly (200 returned).",
+)
+async def update_study_level(
+    db: db_dependency, response: Response, word_id: int, level: MasterLevel
+):
+    if config.WRITE_BEHIND_ENABLED and await write_behind.record(word_id, level):
+        response.status_code = 202
+        return {"word_id": word_id, "master_level": level, "buffered": True}
+
+    word = db.scalar(
+        update(Word)
+        .where(Word.id == word_id)
+        .values(master_level=level)
+        .returning(Word.id)
+    )
+    if not word:
+        raise HTTPException(404, f"Word with the ID: {word_id} was not found.")
+    write_behind.discard([word_id])
+    db.commit()
+
+    logger.debug("Master level of the word with ID: %s set to '%s'.", word_id, level)
+
+    return {"word_id": word_id, "master_level": level, "buffered": False}
@@ -0,0 +1,82 @@
+import datetime
+import logging
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from dictionary.config import config
+from dictionary.database import get_db
+from dictionary.models import Description, Tombstone, Word, WordDescription
+from dictionary.responses import negotiated_response
+from dictionary.schemas import SyncReturn
+
+logger = logging.getLogger(__name__)
+
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+
+db_dependency = Annotated[Session, Depends(get_db)]
+
+
+@router.get(
+    "",
+    response_model=SyncReturn,
+    response_model_exclude_none=True,
+    status_code=200,
+    description="Fetch records created, changed or deleted since the given token. \
+        Without the token all records are returned. Use the returned token in the \
+        next call. **NOTE**: The token is moved back by SYNC_OVERLAP_SECONDS, so the \
+        records changed shortly before a sync are returned again by the next one \
+        (apply the changes idempotently - by ID). Deleting a word or a description \
+        also removes all of its word-description associations.",
+)
+async def get_changes(
+    db: db_dependency, request: Request, since: datetime.datetime | None = None
+):
+    # Taking the token before reading the data, so that changes made
+    # while the request is processed are returned again with the next call.
+    # Records get the time of their statement, which can be committed later (after
+    # this sync) - the overlap covers the write transactions still in progress.
+    token = db.scalar(select(func.statement_timestamp())) - datetime.timedelta(
+        seconds=config.SYNC_OVERLAP_SECONDS
+    )
+
+    words = db.query(Word)
+    descriptions = db.query(Description)
+    word_descriptions = db.query(WordDescription)
+    deleted = []
+
+    if since:
+        words = words.filter(Word.updated >= since)
+        descriptions = descriptions.filter(Description.updated >= since)
+        word_descriptions = word_descriptions.filter(WordDescription.created >= since)
+        deleted = (
+            db.query(Tombstone)
+            .filter(Tombstone.deleted >= since)
+            .order_by(Tombstone.id)
+            .all()
+        )
+
+    changes = {
+        "token": token,
+        "words": words.all(),
+        "descriptions": descriptions.all(),
+        "word_descriptions": word_descriptions.all(),
+        "deleted": deleted,
+    }
+
+    logger.debug(
+        "Sync since %s: %s words, %s descriptions, %s associations, %s deletions.",
+        since,
+        len(changes["words"]),
+        len(changes["descriptions"]),
+        len(changes["word_descriptions"]),
+        len(changes["deleted"]),
+    )
+
+    return negotiated_response(
+        request, SyncReturn.model_validate(changes).model_dump(exclude_none=True)
+    )
@@ -1,22 +1,47 @@
-import datetime
 import logging
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy import update as update_statement
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+from dictionary.config import config
 from dictionary.database import get_db
+from dictionary.enums import ConflictAction, UpsertStatus
+from dictionary.logging_config import Capped
 from dictionary.models import Description, Word, WordDescription
+from dictionary.queries import (
+    DESCRIPTION_COLUMNS,
+    WORD_COLUMNS,
+    delete_orphan_descriptions,
+    fetch_all_words,
+    fetch_descriptions_by_word,
+    fetch_existing_ids,
+    fetch_word_descriptions,
+    fetch_word_translations,
+    record_tombstones,
+    update_word_levels,
+    upsert,
+    upsert_inserted,
+)
+from dictionary.responses import negotiated_response
 from dictionary.schemas import (
     AllWords,
-    DescriptionReturn,
+    BulkDeleteReturn,
     WordDescriptionsModel,
+    WordLevelsReturn,
+    WordLevelsUpdate,
     WordModel,
     WordReturn,
     WordUpdate,
+    WordUpsertReturn,
+    WordWithDescriptionsModel,
 )
-from dictionary.utils import integrity_error_handler
+from dictionary.snapshot import LoadedSnapshot, snapshot_fallback
+from dictionary.utils import integrity_error_handler, sparse_fields
+from dictionary.write_behind import write_behind
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +51,13 @@ router = APIRouter(prefix="/words", tags=["words"])
 
 db_dependency = Annotated[Session, Depends(get_db)]
 
+fields_dependency = Annotated[list, Depends(sparse_fields(*WORD_COLUMNS))]
+
+description_fields_dependency = Annotated[
+    list,
+    Depends(sparse_fields(*DESCRIPTION_COLUMNS, parameter="description_fields")),
+]
+
 
 @router.get(
     "/descriptions",
@@ -34,29 +66,26 @@ db_dependency = Annotated[Session, Depends(get_db)]
     response_model_exclude_none=True,
     response_model_exclude_unset=True,
 )
-async def get_all_dict_data(db: db_dependency):
-    words = db.query(Word).all()
+async def get_all_dict_data(
+    db: db_dependency,
+    request: Request,
+    fields: fields_dependency,
+    description_fields: description_fields_dependency,
+):
+    # The word ID is needed to match the descriptions (returned only if requested)
+    with_id = Word.id in fields
+    words = fetch_all_words(db, fields if with_id else [Word.id, *fields])
     if not words:
         raise HTTPException(404, "Empty database.")
 
+    # Two queries in total (words, descriptions of all words)
+    descriptions = fetch_descriptions_by_word(db, description_fields)
     result = []
     for word in words:
-        descriptions = (
-            db.query(Description)
-            .join(WordDescription, WordDescription.description_id == Description.id)
-            .filter(WordDescription.word_id == word.id)
-            .all()
-        )
-
-        # Converting SQLAlchemy objects to Pydantic models
-        word_data = WordReturn.model_validate(word)
-        description_data = [
-            DescriptionReturn.model_validate(desc) for desc in descriptions
-        ]
+        word_id = word["id"] if with_id else word.pop("id")
+        result.append({"word": word, "description": descriptions.get(word_id, [])})
 
-        result.append({"word": word_data, "description": description_data})
-
-    return result
+    return negotiated_response(request, result)
 
 
 @router.get(
@@ -67,10 +96,43 @@ async def get_all_dict_data(db: db_dependency):
     status_code=200,
     description="Fetch all the data from the Words table.",
 )
-async def get_all_words(db: db_dependency):
-    query = db.query(Word)
+async def get_all_words(db: db_dependency, request: Request, fields: fields_dependency):
+    words = fetch_all_words(db, fields)
 
-    return {"number_of_words": query.count(), "words": query.all()}
+    return negotiated_response(request, {"number_of_words": len(words), "words": words})
+
+
+def translations_from_snapshot(
+    loaded: LoadedSnapshot, word_id: int | None = None, search: str | None = None
+):
+    snapshot = loaded.snapshot
+    if word_id:
+        index = snapshot.word_index(word_id)
+        if index is None:
+            raise HTTPException(
+                404, f"No word with ID {word_id} stored in the database."
+            )
+        translation_list = [
+            snapshot.in_polish(desc) for desc in snapshot.word_descriptions(index)
+        ]
+        if not translation_list:
+            raise HTTPException(404, "No translations stored in the database.")
+
+        return {"word": snapshot.word_text(index), "translation": translation_list}
+
+    indexes = loaded.search.search(search)
+    if not indexes:
+        raise HTTPException(404, f"No word '{search}' stored in the database.")
+
+    return [
+        {
+            "word": {"word": snapshot.word_text(index), "id": snapshot.word_ids[index]},
+            "translation": [
+                snapshot.in_polish(desc) for desc in snapshot.word_descriptions(index)
+            ],
+        }
+        for index in indexes
+    ]
 
 
 @router.get(
@@ -79,6 +141,7 @@ async def get_all_words(db: db_dependency):
     status_code=200,
     description="Search for word translations by word ID or the word itself.",
 )
+@snapshot_fallback(translations_from_snapshot)
 async def get_word_translations(
     db: db_dependency, word_id: int | None = None, search: str | None = None
 ):
@@ -87,49 +150,29 @@ async def get_word_translations(
 
     # If user searches using word_id parameter
     if word_id:
-        word = db.query(Word).filter_by(id=word_id).first()
+        words = fetch_word_translations(db, Word.id == word_id)
 
-        if not word:
+        if not words:
             raise HTTPException(
                 404, f"No word with ID {word_id} stored in the database."
             )
-
-        translations = (
-            db.query(Description.in_polish)
-            .join(WordDescription, WordDescription.description_id == Description.id)
-            .filter(WordDescription.word_id == word_id)
-            .all()
-        )
-        if not translations:
+        if not words[0]["translation"]:
             raise HTTPException(404, "No translations stored in the database.")
 
-        translation_list = [translation[0] for translation in translations]
-
-        return {"word": word.word, "translation": translation_list}
+        return {"word": words[0]["word"], "translation": words[0]["translation"]}
 
     # If user searches using search parameter
-    words = db.query(Word).filter(Word.word.icontains(search)).all()
+    words = fetch_word_translations(db, Word.word.icontains(search))
     if not words:
         raise HTTPException(404, f"No word '{search}' stored in the database.")
 
-    results = []
-    for record in words:
-        translations = (
-            db.query(Description.in_polish)
-            .join(WordDescription, WordDescription.description_id == Description.id)
-            .filter(WordDescription.word_id == record.id)
-            .all()
-        )
-
-        translation_list = [translation[0] for translation in translations]
-        results.append(
-            {
-                "word": {"word": record.word, "id": record.id},
-                "translation": translation_list,
-            }
-        )
-
-    return results
+    return [
+        {
+            "word": {"word": word["word"], "id": word["id"]},
+            "translation": word["translation"],
+        }
+        for word in words
+    ]
 
 
 @router.get(
@@ -160,21 +203,154 @@ async def get_single_word(db: db_dependency, word_id: int):
 
 @router.post("/add", response_model=WordReturn, status_code=201)
 async def add_a_new_word(db: db_dependency, new_word: WordModel):
-    model = new_word.model_dump()
-    word = Word(**model)
-
     try:
-        db.add(word)
+        word = (
+            db.execute(
+                insert(Word).values(**new_word.model_dump()).returning(*WORD_COLUMNS)
+            )
+            .mappings()
+            .one()
+        )
         db.commit()
 
     except IntegrityError as exc:
         integrity_error_handler(exc)
 
-    logger.debug("Word '%s' (id: %s) was successfully created." % (word.word, word.id))
+    logger.debug(
+        "Word '%s' (id: %s) was successfully created.", word["word"], word["id"]
+    )
 
     return word
 
 
+@router.post(
+    "/add_with_descriptions",
+    response_model=WordDescriptionsModel,
+    response_model_exclude_none=True,
+    status_code=201,
+    description="Add a new word with its descriptions in one transaction. \
+        Descriptions can be given as new descriptions or IDs of existing ones.",
+)
+async def add_a_new_word_with_descriptions(
+    db: db_dependency, new_word: WordWithDescriptionsModel
+):
+    new_descriptions = [
+        desc.model_dump() for desc in new_word.descriptions if not isinstance(desc, int)
+    ]
+    description_ids = list(
+        dict.fromkeys(desc for desc in new_word.descriptions if isinstance(desc, int))
+    )
+
+    if description_ids:
+        existing = fetch_existing_ids(db, Description.id, description_ids)
+        missing = [desc_id for desc_id in description_ids if desc_id not in existing]
+        if missing:
+            raise HTTPException(
+                404, f"Descriptions with IDs: {missing} were not found."
+            )
+
+    try:
+        word = (
+            db.execute(
+                insert(Word)
+                .values(**new_word.model_dump(exclude={"descriptions"}))
+                .returning(*WORD_COLUMNS)
+            )
+            .mappings()
+            .one()
+        )
+        if new_descriptions:
+            description_ids += db.scalars(
+                insert(Description).returning(
+                    Description.id, sort_by_parameter_order=True
+                ),
+                new_descriptions,
+            ).all()
+        if description_ids:
+            db.execute(
+                insert(WordDescription),
+                [
+                    {"word_id": word["id"], "description_id": desc_id}
+                    for desc_id in description_ids
+                ],
+            )
+        desc = fetch_word_descriptions(db, word["id"])
+        db.commit()
+
+    except IntegrityError as exc:
+        db.rollback()  # nothing of the entry should be left in the session
+        integrity_error_handler(exc)
+
+    logger.debug(
+        "Word '%s' (id: %s) was successfully created with %s descriptions.",
+        word["word"],
+        word["id"],
+        len(desc),
+    )
+
+    return {"word": word, "description": desc}
+
+
+@router.put(
+    "/upsert",
+    response_model=WordUpsertReturn,
+    response_model_exclude_none=True,
+    status_code=200,
+    description="Add a new word or, if the word already exists, update it \
+        (on_conflict=update) or leave it unchanged (on_conflict=nothing). \
+        Returns 201 only if the word was created.",
+)
+async def upsert_word(
+    db: db_dependency,
+    response: Response,
+    new_word: WordModel,
+    on_conflict: ConflictAction = ConflictAction.UPDATE,
+):
+    statement = upsert(db, Word).values(**new_word.model_dump())
+    if on_conflict == ConflictAction.UPDATE:
+        # Updating only if any value differs - repeated calls do not touch the row
+        statement = statement.on_conflict_do_update(
+            index_elements=[Word.word],
+            set_={
+                "master_level": statement.excluded.master_level,
+                "notes": statement.excluded.notes,
+                "updated": func.statement_timestamp(),
+            },
+            where=Word.master_level.is_distinct_from(statement.excluded.master_level)
+            | Word.notes.is_distinct_from(statement.excluded.notes),
+        )
+    else:
+        statement = statement.on_conflict_do_nothing(index_elements=[Word.word])
+
+    inserted = upsert_inserted(db, Word)
+    word = db.execute(statement.returning(*WORD_COLUMNS, inserted)).mappings().first()
+
+    if word:
+        status = UpsertStatus.CREATED if word["inserted"] else UpsertStatus.UPDATED
+    else:
+        status = UpsertStatus.UNCHANGED
+        word = (
+            db.execute(select(*WORD_COLUMNS).where(Word.word == new_word.word))
+            .mappings()
+            .one_or_none()
+        )
+        if not word:
+            # Deleted by another request after the conflict was detected
+            raise HTTPException(
+                404, f"Word '{new_word.word}' was deleted meanwhile, try again."
+            )
+    # The buffered study changes are older than the level of the upsert
+    write_behind.discard([word["id"]])
+    db.commit()
+
+    if status == UpsertStatus.CREATED:
+        response.status_code = 201
+
+    logger.debug("Word '%s' (id: %s) upsert: %s.", word["word"], word["id"], status)
+
+    return {"status": status, "word": word}
+
+
 @router.patch(
     "/update/{word_id}",
     status_code=200,
@@ -185,38 +361,132 @@ async def add_a_new_word(db: db_dependency, new_word: WordModel):
         with 'null' value will remove field content.",
 )
 async def update_word(db: db_dependency, word_id: int, update: WordUpdate):
-    word = db.query(Word).filter_by(id=word_id).first()
-    if not word:
-        raise HTTPException(404, f"Word with ID: {word_id} was not found.")
-    sentence = word.word
-
     fields_to_update = update.model_dump(exclude_unset=True)
-    for field, value in fields_to_update.items():
-        setattr(word, field, value)
-    word.updated = datetime.datetime.now()
 
     try:
+        word = (
+            db.execute(
+                update_statement(Word)
+                .where(Word.id == word_id)
+                .values(**fields_to_update)
+                .returning(*WORD_COLUMNS)
+            )
+            .mappings()
+            .first()
+        )
+        if "master_level" in fields_to_update:
+            write_behind.discard([word_id])
         db.commit()
-        db.refresh(word)
 
     except IntegrityError as exc:
         integrity_error_handler(exc)
 
+    if not word:
+        raise HTTPException(404, f"Word with ID: {word_id} was not found.")
+
     logger.debug(
-        "Word '%s' (id: %s) was successfully updated to '%s'."
-        % (sentence, word.id, word.word)
+        "Word (id: %s) was successfully updated to '%s'.", word["id"], word["word"]
     )
 
     return word
 
 
+@router.patch(
+    "/levels",
+    status_code=200,
+    response_model=WordLevelsReturn,
+    description="Update master level of many words at once - either with a map of \
+        word IDs to levels or with a filter (current level and/or search phrase) \
+        and the target level. Words already on the target level are skipped.",
+)
+async def update_word_levels_bulk(db: db_dependency, update: WordLevelsUpdate):
+    if update.levels is not None and update.level is not None:
+        raise HTTPException(400, "The 'level' can't be given together with 'levels'.")
+    if update.filter is not None and not (
+        update.filter.master_level or update.filter.search
+    ):
+        # An empty filter would update all the words
+        raise HTTPException(400, "The 'filter' must have 'master_level' or 'search'.")
+
+    if update.levels is not None:
+        word_ids = update_word_levels(db, update.levels)
+    else:
+        conditions = [Word.master_level.is_distinct_from(update.level)]
+        if update.filter.master_level:
+            conditions.append(Word.master_level == update.filter.master_level)
+        if update.filter.search:
+            conditions.append(Word.word.icontains(update.filter.search))
+        word_ids = db.scalars(
+            update_statement(Word)
+            .where(*conditions)
+            .values(master_level=update.level)
+            .returning(Word.id)
+        ).all()
+    # Buffered study changes are older than the update - dropped for all the words
+    # of the levels map (also those already on their level) or the updated ones
+    write_behind.discard(update.levels if update.levels is not None else word_ids)
+    db.commit()
+
+    logger.debug("Master level updated for %s words.", len(word_ids))
+
+    return {"number_of_words": len(word_ids), "words": sorted(word_ids)}
+
+
 @router.delete("/delete/{word_id}", status_code=204)
 async def delete_a_word(db: db_dependency, word_id: int):
-    word = db.query(Word).filter_by(id=word_id).first()
+    # Associations are removed by the database (ON DELETE CASCADE)
+    word = db.execute(
+        delete(Word).where(Word.id == word_id).returning(Word.id, Word.word)
+    ).first()
     if not word:
         raise HTTPException(404, f"Word with the ID: {word_id} was not found.")
 
-    db.delete(word)
+    record_tombstones(db, Word, [word.id])
     db.commit()
 
-    logger.debug("Word '%s' (id: %s) was successfully deleted." % (word.word, word.id))
+    logger.debug("Word '%s' (id: %s) was successfully deleted.", word.word, word.id)
+
+
+@router.delete(
+    "/delete_many",
+    status_code=200,
+    response_model=BulkDeleteReturn,
+    response_model_exclude_none=True,
+    description="Delete many words at once (with their description assignments). \
+        With 'with_orphans' set, descriptions left without any word are deleted too.",
+)
+async def delete_many_words(
+    db: db_dependency,
+    ids: Annotated[list[int], Query()],
+    with_orphans: bool = False,
+):
+    ids = list(dict.fromkeys(ids))
+    # Descriptions of the deleted words are the only ones that may become orphans
+    description_ids = (
+        db.scalars(
+            select(WordDescription.description_id)
+            .where(WordDescription.word_id.in_(ids))
+            .distinct()
+        ).all()
+        if with_orphans
+        else []
+    )
+
+    deleted = db.scalars(delete(Word).where(Word.id.in_(ids)).returning(Word.id)).all()
+    record_tombstones(db, Word, deleted)
+
+    result = {
+        "deleted": sorted(deleted),
+        "not_found": sorted(set(ids) - set(deleted)),
+    }
+    if with_orphans:
+        # In the transaction of the words delete - no orphans are left behind
+        # if the sweep fails (nothing is deleted then)
+        result["orphans_deleted"] = delete_orphan_descriptions(
+            db, config.ORPHAN_SWEEP_BATCH_SIZE, description_ids, commit=False
+        )
+    db.commit()
+
+    logger.debug("Bulk delete of words: %s", Capped(result))
+
+    return result
@@ -1,6 +1,15 @@
-from pydantic import BaseModel, ConfigDict, Field
+import datetime
+from typing import Any
 
-from dictionary.enums import MasterLevel, WordTypes
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+
+from dictionary.enums import (
+    BatchOperationType,
+    LinkStatus,
+    MasterLevel,
+    UpsertStatus,
+    WordTypes,
+)
 
 
 class DescriptionModel(BaseModel):
@@ -49,6 +58,15 @@ class WordModel(BaseModel):
     model_config = ConfigDict(from_attributes=True, use_enum_values=True)
 
 
+class WordWithDescriptionsModel(WordModel):
+    """Model for adding word/sentence together with its descriptions.
+    Each description is either a new description or an ID of existing one."""
+
+    descriptions: list[DescriptionModel | int] = Field(
+        default=[], examples=[[{"type": "noun", "in_polish": "sedno"}, 1]]
+    )
+
+
 class WordReturn(WordModel):
     "Model for returning word with its ID and timestamps."
 
@@ -64,6 +82,54 @@ class WordUpdate(WordModel):
     master_level: MasterLevel | None = Field(default=None, examples=[None])
 
 
+class WordLevelsFilter(BaseModel):
+    "Model for selecting words for the master level update."
+
+    master_level: MasterLevel | None = Field(default=None, examples=[None])
+    search: str | None = Field(default=None, examples=[None])
+
+
+class WordLevelsUpdate(BaseModel):
+    """Model for updating master level of many words - either with a map of
+    word IDs to levels or with a filter and the target level."""
+
+    levels: dict[int, MasterLevel] | None = Field(
+        default=None, examples=[{1: MasterLevel.MEDIUM, 2: MasterLevel.HARD}]
+    )
+    filter: WordLevelsFilter | None = Field(default=None, examples=[None])
+    level: MasterLevel | None = Field(default=None, examples=[None])
+
+    @model_validator(mode="after")
+    def check_update_mode(self) -> "WordLevelsUpdate":
+        if (self.levels is None) == (self.filter is None):
+            raise ValueError("Either 'levels' or 'filter' must be given.")
+        if self.filter is not None and self.level is None:
+            raise ValueError("The 'level' must be given together with 'filter'.")
+        return self
+
+
+class WordLevelsReturn(BaseModel):
+    "Model for returning IDs of words with updated master level."
+
+    number_of_words: int
+    words: list[int]
+
+
+class BulkDeleteReturn(BaseModel):
+    "Model for returning the result of deleting many words/descriptions at once."
+
+    deleted: list[int]
+    not_found: list[int]
+    orphans_deleted: list[int] | None = None
+
+
+class OrphanSweepReturn(BaseModel):
+    "Model for returning IDs of deleted descriptions not assigned to any word."
+
+    number_of_descriptions: int
+    descriptions: list[int]
+
+
 class AllWords(BaseModel):
     "Model for returning all words stored in the database."
 
@@ -73,6 +139,20 @@ class AllWords(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class WordUpsertReturn(BaseModel):
+    "Model for returning created, updated or already existing word."
+
+    status: UpsertStatus
+    word: WordReturn
+
+
+class DescriptionUpsertReturn(BaseModel):
+    "Model for returning created, updated or already existing description."
+
+    status: UpsertStatus
+    description: DescriptionReturn
+
+
 class WordDescriptionsModel(BaseModel):
     "Model for returning word with its full descriptions."
 
@@ -82,6 +162,44 @@ class WordDescriptionsModel(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class WordDescriptionLink(BaseModel):
+    "Model for returning word-description association."
+
+    word_id: int
+    description_id: int
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class WordDescriptionLinkResult(WordDescriptionLink):
+    "Model for returning the result of linking/unlinking word and description."
+
+    status: LinkStatus
+
+
+class TombstoneModel(BaseModel):
+    "Model for returning deleted record."
+
+    table_name: str
+    word_id: int | None = None
+    description_id: int | None = None
+    deleted: datetime.datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class SyncReturn(BaseModel):
+    "Model for returning all changes made since the given sync token."
+
+    token: datetime.datetime
+    words: list[WordReturn]
+    descriptions: list[DescriptionReturn]
+    word_descriptions: list[WordDescriptionLink]
+    deleted: list[TombstoneModel]
+
+    model_config = ConfigDict(from_attributes=True)
+
+
 class LevelWeightModel(BaseModel):
     "Model for returning levels with its weights."
 
@@ -92,9 +210,36 @@ class LevelWeightModel(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class StudyLevelReturn(BaseModel):
+    "Model for returning the master level set while studying."
+
+    word_id: int
+    master_level: MasterLevel
+    buffered: bool
+
+
 class LevelReturn(BaseModel):
     "Model for returning all levels stored in the database."
 
     levels: list[LevelWeightModel]
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class BatchOperation(BaseModel):
+    """Model for a single operation of the batch request.
+    Path parameters may refer to the ID created/affected by one of the previous
+    operations with '$<operation index>', e.g. {"word_id": "$0"}."""
+
+    op: BatchOperationType
+    params: dict[str, int | str] = Field(default={}, examples=[{"word_id": "$0"}])
+    body: dict[str, Any] | None = Field(default=None, examples=[None])
+
+
+class BatchResult(BaseModel):
+    "Model for returning the result of a single batch operation."
+
+    index: int
+    op: BatchOperationType
+    id: int | None = None
+    result: dict[str, Any] | None = None
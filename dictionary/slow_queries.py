@@ -0,0 +1,114 @@
+"""
+Slow query log - statements running longer than SLOW_QUERY_THRESHOLD_MS are
+logged with their parameters, the route of the request and the duration.
+
+With SLOW_QUERY_EXPLAIN enabled, the plan of the first slow execution of each
+SELECT fingerprint (see dictionary/profiler.py) is captured with
+EXPLAIN (ANALYZE, BUFFERS) and added to the log record (PostgreSQL only).
+
+NOTE: EXPLAIN ANALYZE executes the query once more (in the same transaction, \
+inside a savepoint), so it doubles the time of that one slow request.
+"""
+
+import logging
+import threading
+
+from sqlalchemy.engine import Connection
+
+from dictionary.config import config
+from dictionary.instrumentation import query_hooks, request_stats
+from dictionary.logging_config import Capped
+from dictionary.profiler import fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+class SlowQueryLog:
+    def __init__(
+        self,
+        threshold_ms: float | None,
+        explain: bool = False,
+        max_explained: int = 1000,
+    ):
+        # None disables the log
+        self.threshold = threshold_ms / 1000 if threshold_ms is not None else None
+        self.explain = explain
+        # Plans are captured for at most that many distinct fingerprints
+        self.max_explained = max_explained
+        self._explained: set[str] = set()
+        self._lock = threading.Lock()
+
+    def first_occurrence(self, statement_fingerprint: str) -> bool:
+        "Whether the plan of the fingerprint should be captured (only once)."
+        with self._lock:
+            if (
+                statement_fingerprint in self._explained
+                or len(self._explained) >= self.max_explained
+            ):
+                return False
+            self._explained.add(statement_fingerprint)
+            return True
+
+    def explain_plan(self, conn: Connection, statement: str, parameters) -> str | None:
+        """Returns EXPLAIN (ANALYZE, BUFFERS) output of the statement.
+        Runs on the DBAPI cursor (not traced by the engine events) inside
+        a savepoint, so a failing EXPLAIN does not abort the transaction."""
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute("SAVEPOINT slow_query_explain")
+            try:
+                cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + statement, parameters)
+                plan = "\n".join(row[0] for row in cursor.fetchall())
+            except Exception:
+                cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+                logger.exception("Capturing plan of the slow query failed.")
+                return None
+            finally:
+                cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+        finally:
+            cursor.close()
+        return plan
+
+    def __call__(
+        self,
+        conn: Connection,
+        statement: str,
+        parameters,
+        duration: float,
+        executemany: bool,
+    ):
+        if self.threshold is None or duration < self.threshold:
+            return
+
+        stats = request_stats.get()
+        route = (stats.route if stats else None) or "<no request>"
+        plan = None
+        if self.explain and not executemany and conn.dialect.name == "postgresql":
+            statement_fingerprint = fingerprint(statement)
+            if statement_fingerprint.upper().startswith(
+                "SELECT"
+            ) and self.first_occurrence(statement_fingerprint):
+                plan = self.explain_plan(conn, statement, parameters)
+
+        logger.warning(
+            "Slow query (%.1fms) in %s: %s | parameters: %s%s",
+            duration * 1000,
+            route,
+            statement,
+            Capped(parameters),
+            "\n" + plan if plan else "",
+            extra={
+                "fields": {
+                    "route": route,
+                    "duration_ms": round(duration * 1000, 3),
+                    "statement": statement,
+                    "plan": plan,
+                }
+            },
+        )
+
+
+slow_query_log = SlowQueryLog(
+    config.SLOW_QUERY_THRESHOLD_MS, explain=config.SLOW_QUERY_EXPLAIN
+)
+query_hooks.append(slow_query_log)
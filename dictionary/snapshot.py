@@ -0,0 +1,520 @@
+"""
+Snapshot of the dictionary in one binary file: words, descriptions, the word
+-> descriptions associations (CSR - offsets per word and description indexes)
+and the master level weights. Workers load it with mmap on startup and build
+the shuffle and search indexes from it (without a database scan), so the
+read-only endpoints can be served from it while the database is unavailable.
+
+Layout (native little-endian, sections aligned to 8 bytes): the header (magic,
+version, creation time, number of records) and the table of the sections
+(offset and size of each), followed by the sections - fixed-width arrays
+(IDs, levels, types, CSR offsets and indexes, weights) and string tables
+(offsets of the strings, UTF-8 data and None flags).
+
+NOTE: The snapshot is not updated with the database - write it again \
+(python -m dictionary.snapshot write dictionary.snapshot) e.g. periodically. \
+The file is replaced atomically, workers load the new one on their restart.
+
+Usage: python -m dictionary.snapshot write dictionary.snapshot
+"""
+
+import argparse
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from array import array
+from bisect import bisect_right
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from functools import wraps
+from itertools import accumulate
+from random import Random
+from typing import IO, Any
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from dictionary.enums import MasterLevel, WordTypes
+from dictionary.models import Description, LevelWeight, Word, WordDescription
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"DICTSNAP"
+VERSION = 1
+# magic, version, created (unix time), words, descriptions, associations
+HEADER = struct.Struct("<8sIdIII")
+# offset and size of each section
+SECTION = struct.Struct("<QQ")
+
+LEVELS = list(MasterLevel)
+TYPES = list(WordTypes)
+NO_TYPE = 255
+
+# Sections in the order of the file: name and type code of the array items
+# (None - bytes of the UTF-8 strings)
+SECTIONS = (
+    ("word_ids", "i"),
+    ("word_levels", "B"),
+    ("words.offsets", "I"),
+    ("words.data", None),
+    ("words.nulls", "B"),
+    ("notes.offsets", "I"),
+    ("notes.data", None),
+    ("notes.nulls", "B"),
+    ("description_ids", "i"),
+    ("description_types", "B"),
+    ("in_polish.offsets", "I"),
+    ("in_polish.data", None),
+    ("in_polish.nulls", "B"),
+    ("in_english.offsets", "I"),
+    ("in_english.data", None),
+    ("in_english.nulls", "B"),
+    ("example.offsets", "I"),
+    ("example.data", None),
+    ("example.nulls", "B"),
+    # CSR: descriptions of the word i are description_indexes[offsets[i]:offsets[i + 1]]
+    ("word_descriptions.offsets", "I"),
+    ("word_descriptions.indexes", "I"),
+    ("level_weights", "d"),
+)
+
+
+class SnapshotError(Exception):
+    "Exception raised when the snapshot file can not be read."
+
+
+def string_table(name: str, values: Iterable[str | None]) -> dict[str, bytes]:
+    "Sections of the string table: offsets of the strings, UTF-8 data, None flags."
+    offsets, nulls, data = array("I", [0]), array("B"), bytearray()
+    for value in values:
+        data += (value or "").encode()
+        offsets.append(len(data))
+        nulls.append(value is None)
+    return {
+        f"{name}.offsets": offsets.tobytes(),
+        f"{name}.data": bytes(data),
+        f"{name}.nulls": nulls.tobytes(),
+    }
+
+
+def level_weights(db: Session) -> dict[MasterLevel, float]:
+    "Weights of the master levels (new weight if set, default weight otherwise)."
+    weights = {level: level.weight for level in MasterLevel}
+    for level in db.scalars(select(LevelWeight)):
+        weights[level.level] = (
+            level.new_weight if level.new_weight is not None else level.default_weight
+        )
+    return weights
+
+
+@contextmanager
+def atomic_file(path: str, mode: str = "w") -> Iterator[IO]:
+    """Yields a new file which replaces the given path when closed without errors.
+    Written as a unique temporary file in the same directory (e.g. workers saving
+    their state at the same time do not write to the same file)."""
+    directory, name = os.path.split(os.path.abspath(path))
+    descriptor, temporary = tempfile.mkstemp(
+        prefix=f".{name}.", suffix=".tmp", dir=directory
+    )
+    try:
+        with os.fdopen(descriptor, mode) as file:
+            yield file
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def write_snapshot(db: Session, path: str) -> dict:
+    """Writes the snapshot of the database to the file (replaced atomically).
+    Returns number of the records."""
+    if sys.byteorder != "little":
+        raise SnapshotError("Snapshots are written on little-endian machines only.")
+
+    words = db.execute(
+        select(Word.id, Word.word, Word.master_level, Word.notes).order_by(Word.id)
+    ).all()
+    descriptions = db.execute(
+        select(
+            Description.id,
+            Description.type,
+            Description.in_polish,
+            Description.in_english,
+            Description.example,
+        ).order_by(Description.id)
+    ).all()
+    links = db.execute(
+        select(WordDescription.word_id, WordDescription.description_id).order_by(
+            WordDescription.word_id, WordDescription.description_id
+        )
+    ).all()
+    weights = level_weights(db)
+
+    word_index = {word.id: index for index, word in enumerate(words)}
+    description_index = {desc.id: index for index, desc in enumerate(descriptions)}
+    counts = array("I", [0] * len(words))
+    for word_id, _ in links:
+        counts[word_index[word_id]] += 1
+
+    sections = {
+        "word_ids": array("i", (word.id for word in words)).tobytes(),
+        "word_levels": array(
+            "B", (LEVELS.index(word.master_level) for word in words)
+        ).tobytes(),
+        **string_table("words", (word.word for word in words)),
+        **string_table("notes", (word.notes for word in words)),
+        "description_ids": array("i", (desc.id for desc in descriptions)).tobytes(),
+        "description_types": array(
+            "B",
+            (
+                TYPES.index(desc.type) if desc.type is not None else NO_TYPE
+                for desc in descriptions
+            ),
+        ).tobytes(),
+        **string_table("in_polish", (desc.in_polish for desc in descriptions)),
+        **string_table("in_english", (desc.in_english for desc in descriptions)),
+        **string_table("example", (desc.example for desc in descriptions)),
+        "word_descriptions.offsets": array(
+            "I", accumulate(counts, initial=0)
+        ).tobytes(),
+        "word_descriptions.indexes": array(
+            "I", (description_index[desc_id] for _, desc_id in links)
+        ).tobytes(),
+        "level_weights": array("d", (weights[level] for level in LEVELS)).tobytes(),
+    }
+
+    header_size = HEADER.size + SECTION.size * len(SECTIONS)
+    table, body, offset = [], bytearray(), _aligned(header_size)
+    for name, _ in SECTIONS:
+        data = sections[name]
+        table.append(SECTION.pack(offset + len(body), len(data)))
+        body += data + bytes(_aligned(len(data)) - len(data))
+
+    header = HEADER.pack(
+        MAGIC, VERSION, time.time(), len(words), len(descriptions), len(links)
+    )
+    with atomic_file(path, "wb") as file:
+        file.write(header + b"".join(table))
+        file.write(bytes(offset - header_size))
+        file.write(body)
+
+    return {
+        "words": len(words),
+        "descriptions": len(descriptions),
+        "associations": len(links),
+        "bytes": offset + len(body),
+    }
+
+
+def _aligned(size: int) -> int:
+    return (size + 7) // 8 * 8
+
+
+class Snapshot:
+    """Read-only view of the snapshot file (memory-mapped, nothing is copied -
+    records are read on access). Words and descriptions are addressed by their
+    indexes (in the order of the IDs)."""
+
+    def __init__(self, path: str):
+        if sys.byteorder != "little":
+            raise SnapshotError("Snapshots are read on little-endian machines only.")
+        with open(path, "rb") as file:
+            try:
+                self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as exc_info:
+                # An empty file can not be mapped
+                raise SnapshotError(f"Invalid snapshot file '{path}': {exc_info}")
+        self._buffer = memoryview(self._mmap)
+        try:
+            self._read_sections()
+        except (struct.error, ValueError, TypeError) as exc_info:
+            self.close()
+            raise SnapshotError(f"Invalid snapshot file '{path}': {exc_info}")
+
+    def _read_sections(self):
+        magic, version, self.created, words, descriptions, links = HEADER.unpack_from(
+            self._buffer
+        )
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"unsupported format ({magic!r}, version {version})")
+
+        self.sections: dict[str, memoryview] = {}
+        for index, (name, code) in enumerate(SECTIONS):
+            offset, size = SECTION.unpack_from(
+                self._buffer, HEADER.size + SECTION.size * index
+            )
+            if offset + size > len(self._buffer):
+                raise ValueError(f"section {name} beyond the end of the file")
+            # No local references to the views (released by close() on errors)
+            self.sections[name] = self._buffer[offset : offset + size]
+            if code:
+                self.sections[name] = self.sections[name].cast(code)
+
+        self.word_ids = self.sections["word_ids"]
+        self.word_levels = self.sections["word_levels"]
+        self.description_ids = self.sections["description_ids"]
+        self.level_weights = {
+            level: weight
+            for level, weight in zip(LEVELS, self.sections["level_weights"])
+        }
+        if (len(self.word_ids), len(self.description_ids)) != (words, descriptions):
+            raise ValueError("number of the records does not match")
+        if len(self.sections["word_descriptions.indexes"]) != links:
+            raise ValueError("number of the associations does not match")
+        self._check_array("word_levels", words)
+        self._check_array("description_types", descriptions)
+        self._check_array("word_descriptions.offsets", words + 1, last=links)
+        for name, count in (
+            ("words", words),
+            ("notes", words),
+            ("in_polish", descriptions),
+            ("in_english", descriptions),
+            ("example", descriptions),
+        ):
+            self._check_array(f"{name}.nulls", count)
+            self._check_array(
+                f"{name}.offsets", count + 1, last=len(self.sections[f"{name}.data"])
+            )
+
+    def _check_array(self, name: str, length: int, last: int | None = None):
+        "Checks the length (and the last item) of the section array."
+        section = self.sections[name]
+        if len(section) != length or (last is not None and section[-1] != last):
+            raise ValueError(f"section {name} does not match the records")
+
+    def close(self):
+        # The views of the memory map must be released before closing it
+        for section in getattr(self, "sections", {}).values():
+            section.release()
+        self.sections = {}
+        self._buffer.release()
+        self._mmap.close()
+
+    def _string(self, name: str, index: int) -> str | None:
+        if self.sections[f"{name}.nulls"][index]:
+            return None
+        offsets = self.sections[f"{name}.offsets"]
+        return str(
+            self.sections[f"{name}.data"][offsets[index] : offsets[index + 1]], "utf-8"
+        )
+
+    def __len__(self) -> int:
+        return len(self.word_ids)
+
+    def word_index(self, word_id: int) -> int | None:
+        "Index of the word with the ID (None if not in the snapshot)."
+        index = bisect_right(self.word_ids, word_id) - 1
+        return index if index >= 0 and self.word_ids[index] == word_id else None
+
+    def word(self, index: int) -> dict:
+        return {
+            "id": self.word_ids[index],
+            "word": self._string("words", index),
+            "master_level": LEVELS[self.word_levels[index]],
+            "notes": self._string("notes", index),
+        }
+
+    def word_text(self, index: int) -> str:
+        return self._string("words", index)
+
+    def description(self, index: int) -> dict:
+        type_index = self.sections["description_types"][index]
+        return {
+            "id": self.description_ids[index],
+            "type": TYPES[type_index] if type_index != NO_TYPE else None,
+            "in_polish": self._string("in_polish", index),
+            "in_english": self._string("in_english", index),
+            "example": self._string("example", index),
+        }
+
+    def in_polish(self, index: int) -> str:
+        return self._string("in_polish", index)
+
+    def word_descriptions(self, index: int) -> list[int]:
+        "Indexes of the descriptions of the word."
+        offsets = self.sections["word_descriptions.offsets"]
+        indexes = self.sections["word_descriptions.indexes"]
+        return indexes[offsets[index] : offsets[index + 1]].tolist()
+
+
+class ShuffleIndex:
+    """Weighted draw of the words (the probability depends on the weight of
+    the master level) - bisect of the cumulative weights."""
+
+    def __init__(self, snapshot: Snapshot):
+        weights = [snapshot.level_weights[level] for level in LEVELS]
+        self.cumulative = list(
+            accumulate(weights[level] for level in snapshot.word_levels)
+        )
+
+    def draw(self, rng: Random) -> int:
+        "Returns index of the drawn word."
+        if not self.cumulative or self.cumulative[-1] <= 0:
+            raise ValueError("Total of the weights must be greater than zero.")
+        return bisect_right(self.cumulative, rng.random() * self.cumulative[-1])
+
+
+class SearchIndex:
+    """Case insensitive substring search of the words (as ILIKE '%search%') -
+    one lowercase string of all words and start positions of the words."""
+
+    def __init__(self, snapshot: Snapshot):
+        words = [snapshot.word_text(index).lower() for index in range(len(snapshot))]
+        self.text = "\n".join(words)
+        self.starts = list(accumulate((len(word) + 1 for word in words), initial=0))
+
+    def search(self, phrase: str) -> list[int]:
+        "Returns indexes of the words containing the phrase (in the order of IDs)."
+        phrase = phrase.lower()
+        found = []
+        if not phrase or "\n" in phrase:
+            return found
+        position = self.text.find(phrase)
+        while position != -1:
+            index = bisect_right(self.starts, position) - 1
+            found.append(index)
+            # Next match in the following words only
+            position = self.text.find(phrase, self.starts[index + 1])
+        return found
+
+
+class LoadedSnapshot:
+    "Snapshot with the indexes built on loading."
+
+    def __init__(self, path: str):
+        start = time.perf_counter()
+        self.path = path
+        self.snapshot = Snapshot(path)
+        self.shuffle = ShuffleIndex(self.snapshot)
+        self.search = SearchIndex(self.snapshot)
+        self.rng = Random()
+        logger.info(
+            "Snapshot '%s' (%s words, created %s) loaded in %.1f ms.",
+            path,
+            len(self.snapshot),
+            time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.snapshot.created)),
+            (time.perf_counter() - start) * 1000,
+        )
+
+    def close(self):
+        self.snapshot.close()
+
+
+# The snapshot loaded on startup (SNAPSHOT_FILE)
+loaded: LoadedSnapshot | None = None
+
+
+def load_snapshot(path: str) -> LoadedSnapshot | None:
+    "Loads the snapshot - a missing or invalid file is logged only."
+    global loaded
+    unload_snapshot()
+    try:
+        loaded = LoadedSnapshot(path)
+    except (OSError, SnapshotError) as exc_info:
+        logger.warning(
+            "Snapshot not loaded - no fallback if database is down: %s", exc_info
+        )
+    return loaded
+
+
+def unload_snapshot():
+    global loaded
+    if loaded:
+        loaded.close()
+        loaded = None
+
+
+def snapshot_fallback(handler: Callable[..., Any]):
+    """Decorator of the read-only endpoints. If the database is unavailable
+    (OperationalError), the response is made by the handler from the loaded
+    snapshot (called with it and the endpoint arguments except db). Such
+    responses have the X-Snapshot-Created header (may be outdated)."""
+
+    def decorator(endpoint):
+        @wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            try:
+                return await endpoint(*args, **kwargs)
+            except OperationalError as exc_info:
+                snapshot = loaded
+                if snapshot is None:
+                    raise
+                logger.warning(
+                    "Database unavailable - %s served from the snapshot: %s",
+                    endpoint.__name__,
+                    str(exc_info.orig).strip().splitlines()[0],
+                )
+            kwargs.pop("db", None)
+            return JSONResponse(
+                jsonable_encoder(handler(snapshot, **kwargs)),
+                headers={
+                    "X-Snapshot-Created": time.strftime(
+                        "%Y-%m-%dT%H:%M:%SZ", time.gmtime(snapshot.snapshot.created)
+                    )
+                },
+            )
+
+        return wrapper
+
+    return decorator
+
+
+def save_state(path: str, state: dict):
+    "Saves the state (e.g. of the shuffle) as JSON, replaced atomically."
+    with atomic_file(path) as file:
+        json.dump(state, file)
+
+
+def load_state(path: str) -> dict:
+    "Loads the saved state - empty if not saved yet or invalid."
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as exc_info:
+        logger.warning("State '%s' not loaded: %s", path, exc_info)
+        return {}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    write_parser = subparsers.add_parser("write", help="write the database snapshot")
+    write_parser.add_argument("path")
+    info_parser = subparsers.add_parser("info", help="show the snapshot content")
+    info_parser.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "write":
+        from dictionary.database import SessionLocal
+
+        with SessionLocal() as db:
+            print(json.dumps(write_snapshot(db, args.path), indent=2))
+    else:
+        snapshot = Snapshot(args.path)
+        print(
+            json.dumps(
+                {
+                    "created": time.strftime(
+                        "%Y-%m-%d %H:%M:%S", time.localtime(snapshot.created)
+                    ),
+                    "words": len(snapshot),
+                    "descriptions": len(snapshot.description_ids),
+                    "associations": len(snapshot.sections["word_descriptions.indexes"]),
+                    "level_weights": snapshot.level_weights,
+                },
+                indent=2,
+            )
+        )
+        snapshot.close()
@@ -0,0 +1,51 @@
+"""
+SQLite backend for single-user and edge deployments (e.g. a laptop without
+a PostgreSQL server), set with DATABASE_URL=sqlite:///dictionary.db.
+
+Each connection gets SQLITE_PRAGMAS (WAL journal by default - readers do not
+block the writer) and enforces foreign keys (ON DELETE CASCADE). Transactions
+are begun by SQLAlchemy instead of the sqlite3 module, so savepoints (batch
+operations, forced rollback) work as on PostgreSQL. Write transactions reading
+before their first write begin with BEGIN IMMEDIATE (the execution option
+sqlite_begin, see dictionary/queries.begin_write) - a deferred transaction
+fails at once (SQLITE_BUSY, without busy_timeout) if another connection writes
+between its read and write.
+PostgreSQL-only SQL has portable fallbacks (see dictionary/queries.py).
+
+NOTE: SQLite allows one writer at a time - a write waits up to busy_timeout \
+for the lock. It suits one user (or a few), not many concurrent workers.
+"""
+
+from sqlalchemy import Engine, event
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql import functions
+
+
+@compiles(functions.current_timestamp, "sqlite")
+def current_timestamp(element, compiler, **kw):
+    """CURRENT_TIMESTAMP of SQLite has one second precision - milliseconds
+    (the same within one statement) in the format of SQLAlchemy DateTime."""
+    return "STRFTIME('%Y-%m-%d %H:%M:%f000', 'now')"
+
+
+def setup_sqlite(engine: Engine, pragmas: dict[str, str | int]):
+    "Registers the connection setup of the SQLite engine."
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        # The sqlite3 module does not begin transactions itself (see begin below)
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("PRAGMA foreign_keys = ON")
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def begin(connection):
+        if connection.get_execution_options().get("sqlite_begin") == "IMMEDIATE":
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+        else:
+            connection.exec_driver_sql("BEGIN")
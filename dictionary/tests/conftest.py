@@ -11,34 +11,58 @@ from typing import AsyncGenerator, Generator
 import pytest
 from fastapi.testclient import TestClient
 from httpx import ASGITransport, AsyncClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import text
 
 os.environ["ENV_STATE"] = "test"
 
-from dictionary.config import config
-from dictionary.database import Base, get_db
+from dictionary.database import Base, SessionLocal, engine, forced_rollback, get_db
+from dictionary.logging_config import configure_logging
 from dictionary.main import app
 
-# Creating testing database instead of using prod/dev database
-engine = create_engine(config.DATABASE_URL)
+# The application configures logging on startup (lifespan), which is not run here
+configure_logging()
 
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# The test database (TEST_DATABASE_URL) runs with DB_FORCE_ROLL_BACK - all sessions
+# (of the tests, helpers and application) share one connection in an outer
+# transaction, which is rolled back after each test
+TestingSessionLocal = SessionLocal
 
 
-# Overriding database connection for all of the endpoins
-@pytest.fixture(scope="function")
-def db_session():
-    """Sets a clean db session for each test."""
-
+@pytest.fixture(scope="session")
+def database_schema():
+    """Creates the tables once for all tests."""
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
 
+
+def restart_ids():
+    """Restarts the IDs of the tables from 1.
+    NOTE: PostgreSQL sequences are not rolled back with the transaction.
+    """
+    connection = forced_rollback.connection
+    if connection.dialect.name != "postgresql":
+        return
+    for table in Base.metadata.sorted_tables:
+        if "id" not in table.c:
+            continue
+        connection.execute(
+            text("SELECT setval(pg_get_serial_sequence(:table, 'id'), 1, false)"),
+            {"table": table.name},
+        )
+
+
+# Overriding database connection for all of the endpoins
+@pytest.fixture(scope="function")
+def db_session(database_schema):
+    """Sets a clean db session for each test (changes rolled back after the test)."""
+    restart_ids()
+
     db = TestingSessionLocal()
     try:
         yield db
     finally:
         db.close()
+        forced_rollback.rollback()
 
 
 # # Cleaning db tables after each test
@@ -0,0 +1,172 @@
+import logging
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.orm import Session
+
+from dictionary.models import Description, Word, WordDescription
+from dictionary.tests.utils import (
+    create_description,
+    create_full_dict_entry,
+    create_word,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@pytest.mark.anyio
+async def test_batch_with_references_to_previous_operations(
+    async_client: AsyncClient, db_session: Session
+):
+    desc = create_description(in_polish="istniejący opis")
+    payload = [
+        {"op": "add_word", "body": {"word": "pivot"}},
+        {
+            "op": "add_description",
+            "params": {"word_id": "$0"},
+            "body": {"in_polish": "sedno"},
+        },
+        {"op": "assign_description", "params": {"word_id": "$0", "desc_id": desc.id}},
+        {
+            "op": "update_description",
+            "params": {"desc_id": "$1"},
+            "body": {"example": "test"},
+        },
+    ]
+
+    response = await async_client.post("/batch", json=payload)
+    logger.debug("Batch response: %s", response.json())
+
+    assert response.status_code == 200
+    results = response.json()
+    word = db_session.query(Word).filter_by(word="pivot").one()
+    new_desc = db_session.query(Description).filter_by(in_polish="sedno").one()
+    assert [result["id"] for result in results] == [
+        word.id,
+        new_desc.id,
+        desc.id,
+        new_desc.id,
+    ]
+    assert results[3]["result"]["example"] == "test"
+    assert db_session.query(WordDescription).filter_by(word_id=word.id).count() == 2
+
+
+@pytest.mark.anyio
+async def test_batch_rolls_back_all_operations_if_one_fails(
+    async_client: AsyncClient, db_session: Session
+):
+    create_word(word="existing")
+    payload = [
+        {"op": "add_word", "body": {"word": "pivot"}},
+        {
+            "op": "add_description",
+            "params": {"word_id": "$0"},
+            "body": {"in_polish": "sedno"},
+        },
+        {"op": "add_word", "body": {"word": "existing"}},
+    ]
+
+    response = await async_client.post("/batch", json=payload)
+
+    assert response.status_code == 400
+    assert response.json()["detail"]["index"] == 2
+    assert response.json()["detail"]["op"] == "add_word"
+    assert db_session.query(Word).count() == 1
+    assert db_session.query(Description).count() == 0
+
+
+@pytest.mark.anyio
+async def test_batch_invalid_reference(async_client: AsyncClient, db_session: Session):
+    payload = [
+        {
+            "op": "add_description",
+            "params": {"word_id": "$1"},
+            "body": {"in_polish": "sedno"},
+        },
+        {"op": "add_word", "body": {"word": "pivot"}},
+    ]
+    expected_response = {
+        "index": 0,
+        "op": "add_description",
+        "detail": "Invalid reference '$1' - only IDs of the previous operations "
+        "can be used.",
+    }
+
+    response = await async_client.post("/batch", json=payload)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == expected_response
+    assert db_session.query(Word).count() == 0
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("value", ["0", "1"])
+async def test_batch_bare_string_param_is_not_a_reference(
+    async_client: AsyncClient, db_session: Session, value: str
+):
+    payload = [
+        {"op": "add_word", "body": {"word": "pivot"}},
+        {
+            "op": "add_description",
+            "params": {"word_id": value},
+            "body": {"in_polish": "sedno"},
+        },
+    ]
+    expected_response = {
+        "index": 1,
+        "op": "add_description",
+        "detail": "Invalid value '%s' - use an integer ID or a '$<index>' "
+        "reference." % value,
+    }
+
+    response = await async_client.post("/batch", json=payload)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == expected_response
+    assert db_session.query(Word).count() == 0
+    assert db_session.query(Description).count() == 0
+
+
+@pytest.mark.anyio
+async def test_batch_dry_run_saves_nothing(
+    async_client: AsyncClient, db_session: Session
+):
+    payload = [
+        {"op": "add_word", "body": {"word": "pivot"}},
+        {
+            "op": "add_description",
+            "params": {"word_id": "$0"},
+            "body": {"in_polish": "sedno"},
+        },
+    ]
+
+    response = await async_client.post("/batch", params={"dry_run": True}, json=payload)
+
+    assert response.status_code == 200
+    assert [result["op"] for result in response.json()] == [
+        "add_word",
+        "add_description",
+    ]
+    assert db_session.query(Word).count() == 0
+    assert db_session.query(Description).count() == 0
+
+
+@pytest.mark.anyio
+async def test_batch_add_description_id_of_the_new_description(
+    async_client: AsyncClient, db_session: Session
+):
+    word, desc = create_full_dict_entry(word="pivot", in_polish="sedno")
+    payload = [
+        {
+            "op": "add_description",
+            "params": {"word_id": word.id},
+            "body": {"in_polish": "  oś  ", "in_english": "axis"},
+        },
+    ]
+
+    response = await async_client.post("/batch", json=payload)
+
+    assert response.status_code == 200
+    new_desc = db_session.query(Description).filter_by(in_english="axis").one()
+    assert new_desc.id != desc.id
+    assert response.json()[0]["id"] == new_desc.id
@@ -0,0 +1,26 @@
+from unittest.mock import patch
+
+from dotenv import dotenv_values
+
+from dictionary.config import DevConfig, read_env_file
+
+
+def test_env_file_read_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / ".env").write_text(
+        "ENV_STATE=dev\nDEV_GZIP_LEVEL=3\nDEV_BROTLI_QUALITY=2\n"
+    )
+    monkeypatch.setenv("DEV_BROTLI_QUALITY", "7")
+    read_env_file.cache_clear()
+
+    try:
+        with patch("dictionary.config.dotenv_values", wraps=dotenv_values) as read:
+            config = DevConfig()
+            DevConfig()
+    finally:
+        read_env_file.cache_clear()
+
+    read.assert_called_once_with(".env")
+    assert config.GZIP_LEVEL == 3
+    # The environment takes precedence over the .env file
+    assert config.BROTLI_QUALITY == 7
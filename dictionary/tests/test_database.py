@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+from sqlalchemy.orm import Session
+
+from dictionary.database import (
+    ForcedRollback,
+    engine,
+    forced_rollback,
+    get_db,
+    sandbox,
+)
+from dictionary.models import Word
+from dictionary.tests.conftest import TestingSessionLocal
+from dictionary.tests.utils import create_word
+
+
+def test_forced_rollback_discards_committed_changes(db_session: Session):
+    create_word(word="committed")
+    assert db_session.query(Word).filter_by(word="committed").count() == 1
+    db_session.close()
+
+    forced_rollback.rollback()
+
+    with TestingSessionLocal() as db:
+        assert db.query(Word).count() == 0
+
+
+def test_sandbox_rolls_back_at_the_end(db_session: Session):
+    with sandbox() as session_factory:
+        with session_factory() as db:
+            db.add(Word(word="dry run"))
+            db.commit()
+
+        # Commits are visible within the sandbox
+        with session_factory() as db:
+            assert db.query(Word).filter_by(word="dry run").count() == 1
+
+    assert db_session.query(Word).count() == 0
+
+
+def test_forced_rollback_connects_on_first_session():
+    rollback = ForcedRollback(engine)
+    assert rollback._connection is None
+
+    with rollback() as db:
+        assert db.query(Word).count() == 0
+    assert rollback._connection is not None
+    rollback.close()
+
+
+def test_forced_rollback_fails_on_concurrent_sessions(db_session: Session):
+    first, second = TestingSessionLocal(), TestingSessionLocal()
+    first.add(Word(word="first"))
+    first.flush()
+    second.add(Word(word="second"))
+    second.flush()
+
+    # The savepoint of the first session ends before the savepoint of the second one
+    with pytest.raises(RuntimeError, match="can not be used concurrently"):
+        first.commit()
+    second.close()
+    first.close()
+
+
+@pytest.mark.anyio
+async def test_request_sessions_wait_for_each_other(db_session: Session):
+    first, second = get_db(), get_db()
+    await anext(first)
+    waiting = asyncio.ensure_future(anext(second))
+    await asyncio.sleep(0.01)
+    assert not waiting.done()
+
+    await first.aclose()
+    await asyncio.wait_for(waiting, 1)
+    await second.aclose()
@@ -3,14 +3,19 @@ import logging
 import pytest
 from fastapi.encoders import jsonable_encoder
 from httpx import AsyncClient
+from sqlalchemy import delete
 from sqlalchemy.orm import Session
 
 from dictionary.enums import WordTypes
-from dictionary.models import Description, WordDescription
+from dictionary.models import Description, Tombstone, WordDescription
 from dictionary.tests.utils import (
     create_description,
+    create_full_dict_entry,
     create_word,
     create_word_definition_association_table,
+    executed_before_select_after_insert,
+    key_exists,
+    profiled_statements,
 )
 
 logger = logging.getLogger(__name__)
@@ -79,6 +84,39 @@ async def test_get_all_descriptions_with_multiple_desc_in_db(
     assert response.json() == expected_response
 
 
+@pytest.mark.anyio
+async def test_get_all_descriptions_brotli_response_above_minimum_size(
+    async_client: AsyncClient, db_session: Session
+):
+    for number in range(50):
+        create_description(in_polish=f"opis numer {number}", example="test example")
+
+    response = await async_client.get(
+        "/descriptions/all", headers={"Accept-Encoding": "gzip, br"}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "br"
+    assert response.json()["number_of_descriptions"] == 50
+
+
+@pytest.mark.anyio
+async def test_get_all_descriptions_with_sparse_fields(
+    async_client: AsyncClient, db_session: Session
+):
+    desc = create_description(example="test example")
+    expected_response = {
+        "number_of_descriptions": 1,
+        "descriptions": [{"id": desc.id, "in_polish": desc.in_polish}],
+    }
+
+    response = await async_client.get(
+        "/descriptions/all", params={"fields": "id,in_polish"}
+    )
+    assert response.status_code == 200
+    assert response.json() == expected_response
+
+
 @pytest.mark.anyio
 async def test_get_single_description_empty_db(
     async_client: AsyncClient, db_session: Session
@@ -135,6 +173,28 @@ async def test_add_new_description_successful(
     assert len(word_desc_association_table) == 1
 
 
+@pytest.mark.anyio
+async def test_add_new_description_statements(
+    async_client: AsyncClient, db_session: Session
+):
+    word, desc = create_full_dict_entry()
+    payload = {"type": WordTypes.NOUN, "in_polish": "oś"}
+
+    statements = await profiled_statements(
+        async_client, "POST", f"/descriptions/add/{word.id}", json=payload
+    )
+
+    # The word with its descriptions, the description and the association
+    assert sorted(statement.split()[0] for statement in statements) == [
+        "INSERT",
+        "INSERT",
+        "SELECT",
+    ]
+    new_desc = db_session.query(Description).filter_by(in_polish="oś").one()
+    response = await async_client.get(f"/words/single/{word.id}")
+    assert [d["id"] for d in response.json()["description"]] == [desc.id, new_desc.id]
+
+
 @pytest.mark.anyio
 async def test_add_new_description_invalid_word_id(
     async_client: AsyncClient, db_session: Session
@@ -210,13 +270,59 @@ async def test_add_new_description_intgrity_error_while_adding_the_same_desc(
 
     response = await async_client.post(f"/descriptions/add/{word.id}", json=payload)
 
-    expected_response = (
-        "Database constraint violated. Key (in_polish)=(test) already exists."
-    )
+    expected_response = key_exists("in_polish", "test")
     assert response.status_code == 400
     assert response.json()["detail"] == expected_response
 
 
+@pytest.mark.anyio
+async def test_upsert_description_creates_and_updates_description(
+    async_client: AsyncClient, db_session: Session
+):
+    payload = {"type": "noun", "in_polish": "sedno"}
+
+    response = await async_client.put("/descriptions/upsert", json=payload)
+    assert response.status_code == 201
+    assert response.json()["status"] == "created"
+    desc_id = response.json()["description"]["id"]
+
+    payload["example"] = "test example"
+    response = await async_client.put("/descriptions/upsert", json=payload)
+    assert response.status_code == 200
+    assert response.json() == {
+        "status": "updated",
+        "description": {"id": desc_id, **payload},
+    }
+
+    response = await async_client.put(
+        "/descriptions/upsert", json=payload, params={"on_conflict": "nothing"}
+    )
+    assert response.status_code == 200
+    assert response.json()["status"] == "unchanged"
+    assert db_session.query(Description).count() == 1
+
+
+@pytest.mark.anyio
+async def test_upsert_description_deleted_meanwhile(
+    async_client: AsyncClient, db_session: Session
+):
+    desc = create_description()
+    payload = {"type": "noun", "in_polish": desc.in_polish}
+
+    # Deleted after the upsert skipped the existing description, before it is read
+    with executed_before_select_after_insert(
+        delete(Description).where(Description.id == desc.id)
+    ):
+        response = await async_client.put(
+            "/descriptions/upsert", json=payload, params={"on_conflict": "nothing"}
+        )
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == (
+        f"Description '{desc.in_polish}' was deleted meanwhile, try again."
+    )
+
+
 @pytest.mark.anyio
 async def test_assign_description_to_a_word_successful(
     async_client: AsyncClient, db_session: Session
@@ -299,7 +405,7 @@ async def test_assign_description_intgrity_error_while_adding_the_same_word_and_
     word = create_word()
     desc = create_description()
     word_desc = create_word_definition_association_table(word.id, desc.id)
-    expected_response = "Database constraint violated. Key (word_id, description_id)=(1, 1) already exists."
+    expected_response = key_exists("word_id, description_id", f"{word.id}, {desc.id}")
 
     response = await async_client.post(f"/descriptions/assign/{word.id}/{desc.id}")
 
@@ -307,6 +413,61 @@ async def test_assign_description_intgrity_error_while_adding_the_same_word_and_
     assert response.json()["detail"] == expected_response
 
 
+@pytest.mark.anyio
+async def test_assign_descriptions_to_words_bulk(
+    async_client: AsyncClient, db_session: Session
+):
+    word = create_word()
+    desc_1 = create_description()
+    desc_2 = create_description(in_polish="oś")
+    create_word_definition_association_table(word.id, desc_1.id)
+    payload = [
+        {"word_id": word.id, "description_id": desc_1.id},
+        {"word_id": word.id, "description_id": desc_2.id},
+        {"word_id": 999, "description_id": desc_2.id},
+        {"word_id": word.id, "description_id": 999},
+    ]
+    expected_statuses = [
+        "already_linked",
+        "linked",
+        "word_not_found",
+        "description_not_found",
+    ]
+
+    response = await async_client.post("/descriptions/assign", json=payload)
+
+    assert response.status_code == 200
+    assert [result["status"] for result in response.json()] == expected_statuses
+    assert db_session.query(WordDescription).filter_by(word_id=word.id).count() == 2
+
+
+@pytest.mark.anyio
+async def test_unassign_descriptions_from_words_bulk(
+    async_client: AsyncClient, db_session: Session
+):
+    word = create_word()
+    desc_1 = create_description()
+    desc_2 = create_description(in_polish="oś")
+    create_word_definition_association_table(word.id, desc_1.id)
+    payload = [
+        {"word_id": word.id, "description_id": desc_1.id},
+        {"word_id": word.id, "description_id": desc_2.id},
+    ]
+
+    response = await async_client.post("/descriptions/unassign", json=payload)
+
+    assert response.status_code == 200
+    assert [result["status"] for result in response.json()] == [
+        "unlinked",
+        "not_linked",
+    ]
+    assert db_session.query(WordDescription).count() == 0
+    assert db_session.query(Description).count() == 2
+    tombstone = db_session.query(Tombstone).one()
+    assert tombstone.table_name == "word_description"
+    assert (tombstone.word_id, tombstone.description_id) == (word.id, desc_1.id)
+
+
 @pytest.mark.anyio
 async def test_update_description_successful(
     async_client: AsyncClient, db_session: Session
@@ -331,6 +492,24 @@ async def test_update_description_successful(
     assert desc.updated != new_desc.updated
 
 
+@pytest.mark.anyio
+async def test_update_description_statements(
+    async_client: AsyncClient, db_session: Session
+):
+    desc = create_description()
+
+    statements = await profiled_statements(
+        async_client,
+        "PATCH",
+        f"/descriptions/update/{desc.id}",
+        json={"in_english": "crux"},
+    )
+
+    # UPDATE ... RETURNING, without reading the row again
+    assert len(statements) == 1
+    assert statements[0].startswith("UPDATE description")
+
+
 @pytest.mark.parametrize(
     "key, invalid_value, code, exp_response",
     [
@@ -390,9 +569,7 @@ async def test_update_description_integrity_error(
     desc = create_description()
     desc_2 = create_description(in_polish="test")
     payload = {"type": WordTypes.ADJECTIVE, "in_polish": desc_2.in_polish}
-    expected_response = (
-        "Database constraint violated. Key (in_polish)=(test) already exists."
-    )
+    expected_response = key_exists("in_polish", "test")
 
     response = await async_client.patch(f"/descriptions/update/{desc.id}", json=payload)
 
@@ -415,6 +592,23 @@ async def test_delete_description_successfully(
     assert desc is None
 
 
+@pytest.mark.anyio
+async def test_delete_description_statements(
+    async_client: AsyncClient, db_session: Session
+):
+    desc = create_description()
+
+    statements = await profiled_statements(
+        async_client, "DELETE", f"/descriptions/delete/{desc.id}"
+    )
+
+    # DELETE ... RETURNING (without loading the row first) and the tombstone
+    assert sorted(statement.split()[0] for statement in statements) == [
+        "DELETE",
+        "INSERT",
+    ]
+
+
 @pytest.mark.anyio
 async def test_delete_description_invalid_description_id(
     async_client: AsyncClient, db_session: Session
@@ -426,3 +620,39 @@ async def test_delete_description_invalid_description_id(
 
     assert response.status_code == 404
     assert response.json()["detail"] == expected_response
+
+
+@pytest.mark.anyio
+async def test_delete_many_descriptions(async_client: AsyncClient, db_session: Session):
+    word, desc_1 = create_full_dict_entry()
+    desc_2 = create_full_dict_entry(word_id=word.id, in_polish="oś")
+    desc_3 = create_description(in_polish="obrót")
+    expected_response = {"deleted": [desc_1.id, desc_2.id], "not_found": [123]}
+
+    response = await async_client.delete(
+        "/descriptions/delete_many", params={"ids": [desc_1.id, desc_2.id, 123]}
+    )
+
+    assert response.status_code == 200
+    assert response.json() == expected_response
+    assert db_session.query(Description).one().id == desc_3.id
+    # Associations are removed by the database
+    assert db_session.query(WordDescription).count() == 0
+
+
+@pytest.mark.anyio
+async def test_delete_orphan_descriptions_in_batches(
+    async_client: AsyncClient, db_session: Session
+):
+    _, desc = create_full_dict_entry()
+    orphans = [create_description(in_polish=f"opis {i}").id for i in range(5)]
+    expected_response = {"number_of_descriptions": 5, "descriptions": orphans}
+
+    response = await async_client.delete(
+        "/descriptions/orphans", params={"batch_size": 2}
+    )
+
+    assert response.status_code == 200
+    assert response.json() == expected_response
+    assert db_session.query(Description).one().id == desc.id
+    assert db_session.query(Tombstone).count() == 5
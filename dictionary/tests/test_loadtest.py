@@ -0,0 +1,94 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from dictionary.enums import MasterLevel
+from dictionary.loadtest.generator import generate, parse_level_mix
+from dictionary.loadtest.runner import percentile, run_scenario
+from dictionary.loadtest.scenarios import SCENARIOS
+from dictionary.models import Description, Word, WordDescription
+
+
+def test_percentile_nearest_rank():
+    values = [float(value) for value in range(1, 101)]
+
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile(values, 100) == 100.0
+    assert percentile([0.5], 95) == 0.5
+    assert percentile([], 95) == 0.0
+
+
+def test_parse_level_mix():
+    assert parse_level_mix("new=3, prefect=1") == {
+        MasterLevel.NEW: 3.0,
+        MasterLevel.PERFECT: 1.0,
+    }
+
+
+def test_mixed_scenario_has_each_operation_once():
+    names = [operation.name for operation in SCENARIOS["mixed"]]
+
+    assert len(names) == len(set(names))
+    assert set(names) == {
+        operation.name
+        for name, operations in SCENARIOS.items()
+        if name != "mixed"
+        for operation in operations
+    }
+
+
+def test_generator_creates_dictionary(db_session: Session):
+    summary = generate(
+        db_session,
+        words=200,
+        fan_out=3,
+        shared=0.5,
+        level_mix={MasterLevel.NEW: 1, MasterLevel.HARD: 1},
+        batch_size=50,
+        seed=1,
+    )
+
+    assert summary["words"] == db_session.scalar(select(func.count(Word.id))) == 200
+    assert summary["descriptions"] == db_session.scalar(
+        select(func.count(Description.id))
+    )
+    assert summary["associations"] == db_session.scalar(
+        select(func.count()).select_from(WordDescription)
+    )
+    # 1 to 5 descriptions per word, half of the associations to shared descriptions
+    assert 200 <= summary["associations"] <= 1000
+    assert summary["descriptions"] < summary["associations"]
+    assert set(summary["levels"]) == {"new", "hard"}
+    assert sum(summary["levels"].values()) == 200
+    most_used = db_session.scalar(
+        select(func.count())
+        .select_from(WordDescription)
+        .group_by(WordDescription.description_id)
+        .order_by(func.count().desc())
+        .limit(1)
+    )
+    assert most_used > 1
+
+
+@pytest.mark.anyio
+async def test_run_search_scenario(async_client: AsyncClient, db_session: Session):
+    generate(db_session, words=50, seed=2)
+
+    report = await run_scenario(
+        async_client, "search", concurrency=4, requests=40, seed=3
+    )
+
+    assert report["dataset"]["words"] == 50
+    assert report["total"]["requests"] == 40
+    assert report["total"]["errors"] == 0
+    assert set(report["endpoints"]) <= {
+        "GET /words/translations?search",
+        "GET /words/translations?word_id",
+        "GET /words/single/{word_id}",
+    }
+    for endpoint in report["endpoints"].values():
+        latency = endpoint["latency_ms"]
+        assert latency["p50"] <= latency["p95"] <= latency["p99"] <= latency["max"]
+        assert set(endpoint["statuses"]) == {200}
@@ -0,0 +1,99 @@
+import json
+import logging
+from logging.handlers import QueueHandler
+from unittest.mock import patch
+
+from dictionary.logging_config import (
+    Capped,
+    JSONFormatter,
+    _use_queue,
+    configure_logging,
+    stop_logging,
+)
+
+
+def test_capped_small_payload_is_not_changed():
+    payload = [(1, "pivot"), (2, "axis")]
+
+    assert str(Capped(payload)) == str(payload)
+    assert "%s" % Capped({"deleted": [1, 2]}) == "{'deleted': [1, 2]}"
+
+
+def test_capped_large_payload():
+    payload = list(range(100))
+
+    assert str(Capped(payload, max_items=3)) == "[0, 1, 2] ... (100 items in total)"
+    assert (
+        str(Capped("x" * 50, max_chars=10)) == "xxxxxxxxxx ... (50 characters in total)"
+    )
+
+
+def test_capped_zero_limits_are_not_defaults():
+    assert str(Capped([1, 2], max_items=0)) == "[] ... (2 items in total)"
+    assert str(Capped("abc", max_chars=0)) == " ... (3 characters in total)"
+
+
+def test_configure_logging_queue_mode():
+    logger = logging.getLogger("dictionary")
+    try:
+        with patch("dictionary.logging_config.config.LOG_QUEUE_ENABLED", True):
+            configure_logging()
+
+        assert len(logger.handlers) == 1
+        assert isinstance(logger.handlers[0], QueueHandler)
+    finally:
+        stop_logging()
+        configure_logging()
+
+    assert not any(isinstance(handler, QueueHandler) for handler in logger.handlers)
+
+
+def test_queue_handler_drops_records_below_handlers_level():
+    logger = logging.getLogger("dictionary.tests.queue")
+    handler = logging.Handler(logging.WARNING)
+    handler.emit = lambda record: None
+    logger.handlers = [handler]
+    logger.propagate = False
+    rendered = []
+
+    class Payload:
+        def __str__(self):
+            rendered.append(True)
+            return "payload"
+
+    try:
+        _use_queue(logger)
+        assert logger.handlers[0].level == logging.WARNING
+
+        logger.debug("Not emitted: %s", Payload())
+        assert rendered == []
+        logger.warning("Emitted: %s", Payload())
+        assert rendered == [True]
+    finally:
+        stop_logging()
+        logger.handlers = []
+        logger.propagate = True
+        configure_logging()
+
+
+def test_json_formatter():
+    record = logging.LogRecord(
+        "dictionary.middleware",
+        logging.INFO,
+        "middleware.py",
+        10,
+        "GET %s",
+        ("/",),
+        None,
+    )
+    record.request_id = "abc123"
+    record.fields = {"route": "/", "status": 200}
+
+    entry = json.loads(JSONFormatter().format(record))
+
+    assert entry["message"] == "GET /"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "dictionary.middleware"
+    assert entry["request_id"] == "abc123"
+    assert entry["route"] == "/"
+    assert entry["status"] == 200
@@ -0,0 +1,104 @@
+from unittest.mock import patch
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.orm import Session
+
+from dictionary.metrics import (
+    CACHE_HIT_RATIO,
+    CACHE_REQUESTS,
+    REGISTRY,
+    SHUFFLE_DRAWS,
+    Counter,
+    Histogram,
+    Registry,
+)
+from dictionary.routers.shuffle import Shuffle
+from dictionary.tests.utils import create_word
+
+
+def test_registry_render_text_format():
+    registry = Registry()
+    counter = registry.register(Counter("test_total", "Test counter.", ("route",)))
+    histogram = registry.register(
+        Histogram("test_seconds", "Test histogram.", buckets=(0.1, 1.0))
+    )
+    counter.inc(route='/a"b')
+    counter.inc(2, route='/a"b')
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+    expected = (
+        "# HELP test_total Test counter.\n"
+        "# TYPE test_total counter\n"
+        'test_total{route="/a\\"b"} 3.0\n'
+        "# HELP test_seconds Test histogram.\n"
+        "# TYPE test_seconds histogram\n"
+        'test_seconds_bucket{le="0.1"} 1.0\n'
+        'test_seconds_bucket{le="1.0"} 2.0\n'
+        'test_seconds_bucket{le="+Inf"} 3.0\n'
+        "test_seconds_sum 5.55\n"
+        "test_seconds_count 3.0\n"
+    )
+
+    assert registry.render() == expected
+
+
+def test_counter_requires_all_labels():
+    counter = Counter("test_total", "Test counter.", ("route", "status"))
+
+    with pytest.raises(ValueError):
+        counter.inc(route="/")
+
+
+@pytest.mark.anyio
+async def test_get_metrics(async_client: AsyncClient, db_session: Session):
+    await async_client.get("/words/single/123")
+
+    response = await async_client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert (
+        'http_requests_total{method="GET",route="/words/single/{word_id}",'
+        'status="404"}' in response.text
+    )
+    assert 'http_request_duration_seconds_bucket{method="GET"' in response.text
+    assert 'db_query_duration_seconds_count{operation="SELECT"}' in response.text
+    assert 'db_pool_connections{state="checked_out"}' in response.text
+
+
+@pytest.mark.anyio
+async def test_shuffle_draws_counted_per_level(
+    async_client: AsyncClient, db_session: Session
+):
+    create_word()
+    draws = SHUFFLE_DRAWS.value(level="new") or 0
+
+    with patch.object(Shuffle, "recent_words", []):
+        response = await async_client.get("/shuffle/random_word")
+
+    assert response.status_code == 200
+    assert SHUFFLE_DRAWS.value(level="new") == draws + 1
+
+
+def test_sql_compilation_cache_hit_ratio(db_session: Session):
+    Shuffle.level_weights(db_session)
+    hits = CACHE_REQUESTS.value(cache="sql_compilation", result="hit") or 0
+    # The same statement again - compiled form taken from the cache
+    Shuffle.level_weights(db_session)
+
+    assert CACHE_REQUESTS.value(cache="sql_compilation", result="hit") > hits
+    REGISTRY.render()
+    assert 0 < CACHE_HIT_RATIO.value(cache="sql_compilation") <= 1
+
+
+def test_histogram_observe_updates_counts_in_place():
+    histogram = Histogram("test_seconds", "Test histogram.", buckets=(0.1, 1.0))
+    histogram.observe(0.1)
+    counts = histogram.value()[0]
+    histogram.observe(1.0)
+    histogram.observe(2.0)
+
+    assert histogram.value()[0] is counts
+    assert counts == [1, 1, 1]
@@ -0,0 +1,60 @@
+import logging
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from dictionary.database import engine
+from dictionary.tests.utils import create_word
+
+
+def request_log(caplog) -> dict:
+    (record,) = [r for r in caplog.records if r.name == "dictionary.middleware"]
+    return record.fields
+
+
+@pytest.mark.anyio
+async def test_request_log_with_route_template_and_db_stats(
+    async_client: AsyncClient, db_session: Session, caplog
+):
+    word = create_word()
+
+    with caplog.at_level(logging.INFO, logger="dictionary.middleware"):
+        response = await async_client.get(f"/words/single/{word.id}")
+
+    fields = request_log(caplog)
+    assert response.status_code == 200
+    assert response.headers["X-Request-ID"] == fields["request_id"]
+    assert fields["method"] == "GET"
+    assert fields["route"] == "/words/single/{word_id}"
+    assert fields["status"] == 200
+    assert fields["db_queries"] >= 1
+    assert fields["duration_ms"] >= fields["db_ms"] > 0
+
+
+@pytest.mark.anyio
+async def test_request_log_uses_given_request_id(
+    async_client: AsyncClient, db_session: Session, caplog
+):
+    with caplog.at_level(logging.INFO, logger="dictionary.middleware"):
+        response = await async_client.get(
+            "/words/single/123", headers={"X-Request-ID": "abc123"}
+        )
+
+    fields = request_log(caplog)
+    assert response.status_code == 404
+    assert response.headers["X-Request-ID"] == "abc123"
+    assert fields["request_id"] == "abc123"
+    assert fields["status"] == 404
+
+
+def test_failed_query_start_time_dropped():
+    with engine.connect() as connection:
+        with pytest.raises(DBAPIError):
+            connection.exec_driver_sql("SELECT missing FROM no_such_table")
+        assert connection.info["query_start"] == []
+
+        connection.rollback()
+        connection.exec_driver_sql("SELECT 1")
+        assert connection.info["query_start"] == []
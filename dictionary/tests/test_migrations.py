@@ -0,0 +1,107 @@
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+
+from alembic import command
+from dictionary.database import Base
+from dictionary.enums import SchemaCheck
+from dictionary.exceptions import DatabaseError
+from dictionary.migrations import (
+    alembic_config,
+    alembic_heads,
+    check_schema,
+    create_schema,
+)
+from dictionary.tests.conftest import engine
+
+
+def test_alembic_migrations_have_single_head():
+    assert len(alembic_heads()) == 1
+
+
+def test_check_schema_not_migrated_database(db_session: Session):
+    # The test database is created without migrations (no alembic_version table)
+    with pytest.raises(DatabaseError) as exc_info:
+        check_schema(engine, SchemaCheck.VERIFY)
+
+    assert "Database schema is not up to date" in str(exc_info.value)
+
+
+def test_check_schema_database_at_head_revision(db_session: Session):
+    (head,) = alembic_heads()
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                "CREATE TABLE alembic_version "
+                "(version_num VARCHAR(32) NOT NULL PRIMARY KEY)"
+            )
+        )
+        connection.execute(
+            text("INSERT INTO alembic_version (version_num) VALUES (:head)"),
+            {"head": head},
+        )
+    try:
+        check_schema(engine, SchemaCheck.VERIFY)
+    finally:
+        with engine.begin() as connection:
+            connection.execute(text("DROP TABLE alembic_version"))
+
+
+def test_check_schema_skip(db_session: Session):
+    check_schema(engine, SchemaCheck.SKIP)
+
+
+def test_create_schema_refuses_database_with_tables(db_session: Session):
+    with pytest.raises(DatabaseError) as exc_info:
+        create_schema(engine)
+
+    assert "Database is not empty" in str(exc_info.value)
+
+
+def test_create_schema_of_empty_database(tmp_path):
+    empty_engine = create_engine(f"sqlite:///{tmp_path / 'empty.db'}")
+    try:
+        create_schema(empty_engine)
+        check_schema(empty_engine, SchemaCheck.VERIFY)
+        assert "word_description" in inspect(empty_engine).get_table_names()
+    finally:
+        empty_engine.dispose()
+
+
+@pytest.mark.skipif(
+    engine.dialect.name != "postgresql",
+    reason="The migrations change the PostgreSQL schema of earlier versions",
+)
+def test_stamped_create_all_database_upgraded_to_head():
+    # Migrated in a separate schema, in a transaction which is rolled back
+    with engine.connect() as connection, connection.begin() as transaction:
+        connection.execute(text("CREATE SCHEMA migrations_test"))
+        connection.execute(text("SET LOCAL search_path TO migrations_test"))
+        config = alembic_config()
+        config.attributes["connection"] = connection
+        config.attributes["configure_logger"] = False
+
+        # The initial revision is the schema of the create_all() databases
+        command.upgrade(config, "5b1e8f3c2a47")
+        connection.execute(text("DROP TABLE alembic_version"))
+        assert "tombstone" not in inspect(connection).get_table_names()
+
+        command.stamp(config, "5b1e8f3c2a47")
+        command.upgrade(config, "head")
+        differences = [
+            difference
+            for difference in compare_metadata(
+                MigrationContext.configure(connection), Base.metadata
+            )
+            # unique=True of the primary keys is not reflected by Alembic (the
+            # unique constraints exist)
+            if not (
+                difference[0] == "add_constraint"
+                and [column.name for column in difference[1].columns] == ["id"]
+            )
+        ]
+        transaction.rollback()
+
+    assert differences == []
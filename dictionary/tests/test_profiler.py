@@ -0,0 +1,97 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.orm import Session
+
+from dictionary.profiler import ProfileHistory, SqlProfile, fingerprint
+from dictionary.tests.utils import create_full_dict_entry
+
+
+def test_fingerprint_replaces_literals_and_parameters():
+    assert fingerprint(
+        "SELECT word.id FROM word\n  WHERE word.id = %(id_1)s AND word.word = 'pivot'"
+    ) == fingerprint("SELECT word.id FROM word WHERE word.id = 12 AND word.word = 'x'")
+    assert (
+        fingerprint("SELECT * FROM word WHERE id IN (?, ?, ?) LIMIT 10")
+        == "SELECT * FROM word WHERE id IN (...) LIMIT ?"
+    )
+    assert (
+        fingerprint("INSERT INTO t (a, b) VALUES (:a_0, :b_0), (:a_1, :b_1)")
+        == "INSERT INTO t (a, b) VALUES (...)"
+    )
+    # Casts are not parameters
+    assert fingerprint("SELECT CAST(x AS INTEGER)::TEXT") == (
+        "SELECT CAST(x AS INTEGER)::TEXT"
+    )
+
+
+def test_profile_suspected_n_plus_one():
+    profile = SqlProfile("abc")
+    for word_id in range(3):
+        profile.record(f"SELECT * FROM description WHERE word_id = {word_id}", 0.001)
+    profile.record("SELECT * FROM word", 0.002)
+
+    (query,) = profile.suspected_n_plus_one(threshold=3)
+    assert query.count == 3
+    assert query.fingerprint == "SELECT * FROM description WHERE word_id = ?"
+    assert profile.total_queries == 4
+    assert profile.suspected_n_plus_one(threshold=4) == []
+
+
+def test_profile_history_keeps_last_profiles():
+    history = ProfileHistory(max_items=2)
+    for request_id in ("a", "b", "c"):
+        history.add(SqlProfile(request_id))
+
+    assert history.get("a") is None
+    assert [profile.request_id for profile in history.all()] == ["c", "b"]
+
+
+@pytest.mark.anyio
+async def test_profiled_request_headers_and_debug_endpoint(
+    async_client: AsyncClient, db_session: Session, caplog
+):
+    word, _ = create_full_dict_entry(word="pivot")
+    payload = [
+        {
+            "op": "add_description",
+            "params": {"word_id": word.id},
+            "body": {"in_polish": f"opis {index}"},
+        }
+        for index in range(5)
+    ]
+
+    # Each operation of the batch runs the same statements again
+    response = await async_client.post(
+        "/batch", json=payload, headers={"X-SQL-Profile": "1"}
+    )
+
+    assert response.status_code == 200
+    assert int(response.headers["X-SQL-Queries"]) >= 5
+    # Read of the word, INSERT of the description and of the association row
+    assert response.headers["X-SQL-N-Plus-One"] == "3"
+    assert "Suspected N+1 in POST /batch" in caplog.text
+
+    request_id = response.headers["X-Request-ID"]
+    response = await async_client.get(f"/debug/sql/{request_id}")
+    profile = response.json()
+    assert response.status_code == 200
+    assert profile["route"] == "/batch"
+    assert len(profile["n_plus_one"]) == 3
+    assert any(
+        query.startswith("INSERT INTO description") for query in profile["n_plus_one"]
+    )
+
+    response = await async_client.get("/debug/sql")
+    assert response.json()[0]["request_id"] == request_id
+
+
+@pytest.mark.anyio
+async def test_not_profiled_request(async_client: AsyncClient, db_session: Session):
+    create_full_dict_entry()
+
+    response = await async_client.get("/words/descriptions")
+
+    assert response.status_code == 200
+    assert "X-SQL-Queries" not in response.headers
+    response = await async_client.get(f"/debug/sql/{response.headers['X-Request-ID']}")
+    assert response.status_code == 404
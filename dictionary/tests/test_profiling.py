@@ -0,0 +1,107 @@
+import pstats
+from unittest.mock import patch
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.orm import Session
+from starlette.datastructures import Headers
+
+from dictionary.config import config
+from dictionary.enums import ProfileMode
+from dictionary.profiling import RequestProfile, profiling_modes
+from dictionary.tests.utils import create_full_dict_entry
+
+
+def test_profiling_modes_from_header():
+    assert profiling_modes(Headers({"X-Profile": "CPU, memory"})) == {
+        ProfileMode.CPU,
+        ProfileMode.MEMORY,
+    }
+    assert profiling_modes(Headers({"X-Profile": "disk"})) == set()
+    assert profiling_modes(Headers()) == set()
+
+
+def test_profiling_modes_require_valid_token():
+    with patch.object(config, "REQUEST_PROFILING_TOKEN", "secret"):
+        assert profiling_modes(Headers({"X-Profile": "cpu"})) == set()
+        assert (
+            profiling_modes(Headers({"X-Profile": "cpu", "X-Profile-Token": "wrong"}))
+            == set()
+        )
+        assert profiling_modes(
+            Headers({"X-Profile": "cpu", "X-Profile-Token": "secret"})
+        ) == {ProfileMode.CPU}
+
+
+def test_only_one_request_profiled_at_a_time(tmp_path):
+    first = RequestProfile("first", {ProfileMode.MEMORY}, directory=str(tmp_path))
+    second = RequestProfile("second", {ProfileMode.MEMORY}, directory=str(tmp_path))
+
+    assert first.start()
+    assert not second.start()
+    first.stop()
+    assert second.start()
+    second.stop()
+
+
+@pytest.mark.anyio
+async def test_profiled_request_writes_profile_files(
+    async_client: AsyncClient, db_session: Session, tmp_path
+):
+    create_full_dict_entry()
+
+    with patch.object(config, "REQUEST_PROFILING_DIR", str(tmp_path)):
+        response = await async_client.get(
+            "/words/descriptions", headers={"X-Profile": "cpu,memory"}
+        )
+
+    request_id = response.headers["X-Request-ID"]
+    assert response.status_code == 200
+    assert response.headers["X-Profile-Files"] == (
+        f"{request_id}.pstats, {request_id}.allocations.txt"
+    )
+
+    stats = pstats.Stats(str(tmp_path / f"{request_id}.pstats"))
+    assert any(name == "get_all_dict_data" for _, _, name in stats.stats)
+
+    report = (tmp_path / f"{request_id}.allocations.txt").read_text()
+    assert report.startswith(
+        f"GET /words/descriptions (/words/descriptions), request {request_id}"
+    )
+    assert "Top 25 lines:" in report
+
+
+def test_request_profile_rejects_unsafe_request_id(tmp_path):
+    with pytest.raises(ValueError):
+        RequestProfile("../../x", {ProfileMode.CPU}, directory=str(tmp_path))
+
+
+@pytest.mark.anyio
+async def test_profile_files_not_named_after_invalid_request_id(
+    async_client: AsyncClient, db_session: Session, tmp_path
+):
+    directory = tmp_path / "profiles"
+
+    with patch.object(config, "REQUEST_PROFILING_DIR", str(directory)):
+        response = await async_client.get(
+            "/words/all",
+            headers={"X-Profile": "cpu", "X-Request-ID": "../../escaped"},
+        )
+
+    request_id = response.headers["X-Request-ID"]
+    assert request_id != "../../escaped"
+    assert [path.name for path in tmp_path.rglob("*.pstats")] == [
+        f"{request_id}.pstats"
+    ]
+    assert (directory / f"{request_id}.pstats").exists()
+
+
+@pytest.mark.anyio
+async def test_request_not_profiled_without_header(
+    async_client: AsyncClient, db_session: Session, tmp_path
+):
+    with patch.object(config, "REQUEST_PROFILING_DIR", str(tmp_path)):
+        response = await async_client.get("/words/all")
+
+    assert "X-Profile-Files" not in response.headers
+    assert list(tmp_path.iterdir()) == []
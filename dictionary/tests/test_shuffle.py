@@ -1,4 +1,6 @@
+import asyncio
 import logging
+import threading
 from unittest.mock import patch
 
 import pytest
@@ -8,9 +10,12 @@ from sqlalchemy.orm import Session
 
 from dictionary.enums import MasterLevel
 from dictionary.exceptions import DatabaseError
-from dictionary.models import LevelWeight
+from dictionary.models import LevelWeight, Word
+from dictionary.queries import update_word_levels
 from dictionary.routers.shuffle import Shuffle
+from dictionary.tests.conftest import TestingSessionLocal
 from dictionary.tests.utils import create_description, create_word
+from dictionary.write_behind import WriteBehindBuffer
 
 logger = logging.getLogger(__name__)
 
@@ -372,3 +377,245 @@ async def test_get_random_word_404_empty_description_table_in_db(
 
     assert response.status_code == 404
     assert response.json()["detail"] == expected_message
+
+
+@pytest.mark.anyio
+async def test_update_study_level_saved_directly(
+    async_client: AsyncClient, db_session: Session
+):
+    word = create_word()
+    expected_response = {"word_id": word.id, "master_level": "hard", "buffered": False}
+
+    response = await async_client.patch(
+        f"/shuffle/level/{word.id}", params={"level": "hard"}
+    )
+
+    assert response.status_code == 200
+    assert response.json() == expected_response
+    db_word = db_session.query(Word).filter_by(id=word.id).one()
+    assert db_word.master_level == MasterLevel.HARD
+
+
+@pytest.mark.anyio
+async def test_update_study_level_404_not_existing_word(
+    async_client: AsyncClient, db_session: Session
+):
+    response = await async_client.patch("/shuffle/level/123", params={"level": "hard"})
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Word with the ID: 123 was not found."
+
+
+@pytest.mark.anyio
+async def test_update_study_level_buffered(
+    async_client: AsyncClient, db_session: Session
+):
+    word = create_word()
+    buffer = WriteBehindBuffer(
+        TestingSessionLocal, flush_interval_ms=60_000, max_items=10
+    )
+
+    with (
+        patch("dictionary.routers.shuffle.config.WRITE_BEHIND_ENABLED", True),
+        patch("dictionary.routers.shuffle.write_behind", buffer),
+    ):
+        for level in ("medium", "hard", "medium"):
+            response = await async_client.patch(
+                f"/shuffle/level/{word.id}", params={"level": level}
+            )
+            assert response.status_code == 202
+            assert response.json()["buffered"] is True
+
+    # Nothing is written until the buffer is flushed
+    db_word = db_session.query(Word).filter_by(id=word.id).one()
+    assert db_word.master_level == MasterLevel.NEW
+    assert len(buffer) == 1
+
+    assert buffer.flush() == [word.id]
+
+    db_session.refresh(db_word)
+    assert db_word.master_level == MasterLevel.MEDIUM
+    assert len(buffer) == 0
+
+
+@pytest.mark.anyio
+async def test_write_behind_buffer_flushes_when_full(db_session: Session):
+    words = [create_word(word=f"word {i}") for i in range(3)]
+    buffer = WriteBehindBuffer(
+        TestingSessionLocal, flush_interval_ms=60_000, max_items=2
+    )
+
+    await buffer.record(words[0].id, MasterLevel.MEDIUM)
+    await buffer.record(words[0].id, MasterLevel.PERFECT)
+    assert len(buffer) == 1
+    await buffer.record(words[1].id, MasterLevel.HARD)
+
+    assert len(buffer) == 0
+    levels = dict(db_session.query(Word.id, Word.master_level).all())
+    assert levels == {
+        words[0].id: MasterLevel.PERFECT,
+        words[1].id: MasterLevel.HARD,
+        words[2].id: MasterLevel.NEW,
+    }
+
+
+def test_write_behind_buffer_rejects_non_positive_interval():
+    for interval in (0, -1):
+        with pytest.raises(ValueError):
+            WriteBehindBuffer(
+                TestingSessionLocal, flush_interval_ms=interval, max_items=2
+            )
+
+
+def unavailable_database():
+    raise DatabaseError("Database not available.")
+
+
+@pytest.mark.anyio
+async def test_update_study_level_written_directly_when_buffer_failing(
+    async_client: AsyncClient, db_session: Session
+):
+    word = create_word()
+    other_word = create_word(word="other")
+    buffer = WriteBehindBuffer(
+        unavailable_database,
+        flush_interval_ms=60_000,
+        max_items=10,
+        max_failed_flushes=2,
+    )
+    assert await buffer.record(word.id, MasterLevel.PERFECT)
+    assert await buffer.record(other_word.id, MasterLevel.PERFECT)
+    for _ in range(2):
+        assert buffer.flush() == []
+    assert buffer.failing
+
+    with (
+        patch("dictionary.routers.shuffle.config.WRITE_BEHIND_ENABLED", True),
+        patch("dictionary.routers.shuffle.write_behind", buffer),
+    ):
+        response = await async_client.patch(
+            f"/shuffle/level/{word.id}", params={"level": "hard"}
+        )
+
+    assert response.status_code == 200
+    assert response.json()["buffered"] is False
+    db_word = db_session.query(Word).filter_by(id=word.id).one()
+    assert db_word.master_level == MasterLevel.HARD
+    # The buffered change is dropped (older than the direct write)
+    assert len(buffer) == 1
+
+    buffer.session_factory = TestingSessionLocal
+    assert buffer.flush() == [other_word.id]
+    assert not buffer.failing
+    db_session.refresh(db_word)
+    assert db_word.master_level == MasterLevel.HARD
+
+
+@pytest.mark.anyio
+async def test_write_behind_failing_record_does_not_wait_for_flush(
+    db_session: Session,
+):
+    buffer = WriteBehindBuffer(
+        unavailable_database,
+        flush_interval_ms=60_000,
+        max_items=10,
+        max_failed_flushes=1,
+    )
+    await buffer.record(1, MasterLevel.PERFECT)
+    buffer.flush()
+    assert buffer.failing
+
+    # A flush running in the thread pool (e.g. waiting for the database)
+    with buffer._flush_lock:
+        assert not await asyncio.wait_for(buffer.record(1, MasterLevel.HARD), 1)
+    assert len(buffer) == 0
+
+
+@pytest.mark.parametrize(
+    "method, url, payload",
+    [
+        ("PATCH", "/words/update/{id}", lambda word: {"master_level": "hard"}),
+        ("PATCH", "/words/levels", lambda word: {"levels": {word.id: "hard"}}),
+        (
+            "PATCH",
+            "/words/levels",
+            lambda word: {"filter": {"search": word.word}, "level": "hard"},
+        ),
+        (
+            "PUT",
+            "/words/upsert",
+            lambda word: {"word": word.word, "master_level": "hard"},
+        ),
+    ],
+)
+@pytest.mark.anyio
+async def test_write_behind_direct_level_write_wins(
+    async_client: AsyncClient, db_session: Session, method, url, payload
+):
+    word = create_word()
+    buffer = WriteBehindBuffer(
+        TestingSessionLocal, flush_interval_ms=60_000, max_items=10
+    )
+    await buffer.record(word.id, MasterLevel.PERFECT)
+
+    with patch("dictionary.routers.word.write_behind", buffer):
+        response = await async_client.request(
+            method, url.format(id=word.id), json=payload(word)
+        )
+    assert response.status_code == 200
+
+    # The buffered change is older than the direct write
+    assert buffer.flush() == []
+    db_word = db_session.query(Word).filter_by(id=word.id).one()
+    assert db_word.master_level == MasterLevel.HARD
+
+
+@pytest.mark.anyio
+async def test_write_behind_flush_skips_words_written_directly_meanwhile(
+    db_session: Session,
+):
+    words = [create_word(word=f"word {i}") for i in range(2)]
+    buffer = WriteBehindBuffer(
+        TestingSessionLocal, flush_interval_ms=60_000, max_items=10
+    )
+    await buffer.record(words[0].id, MasterLevel.PERFECT)
+    await buffer.record(words[1].id, MasterLevel.HARD)
+
+    def direct_write_during_flush(db, levels):
+        # The direct write of the first word discards it while the flush writes
+        buffer.discard([words[0].id])
+        return update_word_levels(db, levels)
+
+    with patch(
+        "dictionary.write_behind.update_word_levels",
+        side_effect=direct_write_during_flush,
+    ):
+        assert buffer.flush() == [words[1].id]
+
+    levels = dict(db_session.query(Word.id, Word.master_level).all())
+    assert levels == {words[0].id: MasterLevel.NEW, words[1].id: MasterLevel.HARD}
+
+
+@pytest.mark.anyio
+async def test_write_behind_stop_waits_for_running_flush(db_session: Session):
+    word = create_word()
+    started, release = threading.Event(), threading.Event()
+
+    def slow_session():
+        started.set()
+        release.wait(5)
+        return TestingSessionLocal()
+
+    buffer = WriteBehindBuffer(slow_session, flush_interval_ms=60_000, max_items=1)
+    await buffer.start()
+    await buffer.record(word.id, MasterLevel.HARD)
+    await asyncio.to_thread(started.wait, 5)
+
+    stopping = asyncio.create_task(buffer.stop())
+    await asyncio.sleep(0.05)
+    assert not stopping.done()
+
+    release.set()
+    await stopping
+    db_word = db_session.query(Word).filter_by(id=word.id).one()
+    assert db_word.master_level == MasterLevel.HARD
@@ -0,0 +1,68 @@
+import logging
+from unittest.mock import patch
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.orm import Session
+
+from dictionary.database import engine
+from dictionary.slow_queries import SlowQueryLog
+from dictionary.tests.utils import create_full_dict_entry
+
+
+def slow_query_records(caplog) -> list[logging.LogRecord]:
+    return [r for r in caplog.records if r.name == "dictionary.slow_queries"]
+
+
+@pytest.mark.anyio
+async def test_slow_query_logged_with_route_and_parameters(
+    async_client: AsyncClient, db_session: Session, caplog
+):
+    create_full_dict_entry()
+
+    with patch("dictionary.instrumentation.query_hooks", [SlowQueryLog(0)]):
+        response = await async_client.get("/words/translations?search=piv")
+
+    records = slow_query_records(caplog)
+    assert response.status_code == 200
+    assert records
+    assert all(r.fields["route"] == "/words/translations" for r in records)
+    assert any("'piv'" in r.getMessage() for r in records)
+    assert all(r.fields["plan"] is None for r in records)
+
+
+@pytest.mark.anyio
+async def test_slow_query_log_disabled(
+    async_client: AsyncClient, db_session: Session, caplog
+):
+    create_full_dict_entry()
+
+    with patch("dictionary.instrumentation.query_hooks", [SlowQueryLog(None)]):
+        await async_client.get("/words/translations?search=piv")
+
+    assert slow_query_records(caplog) == []
+
+
+@pytest.mark.anyio
+@pytest.mark.skipif(
+    engine.dialect.name != "postgresql",
+    reason="EXPLAIN (ANALYZE, BUFFERS) is captured only on PostgreSQL",
+)
+async def test_slow_query_plan_captured_once_per_fingerprint(
+    async_client: AsyncClient, db_session: Session, caplog
+):
+    create_full_dict_entry()
+
+    with patch(
+        "dictionary.instrumentation.query_hooks", [SlowQueryLog(0, explain=True)]
+    ):
+        await async_client.get("/words/translations?search=piv")
+        first_plans = [r.fields["plan"] for r in slow_query_records(caplog)]
+        caplog.clear()
+        # The same queries with other parameters
+        await async_client.get("/words/translations?search=pivot")
+        second_plans = [r.fields["plan"] for r in slow_query_records(caplog)]
+
+    assert any(first_plans)
+    assert all("Execution Time" in plan for plan in first_plans if plan)
+    assert second_plans and not any(second_plans)
@@ -0,0 +1,236 @@
+from random import Random
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from dictionary import snapshot as snapshot_module
+from dictionary.database import get_db
+from dictionary.enums import MasterLevel, WordTypes
+from dictionary.main import app
+from dictionary.routers.shuffle import Shuffle
+from dictionary.snapshot import (
+    ShuffleIndex,
+    Snapshot,
+    SnapshotError,
+    load_snapshot,
+    load_state,
+    save_state,
+    unload_snapshot,
+    write_snapshot,
+)
+from dictionary.tests.utils import create_full_dict_entry, create_word
+
+
+@pytest.fixture
+def snapshot_file(db_session: Session, tmp_path):
+    word, desc = create_full_dict_entry(
+        word="pivot", master_level=MasterLevel.HARD, notes="żółw"
+    )
+    create_full_dict_entry(
+        word_id=word.id, type=None, in_polish="oś", in_english="axis"
+    )
+    create_full_dict_entry(
+        word="Pivot table", in_polish="tabela przestawna", description_id=desc.id
+    )
+    create_word("pivotal", master_level=MasterLevel.PERFECT)
+    path = str(tmp_path / "dictionary.snapshot")
+    write_snapshot(db_session, path)
+    return path
+
+
+@pytest.fixture
+def unavailable_database(snapshot_file, monkeypatch):
+    """Loads the snapshot and makes the database unavailable for the endpoints."""
+    engine = create_engine("sqlite:////nonexistent/directory/dictionary.db")
+    app.dependency_overrides[get_db] = lambda: Session(engine)
+    monkeypatch.setattr(Shuffle, "recent_words", [])
+    monkeypatch.setattr(Shuffle, "last_description", None)
+    load_snapshot(snapshot_file)
+    yield snapshot_module.loaded
+    unload_snapshot()
+    app.dependency_overrides.pop(get_db)
+    engine.dispose()
+
+
+def test_snapshot_round_trip(snapshot_file):
+    snapshot = Snapshot(snapshot_file)
+    try:
+        assert len(snapshot) == 3
+        pivot = snapshot.word_index(snapshot.word_ids[0])
+        assert snapshot.word(pivot) == {
+            "id": snapshot.word_ids[0],
+            "word": "pivot",
+            "master_level": MasterLevel.HARD,
+            "notes": "żółw",
+        }
+        assert snapshot.word(2)["notes"] is None
+        assert snapshot.word_index(1000) is None
+        assert [
+            snapshot.description(index) for index in snapshot.word_descriptions(0)
+        ] == [
+            {
+                "id": snapshot.description_ids[0],
+                "type": WordTypes.NOUN,
+                "in_polish": "sedno",
+                "in_english": None,
+                "example": None,
+            },
+            {
+                "id": snapshot.description_ids[1],
+                "type": None,
+                "in_polish": "oś",
+                "in_english": "axis",
+                "example": None,
+            },
+        ]
+        # The shared description, no descriptions of the last word
+        assert snapshot.word_descriptions(1) == [0]
+        assert snapshot.word_descriptions(2) == []
+        assert snapshot.level_weights[MasterLevel.NEW] == MasterLevel.NEW.weight
+    finally:
+        snapshot.close()
+
+
+def test_invalid_snapshot_file(tmp_path):
+    path = tmp_path / "invalid.snapshot"
+    path.write_bytes(b"not a snapshot" * 10)
+
+    with pytest.raises(SnapshotError):
+        Snapshot(str(path))
+    assert load_snapshot(str(path)) is None
+
+
+def test_empty_snapshot_file(tmp_path):
+    path = tmp_path / "empty.snapshot"
+    path.touch()
+
+    with pytest.raises(SnapshotError):
+        Snapshot(str(path))
+    assert load_snapshot(str(path)) is None
+
+
+def test_truncated_snapshot_file(snapshot_file, tmp_path):
+    data = open(snapshot_file, "rb").read()
+    path = tmp_path / "truncated.snapshot"
+    for size in (len(data) - 8, len(data) // 2):
+        path.write_bytes(data[:size])
+        with pytest.raises(SnapshotError):
+            Snapshot(str(path))
+
+
+def test_search_index(snapshot_file):
+    loaded = load_snapshot(snapshot_file)
+    try:
+        assert loaded.search.search("PIVOT") == [0, 1, 2]
+        assert loaded.search.search("tab") == [1]
+        # Matches within one word only
+        assert loaded.search.search("t\npiv") == []
+        assert loaded.search.search("axis") == []
+    finally:
+        unload_snapshot()
+
+
+def test_shuffle_index_uses_level_weights(snapshot_file):
+    snapshot = Snapshot(snapshot_file)
+    try:
+        snapshot.level_weights[MasterLevel.NEW] = 0.0
+        snapshot.level_weights[MasterLevel.PERFECT] = 0.0
+        index = ShuffleIndex(snapshot)
+        rng = Random(0)
+
+        assert {index.draw(rng) for _ in range(50)} == {0}
+
+        snapshot.level_weights[MasterLevel.HARD] = 0.0
+        with pytest.raises(ValueError):
+            ShuffleIndex(snapshot).draw(rng)
+    finally:
+        snapshot.close()
+
+
+@pytest.mark.anyio
+async def test_random_word_served_from_snapshot(
+    async_client: AsyncClient, unavailable_database
+):
+    words = set()
+    for _ in range(3):
+        response = await async_client.get("/shuffle/random_word")
+        assert response.status_code == 200
+        assert "x-snapshot-created" in response.headers
+        words.add(response.json()["word"])
+
+    assert words <= {"pivot", "Pivot table", "pivotal"}
+
+
+@pytest.mark.anyio
+async def test_random_description_served_from_snapshot(
+    async_client: AsyncClient, unavailable_database
+):
+    first = (await async_client.get("/shuffle/random_desc")).json()
+    second = (await async_client.get("/shuffle/random_desc")).json()
+
+    assert first["description"] in {"sedno", "oś"}
+    assert second["description"] != first["description"]
+
+
+@pytest.mark.anyio
+async def test_translations_served_from_snapshot(
+    async_client: AsyncClient, unavailable_database
+):
+    word_id = unavailable_database.snapshot.word_ids[0]
+
+    response = await async_client.get(
+        "/words/translations", params={"word_id": word_id}
+    )
+    assert response.status_code == 200
+    assert response.json() == {"word": "pivot", "translation": ["sedno", "oś"]}
+
+    response = await async_client.get("/words/translations", params={"search": "tab"})
+    assert response.json() == [
+        {
+            "word": {"word": "Pivot table", "id": word_id + 1},
+            "translation": ["sedno"],
+        }
+    ]
+
+    response = await async_client.get(
+        "/words/translations", params={"word_id": word_id + 2}
+    )
+    assert response.status_code == 404
+    assert response.json()["detail"] == "No translations stored in the database."
+
+
+@pytest.mark.anyio
+async def test_no_fallback_without_snapshot(
+    async_client: AsyncClient, unavailable_database
+):
+    unload_snapshot()
+
+    with pytest.raises(OperationalError):
+        await async_client.get("/shuffle/random_word")
+
+
+def test_shuffle_state_round_trip(tmp_path, monkeypatch):
+    path = str(tmp_path / "shuffle.json")
+    monkeypatch.setattr(Shuffle, "recent_words", ["a", "b", "c"])
+    monkeypatch.setattr(Shuffle, "last_description", "d")
+    assert load_state(path) == {}
+
+    save_state(path, Shuffle.state())
+    Shuffle.restore_state({})
+    assert Shuffle.recent_words == []
+
+    Shuffle.restore_state(load_state(path))
+    assert Shuffle.recent_words == ["a", "b", "c"]
+    assert Shuffle.last_description == "d"
+
+
+def test_save_state_leaves_no_temporary_files(tmp_path):
+    path = str(tmp_path / "shuffle.json")
+    save_state(path, {"recent_words": ["a"]})
+    save_state(path, {"recent_words": ["b"]})
+
+    assert [file.name for file in tmp_path.iterdir()] == ["shuffle.json"]
+    assert load_state(path) == {"recent_words": ["b"]}
@@ -0,0 +1,119 @@
+import pytest
+from sqlalchemy import create_engine, func, inspect, select
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session
+
+from dictionary.config import config
+from dictionary.enums import MasterLevel, SchemaCheck
+from dictionary.migrations import alembic_heads, check_schema
+from dictionary.models import Base, Word
+from dictionary.queries import update_word_levels, upsert, upsert_inserted
+from dictionary.sqlite import setup_sqlite
+from dictionary.utils import constraint_violation
+
+
+@pytest.fixture
+def sqlite_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'dictionary.db'}")
+    setup_sqlite(engine, config.SQLITE_PRAGMAS)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def sqlite_session(sqlite_engine):
+    Base.metadata.create_all(bind=sqlite_engine)
+    with Session(sqlite_engine) as db:
+        yield db
+
+
+def test_pragmas_set_on_connection(sqlite_engine):
+    with sqlite_engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert connection.exec_driver_sql("PRAGMA foreign_keys").scalar() == 1
+        assert connection.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+
+
+def test_new_database_created_at_head_revision(sqlite_engine):
+    check_schema(sqlite_engine, SchemaCheck.VERIFY)
+
+    assert {"word", "description", "word_description"} <= set(
+        inspect(sqlite_engine).get_table_names()
+    )
+    with sqlite_engine.connect() as connection:
+        (revision,) = connection.exec_driver_sql(
+            "SELECT version_num FROM alembic_version"
+        ).scalars()
+    assert {revision} == alembic_heads()
+    # Verified only on the next start
+    check_schema(sqlite_engine, SchemaCheck.VERIFY)
+
+
+def test_current_timestamp_in_milliseconds(sqlite_session: Session):
+    timestamp = sqlite_session.scalar(select(func.current_timestamp()))
+
+    assert timestamp.microsecond % 1000 == 0
+    assert sqlite_session.scalar(
+        select(func.current_timestamp() == func.current_timestamp())
+    )
+
+
+def test_update_word_levels(sqlite_session: Session):
+    words = [Word(word=f"word {i}", master_level=MasterLevel.NEW) for i in range(3)]
+    sqlite_session.add_all(words)
+    sqlite_session.commit()
+    levels = {words[0].id: MasterLevel.HARD, words[1].id: MasterLevel.NEW}
+
+    assert update_word_levels(sqlite_session, levels) == [words[0].id]
+
+    stored = dict(sqlite_session.execute(select(Word.id, Word.master_level)).all())
+    assert stored == {
+        words[0].id: MasterLevel.HARD,
+        words[1].id: MasterLevel.NEW,
+        words[2].id: MasterLevel.NEW,
+    }
+
+
+def test_upsert_reports_inserted_rows(sqlite_session: Session):
+    def upsert_word(notes: str) -> bool:
+        statement = upsert(sqlite_session, Word).values(word="pivot", notes=notes)
+        statement = statement.on_conflict_do_update(
+            index_elements=[Word.word],
+            set_={
+                "notes": statement.excluded.notes,
+                "updated": func.current_timestamp(),
+            },
+        )
+        return sqlite_session.scalar(
+            statement.returning(upsert_inserted(sqlite_session, Word))
+        )
+
+    assert upsert_word("first") is True
+    assert upsert_word("second") is False
+
+
+def test_upsert_takes_write_lock_before_reading(sqlite_engine, sqlite_session):
+    sqlite_session.add(Word(word="existing"))
+    sqlite_session.commit()
+    inserted = upsert_inserted(sqlite_session, Word)
+
+    # Without the lock the upsert would fail (SQLITE_BUSY) after this write
+    with sqlite_engine.connect() as other:
+        other.exec_driver_sql("PRAGMA busy_timeout = 0")
+        with pytest.raises(OperationalError, match="locked"):
+            other.exec_driver_sql("INSERT INTO word (word) VALUES ('other')")
+
+    statement = upsert(sqlite_session, Word).values(word="new")
+    assert sqlite_session.scalar(statement.returning(inserted)) is True
+    sqlite_session.commit()
+
+
+def test_constraint_violation_message(sqlite_session: Session):
+    sqlite_session.add(Word(word="pivot"))
+    sqlite_session.commit()
+    sqlite_session.add(Word(word="pivot"))
+
+    with pytest.raises(IntegrityError) as exc_info:
+        sqlite_session.commit()
+
+    assert constraint_violation(exc_info.value.orig) == "Key (word) already exists."
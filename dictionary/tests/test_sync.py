@@ -0,0 +1,106 @@
+import datetime
+import logging
+from unittest.mock import patch
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from dictionary.config import config
+from dictionary.models import Tombstone, Word
+from dictionary.tests.utils import create_full_dict_entry, create_word
+
+logger = logging.getLogger(__name__)
+
+
+@pytest.mark.anyio
+async def test_sync_empty_db(async_client: AsyncClient, db_session: Session):
+    response = await async_client.get("/sync")
+
+    assert response.status_code == 200
+    assert response.json()["token"]
+    assert response.json()["words"] == []
+    assert response.json()["descriptions"] == []
+    assert response.json()["word_descriptions"] == []
+    assert response.json()["deleted"] == []
+
+
+@pytest.mark.anyio
+async def test_sync_without_token_returns_all_records(
+    async_client: AsyncClient, db_session: Session
+):
+    word, desc = create_full_dict_entry()
+
+    response = await async_client.get("/sync")
+
+    assert response.status_code == 200
+    assert [w["id"] for w in response.json()["words"]] == [word.id]
+    assert [d["id"] for d in response.json()["descriptions"]] == [desc.id]
+    assert response.json()["word_descriptions"] == [
+        {"word_id": word.id, "description_id": desc.id}
+    ]
+
+
+@pytest.mark.anyio
+async def test_sync_with_token_returns_only_new_records(
+    async_client: AsyncClient, db_session: Session
+):
+    create_word(word="old")
+    with patch.object(config, "SYNC_OVERLAP_SECONDS", 0):
+        token = (await async_client.get("/sync")).json()["token"]
+    new_word = create_word(word="new")
+
+    response = await async_client.get("/sync", params={"since": token})
+    logger.debug("Sync response: %s", response.json())
+
+    assert response.status_code == 200
+    assert [w["word"] for w in response.json()["words"]] == [new_word.word]
+    assert response.json()["descriptions"] == []
+
+
+@pytest.mark.anyio
+async def test_sync_with_token_returns_deleted_records(
+    async_client: AsyncClient, db_session: Session
+):
+    word, desc = create_full_dict_entry()
+    token = (await async_client.get("/sync")).json()["token"]
+
+    await async_client.delete(f"/words/delete/{word.id}")
+    await async_client.delete(f"/descriptions/delete/{desc.id}")
+
+    assert db_session.query(Tombstone).count() == 2
+
+    response = await async_client.get("/sync", params={"since": token})
+
+    assert response.status_code == 200
+    assert response.json()["words"] == []
+    assert [
+        {k: v for k, v in record.items() if k != "deleted"}
+        for record in response.json()["deleted"]
+    ] == [
+        {"table_name": "word", "word_id": word.id},
+        {"table_name": "description", "description_id": desc.id},
+    ]
+
+
+@pytest.mark.anyio
+async def test_sync_token_covers_writes_committed_after_the_sync(
+    async_client: AsyncClient, db_session: Session
+):
+    token = datetime.datetime.fromisoformat(
+        (await async_client.get("/sync")).json()["token"]
+    )
+    synced = token + datetime.timedelta(seconds=config.SYNC_OVERLAP_SECONDS)
+    # Written by a transaction which started before the sync and committed after it
+    word = create_word(word="late")
+    db_session.execute(
+        update(Word)
+        .where(Word.id == word.id)
+        .values(updated=synced - datetime.timedelta(seconds=10))
+    )
+    db_session.commit()
+
+    response = await async_client.get("/sync", params={"since": token.isoformat()})
+
+    assert [w["word"] for w in response.json()["words"]] == ["late"]
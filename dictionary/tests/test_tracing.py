@@ -0,0 +1,145 @@
+import io
+from unittest.mock import patch
+
+import orjson
+import pytest
+from httpx import AsyncClient
+from opentelemetry.trace import SpanKind
+from sqlalchemy.orm import Session
+
+from dictionary import tracing
+from dictionary.main import app
+from dictionary.tests.utils import create_full_dict_entry
+from dictionary.tracing import (
+    ConsoleSpanExporter,
+    FileSpanExporter,
+    LocalSpan,
+    LocalTracerProvider,
+    MemorySpanExporter,
+)
+
+
+@pytest.fixture
+def exporter(monkeypatch) -> MemorySpanExporter:
+    "Enables tracing (disabled in the tests config) with spans kept in memory."
+    exporter = MemorySpanExporter()
+    provider = LocalTracerProvider([exporter])
+    monkeypatch.setattr(tracing, "tracer_provider", provider)
+    monkeypatch.setattr(tracing, "tracer", provider.get_tracer(tracing.__name__))
+    # The provider FastAPI records its spans with (given on the app creation)
+    monkeypatch.setitem(app._telemetry, "tracer_provider", provider)
+    return exporter
+
+
+def request_trace(exporter: MemorySpanExporter) -> dict[str, list[LocalSpan]]:
+    "Returns spans of the only traced request by name."
+    (server,) = [span for span in exporter.spans if span.kind == SpanKind.SERVER]
+    spans = {}
+    for span in exporter.trace(server.context.trace_id):
+        spans.setdefault(span.name, []).append(span)
+    return spans
+
+
+def parent(exporter: MemorySpanExporter, span: LocalSpan) -> LocalSpan:
+    (found,) = [s for s in exporter.spans if s.context.span_id == span.parent.span_id]
+    return found
+
+
+@pytest.mark.anyio
+async def test_request_trace_covers_dependency_queries_and_serialization(
+    async_client: AsyncClient, db_session: Session, exporter: MemorySpanExporter
+):
+    word, _ = create_full_dict_entry()
+    exporter.clear()
+
+    # The application get_db (not overridden) to trace the dependency
+    with patch.dict(app.dependency_overrides, clear=True):
+        response = await async_client.get(f"/words/single/{word.id}")
+
+    spans = request_trace(exporter)
+    (server,) = spans["GET /words/single/{word_id}"]
+    assert response.status_code == 200
+    assert server.attributes["http.route"] == "/words/single/{word_id}"
+    for name in (
+        "fastapi.dependencies",
+        "get_db",
+        "fastapi.endpoint",
+        "fastapi.serialization",
+        "get_db.close",
+    ):
+        assert name in spans
+
+    # Word and its descriptions - queries within the ORM spans within the endpoint
+    assert len(spans["orm.execute"]) == 2
+    assert len(spans["db.query SELECT"]) == 2
+    for query in spans["db.query SELECT"]:
+        orm_execute = parent(exporter, query)
+        assert orm_execute.name == "orm.execute"
+        assert parent(exporter, orm_execute).name == "fastapi.endpoint"
+        assert orm_execute.duration >= query.duration
+        assert query.kind == SpanKind.CLIENT
+        assert query.attributes["db.query.text"].startswith("SELECT")
+    assert parent(exporter, spans["get_db"][0]).name == "fastapi.dependencies"
+
+
+@pytest.mark.anyio
+async def test_negotiated_response_serialization_span(
+    async_client: AsyncClient, db_session: Session, exporter: MemorySpanExporter
+):
+    create_full_dict_entry()
+    exporter.clear()
+
+    response = await async_client.get(
+        "/words/all", headers={"Accept": "application/msgpack"}
+    )
+
+    (serialization,) = request_trace(exporter)["serialization"]
+    assert serialization.attributes == {
+        "http.response.content_type": "application/msgpack",
+        "http.response.body.size": len(response.content),
+    }
+    assert parent(exporter, serialization).name == "fastapi.endpoint"
+
+
+def test_console_exporter_writes_json_lines(exporter: MemorySpanExporter):
+    stream = io.StringIO()
+    span = tracing.tracer.start_span("test", attributes={"a": 1})
+    span.end()
+
+    ConsoleSpanExporter(stream).export([span])
+
+    exported = orjson.loads(stream.getvalue())
+    assert exported["name"] == "test"
+    assert exported["kind"] == "INTERNAL"
+    assert exported["parent_span_id"] is None
+    assert len(exported["trace_id"]) == 32
+    assert len(exported["span_id"]) == 16
+    assert exported["attributes"] == {"a": 1}
+    assert exported["status"] == {"code": "UNSET", "description": None}
+    assert exported["end_time_unix_nano"] >= exported["start_time_unix_nano"]
+
+
+def test_file_exporter_appends_json_lines(exporter: MemorySpanExporter, tmp_path):
+    path = tmp_path / "traces.jsonl"
+    file_exporter = FileSpanExporter(str(path))
+    for name in ("first", "second"):
+        span = tracing.tracer.start_span(name)
+        span.end()
+        file_exporter.export([span])
+    file_exporter.shutdown()
+
+    lines = path.read_text().splitlines()
+    assert [orjson.loads(line)["name"] for line in lines] == ["first", "second"]
+
+
+@pytest.mark.anyio
+async def test_requests_not_traced_by_default(
+    async_client: AsyncClient, db_session: Session
+):
+    create_full_dict_entry()
+
+    response = await async_client.get("/words/all")
+
+    assert response.status_code == 200
+    assert tracing.tracer_provider is None
+    assert not tracing.is_tracing()
@@ -1,18 +1,25 @@
 import logging
+from unittest.mock import patch
 
+import msgpack
 import pytest
 from fastapi import status
 from fastapi.encoders import jsonable_encoder
 from httpx import AsyncClient
+from sqlalchemy import delete
 from sqlalchemy.orm import Session
 
 from dictionary.enums import MasterLevel
-from dictionary.models import Word
+from dictionary.main import app
+from dictionary.models import Word, WordDescription
 from dictionary.tests.utils import (
     create_description,
     create_full_dict_entry,
     create_word,
     create_word_definition_association_table,
+    executed_before_select_after_insert,
+    key_exists,
+    profiled_statements,
 )
 
 logger = logging.getLogger(__name__)
@@ -84,6 +91,114 @@ async def test_get_all_words_with_multiple_words_in_db(
     assert response.json() == expected_response
 
 
+@pytest.mark.anyio
+async def test_get_all_words_msgpack_response(
+    async_client: AsyncClient, db_session: Session
+):
+    word = create_word()
+    expected_response = {
+        "number_of_words": 1,
+        "words": [{"id": word.id, "word": word.word, "master_level": "new"}],
+    }
+    response = await async_client.get(
+        "/words/all", headers={"Accept": "application/msgpack"}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(response.content) == expected_response
+
+
+@pytest.mark.anyio
+async def test_get_all_words_negotiates_by_quality_values(
+    async_client: AsyncClient, db_session: Session
+):
+    create_word()
+
+    for accept, media_type in (
+        ("application/msgpack;q=0", "application/json"),
+        ("application/json, application/msgpack;q=0.5", "application/json"),
+        ("application/msgpack, */*;q=0.1", "application/msgpack"),
+        ("*/*", "application/json"),
+    ):
+        response = await async_client.get("/words/all", headers={"Accept": accept})
+        assert response.headers["content-type"] == media_type, accept
+
+
+@pytest.mark.anyio
+async def test_get_all_words_compression_by_quality_values(
+    async_client: AsyncClient, db_session: Session
+):
+    for number in range(50):
+        create_word(word=f"word number {number}", notes="test note")
+
+    for accept_encoding, encoding in (
+        ("br;q=0, gzip", "gzip"),
+        ("br;q=0.5, gzip", "gzip"),
+        ("gzip, br", "br"),
+        ("gzip;q=0", None),
+    ):
+        response = await async_client.get(
+            "/words/all", headers={"Accept-Encoding": accept_encoding}
+        )
+        assert response.headers.get("content-encoding") == encoding, accept_encoding
+        assert response.json()["number_of_words"] == 50
+
+
+@pytest.mark.anyio
+async def test_get_all_words_gzip_response_above_minimum_size(
+    async_client: AsyncClient, db_session: Session
+):
+    for number in range(50):
+        create_word(word=f"word number {number}", notes="test note")
+
+    response = await async_client.get("/words/all", headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json()["number_of_words"] == 50
+
+
+@pytest.mark.anyio
+async def test_get_all_words_no_compression_below_minimum_size(
+    async_client: AsyncClient, db_session: Session
+):
+    create_word()
+
+    response = await async_client.get("/words/all", headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+
+
+@pytest.mark.anyio
+async def test_get_all_words_with_sparse_fields(
+    async_client: AsyncClient, db_session: Session
+):
+    word = create_word(notes="test note")
+    expected_response = {
+        "number_of_words": 1,
+        "words": [{"id": word.id, "word": word.word}],
+    }
+    response = await async_client.get("/words/all", params={"fields": "id, word"})
+
+    assert response.status_code == 200
+    assert response.json() == expected_response
+
+
+@pytest.mark.anyio
+async def test_get_all_words_with_invalid_sparse_fields(
+    async_client: AsyncClient, db_session: Session
+):
+    expected_response = (
+        "Invalid fields: created. Available fields: id, word, master_level, notes."
+    )
+    response = await async_client.get("/words/all", params={"fields": "id,created"})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == expected_response
+
+
 @pytest.mark.anyio
 async def test_get_word_translation_empty_query_params(
     async_client: AsyncClient, db_session: Session
@@ -278,6 +393,26 @@ async def test_get_word_translation_search_multiple_words_with_translations(
     assert response.json() == expected_response
 
 
+@pytest.mark.anyio
+@pytest.mark.parametrize("by_id", [False, True])
+async def test_get_word_translations_one_query(
+    async_client: AsyncClient, db_session: Session, by_id: bool
+):
+    word, _ = create_full_dict_entry(word="pivot")
+    create_full_dict_entry(word_id=word.id, in_polish="oś, trzpień")
+    create_full_dict_entry(word="pivot on sth", in_polish="zależeć od czegoś")
+    create_word(word="pivot man")
+    params = {"word_id": word.id} if by_id else {"search": "pivot"}
+
+    statements = await profiled_statements(
+        async_client, "GET", "/words/translations", params=params
+    )
+
+    # Words (ID and text only) with their translations (no query per word)
+    assert len(statements) == 1
+    assert "notes" not in statements[0] and "master_level" not in statements[0]
+
+
 @pytest.mark.anyio
 async def test_get_all_dict_data_empty_db(
     async_client: AsyncClient, db_session: Session
@@ -408,6 +543,58 @@ async def test_get_all_dict_data_multiple_words_multiple_descriptions(
     assert response.json() == expected_response
 
 
+@pytest.mark.anyio
+async def test_get_all_dict_data_with_sparse_fields(
+    async_client: AsyncClient, db_session: Session
+):
+    word, _ = create_full_dict_entry(notes="test note")
+    create_full_dict_entry(word_id=word.id, in_polish="oś", in_english="axis")
+    create_word(word="riot")
+    expected_response = [
+        {
+            "word": {"word": word.word},
+            "description": [{"in_polish": "sedno"}, {"in_polish": "oś"}],
+        },
+        {"word": {"word": "riot"}, "description": []},
+    ]
+
+    response = await async_client.get(
+        "/words/descriptions",
+        params={"fields": "word", "description_fields": "in_polish"},
+    )
+
+    assert response.status_code == 200
+    assert response.json() == expected_response
+
+
+@pytest.mark.anyio
+async def test_get_all_dict_data_with_invalid_description_fields(
+    async_client: AsyncClient, db_session: Session
+):
+    create_full_dict_entry()
+
+    response = await async_client.get(
+        "/words/descriptions", params={"description_fields": "in_polish,word"}
+    )
+
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Invalid fields: word.")
+
+
+@pytest.mark.anyio
+async def test_get_all_dict_data_two_queries(
+    async_client: AsyncClient, db_session: Session
+):
+    for word in ("pivot", "riot", "bear", "tree"):
+        create_full_dict_entry(word=word, in_polish=f"opis {word}")
+
+    statements = await profiled_statements(async_client, "GET", "/words/descriptions")
+
+    # All words and descriptions of all words (no query per word)
+    assert len(statements) == 2
+    assert all(statement.startswith("SELECT") for statement in statements)
+
+
 @pytest.mark.anyio
 async def test_get_single_word_empty_db(async_client: AsyncClient, db_session: Session):
     word_id = 1
@@ -505,9 +692,7 @@ async def test_add_new_word_intgrity_error_while_adding_the_same_word(
 
     response = await async_client.post("/words/add", json=payload)
 
-    expected_response = (
-        "Database constraint violated. Key (word)=(test) already exists."
-    )
+    expected_response = key_exists("word", "test")
     assert response.status_code == 400
     assert response.json()["detail"] == expected_response
 
@@ -540,6 +725,247 @@ async def test_update_a_word_with_word_not_found(
     assert response.json()["detail"] == expected_response
 
 
+@pytest.mark.anyio
+async def test_update_a_word_statements(async_client: AsyncClient, db_session: Session):
+    word = create_word()
+
+    statements = await profiled_statements(
+        async_client, "PATCH", f"/words/update/{word.id}", json={"notes": "example"}
+    )
+
+    # UPDATE ... RETURNING, without reading the row again
+    assert len(statements) == 1
+    assert statements[0].startswith("UPDATE word")
+
+
+@pytest.mark.anyio
+async def test_add_new_word_with_descriptions_successful(
+    async_client: AsyncClient, db_session: Session
+):
+    desc = create_description(in_polish="oś")
+    payload = {
+        "word": "pivot",
+        "descriptions": [
+            {"type": "noun", "in_polish": "sedno"},
+            desc.id,
+            {"type": "verb", "in_polish": "obracać się"},
+        ],
+    }
+
+    response = await async_client.post("/words/add_with_descriptions", json=payload)
+    logger.debug("Add word with descriptions response: %s", response.json())
+
+    assert response.status_code == 201
+    assert response.json()["word"]["word"] == "pivot"
+    assert sorted(d["in_polish"] for d in response.json()["description"]) == [
+        "obracać się",
+        "oś",
+        "sedno",
+    ]
+    word = db_session.query(Word).filter_by(word="pivot").first()
+    assert db_session.query(WordDescription).filter_by(word_id=word.id).count() == 3
+
+
+@pytest.mark.anyio
+async def test_add_new_word_with_descriptions_invalid_description_id(
+    async_client: AsyncClient, db_session: Session
+):
+    payload = {"word": "pivot", "descriptions": [{"in_polish": "sedno"}, 999]}
+
+    response = await async_client.post("/words/add_with_descriptions", json=payload)
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Descriptions with IDs: [999] were not found."
+    assert db_session.query(Word).count() == 0
+
+
+@pytest.mark.anyio
+async def test_add_new_word_with_descriptions_integrity_error_saves_nothing(
+    async_client: AsyncClient, db_session: Session
+):
+    create_description(in_polish="sedno")
+    payload = {"word": "pivot", "descriptions": [{"in_polish": "sedno"}]}
+
+    response = await async_client.post("/words/add_with_descriptions", json=payload)
+
+    assert response.status_code == 400
+    assert db_session.query(Word).count() == 0
+
+
+@pytest.mark.anyio
+async def test_upsert_word_creates_a_new_word(
+    async_client: AsyncClient, db_session: Session
+):
+    payload = {"word": "pivot", "master_level": MasterLevel.HARD}
+
+    response = await async_client.put("/words/upsert", json=payload)
+    word = db_session.query(Word).filter_by(word=payload["word"]).first()
+
+    assert response.status_code == 201
+    assert response.json() == {
+        "status": "created",
+        "word": {"id": word.id, "word": "pivot", "master_level": "hard"},
+    }
+
+
+@pytest.mark.anyio
+async def test_upsert_word_updates_an_existing_word(
+    async_client: AsyncClient, db_session: Session
+):
+    word = create_word()
+    payload = {"word": word.word, "master_level": MasterLevel.HARD, "notes": "note"}
+
+    response = await async_client.put("/words/upsert", json=payload)
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "status": "updated",
+        "word": {
+            "id": word.id,
+            "word": word.word,
+            "master_level": "hard",
+            "notes": "note",
+        },
+    }
+    assert db_session.query(Word).count() == 1
+
+
+@pytest.mark.parametrize("on_conflict", ["update", "nothing"])
+@pytest.mark.anyio
+async def test_upsert_word_leaves_an_existing_word_unchanged(
+    async_client: AsyncClient, db_session: Session, on_conflict: str
+):
+    word = create_word()
+    payload = {"word": word.word, "master_level": MasterLevel.NEW}
+
+    response = await async_client.put(
+        "/words/upsert", json=payload, params={"on_conflict": on_conflict}
+    )
+    word_after = db_session.query(Word).filter_by(id=word.id).first()
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "unchanged"
+    assert response.json()["word"]["id"] == word.id
+    assert word_after.updated == word.updated
+
+
+@pytest.mark.anyio
+async def test_upsert_word_deleted_meanwhile(
+    async_client: AsyncClient, db_session: Session
+):
+    word = create_word()
+    payload = {"word": word.word, "master_level": MasterLevel.NEW}
+
+    # Deleted after the upsert skipped the existing word, before it is read
+    with executed_before_select_after_insert(delete(Word).where(Word.id == word.id)):
+        response = await async_client.put(
+            "/words/upsert", json=payload, params={"on_conflict": "nothing"}
+        )
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == (
+        f"Word '{word.word}' was deleted meanwhile, try again."
+    )
+
+
+@pytest.mark.anyio
+async def test_update_word_levels_bulk_with_levels_map(
+    async_client: AsyncClient, db_session: Session
+):
+    word_1 = create_word()
+    word_2 = create_word(word="test")
+    word_3 = create_word(word="fallout", master_level=MasterLevel.HARD)
+    payload = {
+        "levels": {
+            word_1.id: MasterLevel.MEDIUM,
+            word_2.id: MasterLevel.HARD,
+            word_3.id: MasterLevel.HARD,
+        }
+    }
+
+    response = await async_client.patch("/words/levels", json=payload)
+
+    assert response.status_code == 200
+    assert response.json() == {"number_of_words": 2, "words": [word_1.id, word_2.id]}
+    levels = {word.id: word.master_level for word in db_session.query(Word).all()}
+    assert levels == {
+        word_1.id: MasterLevel.MEDIUM,
+        word_2.id: MasterLevel.HARD,
+        word_3.id: MasterLevel.HARD,
+    }
+
+
+@pytest.mark.anyio
+async def test_update_word_levels_bulk_with_filter(
+    async_client: AsyncClient, db_session: Session
+):
+    word_1 = create_word()
+    create_word(word="test", master_level=MasterLevel.HARD)
+    word_3 = create_word(word="pivot on sth")
+    payload = {"filter": {"master_level": "new", "search": "pivot"}, "level": "medium"}
+
+    response = await async_client.patch("/words/levels", json=payload)
+
+    assert response.status_code == 200
+    assert response.json() == {"number_of_words": 2, "words": [word_1.id, word_3.id]}
+    assert (
+        db_session.query(Word).filter_by(master_level=MasterLevel.MEDIUM).count() == 2
+    )
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        {},
+        {"levels": {"1": "new"}, "filter": {}, "level": "new"},
+        {"filter": {"master_level": "new"}},
+    ],
+)
+@pytest.mark.anyio
+async def test_update_word_levels_bulk_invalid_payload(
+    async_client: AsyncClient, db_session: Session, payload: dict
+):
+    response = await async_client.patch("/words/levels", json=payload)
+
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize(
+    "payload, expected_response",
+    [
+        (
+            {"levels": {"1": "new"}, "level": "hard"},
+            "The 'level' can't be given together with 'levels'.",
+        ),
+        (
+            {"filter": {}, "level": "hard"},
+            "The 'filter' must have 'master_level' or 'search'.",
+        ),
+        (
+            {"filter": {"search": ""}, "level": "hard"},
+            "The 'filter' must have 'master_level' or 'search'.",
+        ),
+    ],
+)
+@pytest.mark.anyio
+async def test_update_word_levels_bulk_ambiguous_payload(
+    async_client: AsyncClient,
+    db_session: Session,
+    payload: dict,
+    expected_response: str,
+):
+    word = create_word()
+
+    response = await async_client.patch("/words/levels", json=payload)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == expected_response
+    assert (
+        db_session.query(Word).filter_by(id=word.id).one().master_level
+        == MasterLevel.NEW
+    )
+
+
 @pytest.mark.anyio
 async def test_update_a_word_successful(async_client: AsyncClient, db_session: Session):
     word = create_word()
@@ -572,9 +998,7 @@ async def test_update_a_word_integrity_error(
 
     response = await async_client.patch(f"/words/update/{word.id}", json=payload)
 
-    expected_response = (
-        "Database constraint violated. Key (word)=(test) already exists."
-    )
+    expected_response = key_exists("word", "test")
     assert response.status_code == 400
     assert response.json()["detail"] == expected_response
 
@@ -609,6 +1033,21 @@ async def test_delete_a_word_successful(async_client: AsyncClient, db_session: S
     assert word is None
 
 
+@pytest.mark.anyio
+async def test_delete_a_word_statements(async_client: AsyncClient, db_session: Session):
+    word, _ = create_full_dict_entry()
+
+    statements = await profiled_statements(
+        async_client, "DELETE", f"/words/delete/{word.id}"
+    )
+
+    # DELETE ... RETURNING (without loading the row first) and the tombstone
+    assert sorted(statement.split()[0] for statement in statements) == [
+        "DELETE",
+        "INSERT",
+    ]
+
+
 @pytest.mark.anyio
 async def test_delete_a_word_invalid_word_id(
     async_client: AsyncClient, db_session: Session
@@ -619,3 +1058,52 @@ async def test_delete_a_word_invalid_word_id(
     response = await async_client.delete(f"/words/delete/{word_id}")
     assert response.status_code == 404
     assert response.json()["detail"] == expected_response
+
+
+@pytest.mark.anyio
+async def test_delete_many_words_with_orphans(
+    async_client: AsyncClient, db_session: Session
+):
+    word_1, shared_desc = create_full_dict_entry()
+    own_desc = create_full_dict_entry(word_id=word_1.id, in_polish="oś")
+    word_2 = create_full_dict_entry(word="axis", description_id=shared_desc.id)
+    word_3 = create_word(word="hinge")
+    expected_response = {
+        "deleted": [word_1.id, word_3.id],
+        "not_found": [123],
+        "orphans_deleted": [own_desc.id],
+    }
+
+    response = await async_client.delete(
+        "/words/delete_many",
+        params={"ids": [word_1.id, word_3.id, 123], "with_orphans": True},
+    )
+
+    assert response.status_code == 200
+    assert response.json() == expected_response
+    assert db_session.query(Word).one().id == word_2.id
+    # The shared description is still assigned to the remaining word
+    assert db_session.query(WordDescription).one().description_id == shared_desc.id
+
+
+@pytest.mark.anyio
+async def test_delete_many_words_nothing_deleted_if_orphan_sweep_fails(
+    async_client: AsyncClient, db_session: Session
+):
+    word, desc = create_full_dict_entry()
+
+    # The application get_db (not overridden) - the request session is closed
+    with (
+        patch.dict(app.dependency_overrides, clear=True),
+        patch(
+            "dictionary.routers.word.delete_orphan_descriptions",
+            side_effect=RuntimeError("sweep failed"),
+        ),
+        pytest.raises(RuntimeError),
+    ):
+        await async_client.delete(
+            "/words/delete_many", params={"ids": [word.id], "with_orphans": True}
+        )
+
+    assert db_session.query(Word).one().id == word.id
+    assert db_session.query(WordDescription).one().description_id == desc.id
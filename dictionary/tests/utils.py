@@ -1,6 +1,11 @@
+from contextlib import contextmanager
+
+from httpx import AsyncClient
+from sqlalchemy import Executable, Insert, Select, event
+
 from dictionary.enums import MasterLevel, WordTypes
 from dictionary.models import Description, Word, WordDescription
-from dictionary.tests.conftest import TestingSessionLocal
+from dictionary.tests.conftest import TestingSessionLocal, engine
 
 
 def create_word(
@@ -95,3 +100,51 @@ def create_full_dict_entry(
         return word
 
     create_word_definition_association_table(word_id, description_id)
+
+
+def key_exists(key: str, values: str) -> str:
+    """Expected message of the violated unique constraint (see
+    dictionary.utils.constraint_violation) - with the values on PostgreSQL,
+    only with the columns on SQLite."""
+    if engine.dialect.name == "postgresql":
+        return f"Database constraint violated. Key ({key})=({values}) already exists."
+    return f"Database constraint violated. Key ({key}) already exists."
+
+
+async def profiled_statements(
+    async_client: AsyncClient, method: str, url: str, **kwargs
+) -> list[str]:
+    """Sends the request with the SQL profiler enabled (X-SQL-Profile) and returns
+    fingerprints of its statements (repeated by count), without the savepoints
+    of the test transaction."""
+    headers = {**kwargs.pop("headers", {}), "X-SQL-Profile": "1"}
+    response = await async_client.request(method, url, headers=headers, **kwargs)
+    request_id = response.headers["X-Request-ID"]
+    profile = (await async_client.get(f"/debug/sql/{request_id}")).json()
+    return [
+        statement["fingerprint"]
+        for statement in profile["statements"]
+        for _ in range(statement["count"])
+        if not statement["fingerprint"].startswith(("SAVEPOINT", "RELEASE"))
+    ]
+
+
+@contextmanager
+def executed_before_select_after_insert(statement: Executable):
+    """Executes the statement (e.g. a concurrent delete) right before the first
+    SELECT which follows an INSERT (e.g. reading the row an upsert skipped)."""
+    inserted = False
+
+    def before_execute(conn, clauseelement, multiparams, params, execution_options):
+        nonlocal inserted
+        if isinstance(clauseelement, Insert):
+            inserted = True
+        elif inserted and isinstance(clauseelement, Select):
+            inserted = False
+            conn.execute(statement)
+
+    event.listen(engine, "before_execute", before_execute)
+    try:
+        yield
+    finally:
+        event.remove(engine, "before_execute", before_execute)
@@ -0,0 +1,360 @@
+"""
+Local tracing with the OpenTelemetry data model - no SDK or collector required.
+
+LocalTracerProvider implements the OpenTelemetry API (opentelemetry-api, installed
+with FastAPI) and is passed to FastAPI(telemetry=...), so the spans FastAPI creates
+(the request, dependencies, endpoint and serialization) are recorded along with
+the spans of this application:
+- get_db / get_db.close - creating and closing the session (the dependency)
+- orm.execute - ORM query including hydration of the objects (the difference
+  to its db.query child is the ORM time)
+- db.query - each statement sent to the database
+- serialization - encoding of the negotiated responses (JSON/MessagePack)
+
+Finished spans are exported as JSON lines (trace_id, span_id, parent_span_id,
+name, kind, start/end time in ns, attributes, events, status) to the console,
+a file (TRACING_FILE) or memory (tests). Enabled with TRACING_ENABLED.
+
+NOTE: Spans are exported synchronously when they end - meant for local \
+diagnosis, not for tracing all production traffic.
+"""
+
+import logging
+import random
+import sys
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from typing import TextIO
+
+import orjson
+from opentelemetry import trace
+from opentelemetry.context import Context
+from opentelemetry.trace import (
+    Link,
+    SpanContext,
+    SpanKind,
+    Status,
+    StatusCode,
+    TraceFlags,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from dictionary.config import config
+from dictionary.enums import TraceExporter
+
+logger = logging.getLogger(__name__)
+
+
+class LocalSpan(trace.Span):
+    def __init__(
+        self,
+        provider: "LocalTracerProvider",
+        name: str,
+        context: SpanContext,
+        parent: SpanContext | None,
+        kind: SpanKind = SpanKind.INTERNAL,
+        attributes: dict | None = None,
+        start_time: int | None = None,
+    ):
+        self.provider = provider
+        self.name = name
+        self.context = context
+        self.parent = parent
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.events: list[dict] = []
+        self.status = Status(StatusCode.UNSET)
+        self.start_time = start_time or time.time_ns()
+        self.end_time: int | None = None
+
+    def get_span_context(self) -> SpanContext:
+        return self.context
+
+    def is_recording(self) -> bool:
+        return self.end_time is None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes):
+        self.attributes.update(attributes)
+
+    def add_event(self, name: str, attributes=None, timestamp: int | None = None):
+        self.events.append(
+            {
+                "name": name,
+                "timestamp": timestamp or time.time_ns(),
+                "attributes": dict(attributes or {}),
+            }
+        )
+
+    def update_name(self, name: str):
+        self.name = name
+
+    def set_status(self, status: Status | StatusCode, description: str | None = None):
+        if isinstance(status, StatusCode):
+            status = Status(status, description)
+        self.status = status
+
+    def record_exception(
+        self, exception: BaseException, attributes=None, timestamp=None, escaped=False
+    ):
+        self.add_event(
+            "exception",
+            {
+                "exception.type": type(exception).__qualname__,
+                "exception.message": str(exception),
+                "exception.escaped": escaped,
+                **(attributes or {}),
+            },
+            timestamp,
+        )
+
+    def end(self, end_time: int | None = None):
+        if self.end_time is not None:
+            return
+        self.end_time = end_time or time.time_ns()
+        self.provider.on_end(self)
+
+    @property
+    def duration(self) -> float:
+        "Duration in seconds (0 if not ended)."
+        return (self.end_time - self.start_time) / 1e9 if self.end_time else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": trace.format_trace_id(self.context.trace_id),
+            "span_id": trace.format_span_id(self.context.span_id),
+            "parent_span_id": trace.format_span_id(self.parent.span_id)
+            if self.parent
+            else None,
+            "name": self.name,
+            "kind": self.kind.name,
+            "start_time_unix_nano": self.start_time,
+            "end_time_unix_nano": self.end_time,
+            "duration_ms": round(self.duration * 1000, 3),
+            "attributes": self.attributes,
+            "events": self.events,
+            "status": {
+                "code": self.status.status_code.name,
+                "description": self.status.description,
+            },
+        }
+
+
+class LocalTracer(trace.Tracer):
+    def __init__(self, provider: "LocalTracerProvider"):
+        self.provider = provider
+
+    def start_span(
+        self,
+        name: str,
+        context: Context | None = None,
+        kind: SpanKind = SpanKind.INTERNAL,
+        attributes=None,
+        links: Sequence[Link] | None = None,
+        start_time: int | None = None,
+        record_exception: bool = True,
+        set_status_on_exception: bool = True,
+    ) -> LocalSpan:
+        parent = trace.get_current_span(context).get_span_context()
+        if not parent.is_valid:
+            parent = None
+        span_context = SpanContext(
+            trace_id=parent.trace_id if parent else random.getrandbits(128),
+            span_id=random.getrandbits(64),
+            is_remote=False,
+            trace_flags=TraceFlags(TraceFlags.SAMPLED),
+        )
+        return LocalSpan(
+            self.provider, name, span_context, parent, kind, attributes, start_time
+        )
+
+    @contextmanager
+    def start_as_current_span(
+        self,
+        name: str,
+        context: Context | None = None,
+        kind: SpanKind = SpanKind.INTERNAL,
+        attributes=None,
+        links: Sequence[Link] | None = None,
+        start_time: int | None = None,
+        record_exception: bool = True,
+        set_status_on_exception: bool = True,
+        end_on_exit: bool = True,
+    ) -> Iterator[LocalSpan]:
+        span = self.start_span(name, context, kind, attributes, links, start_time)
+        with trace.use_span(
+            span,
+            end_on_exit=end_on_exit,
+            record_exception=record_exception,
+            set_status_on_exception=set_status_on_exception,
+        ) as current:
+            yield current
+
+
+class ConsoleSpanExporter:
+    "Writes finished spans as JSON lines to the stream (stdout by default)."
+
+    def __init__(self, stream: TextIO | None = None):
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[LocalSpan]):
+        lines = b"".join(
+            orjson.dumps(span.to_dict(), default=str) + b"\n" for span in spans
+        )
+        with self._lock:
+            self._write(lines.decode())
+
+    def _write(self, lines: str):
+        self.stream.write(lines)
+        self.stream.flush()
+
+    def shutdown(self):
+        pass
+
+
+class FileSpanExporter(ConsoleSpanExporter):
+    """Appends finished spans as JSON lines to the file (opened for each export,
+    no file is kept open)."""
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+
+    def _write(self, lines: str):
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(lines)
+
+
+class MemorySpanExporter:
+    "Keeps the last max_spans finished spans in memory (for tests)."
+
+    def __init__(self, max_spans: int = 10_000):
+        self.spans: deque[LocalSpan] = deque(maxlen=max_spans)
+
+    def export(self, spans: Sequence[LocalSpan]):
+        self.spans.extend(spans)
+
+    def trace(self, trace_id: int) -> list[LocalSpan]:
+        "Returns spans of the trace in the order they were started."
+        return sorted(
+            (span for span in self.spans if span.context.trace_id == trace_id),
+            key=lambda span: span.start_time,
+        )
+
+    def clear(self):
+        self.spans.clear()
+
+    def shutdown(self):
+        self.clear()
+
+
+class LocalTracerProvider(trace.TracerProvider):
+    def __init__(self, exporters: Sequence[ConsoleSpanExporter | MemorySpanExporter]):
+        self.exporters = list(exporters)
+        self._tracer = LocalTracer(self)
+
+    def get_tracer(self, *args, **kwargs) -> LocalTracer:
+        return self._tracer
+
+    def on_end(self, span: LocalSpan):
+        for exporter in self.exporters:
+            try:
+                exporter.export([span])
+            except Exception:
+                logger.exception("Exporting span '%s' failed.", span.name)
+
+    def shutdown(self):
+        for exporter in self.exporters:
+            exporter.shutdown()
+
+
+def _create_exporter(exporter: TraceExporter):
+    if exporter == TraceExporter.FILE:
+        return FileSpanExporter(config.TRACING_FILE)
+    if exporter == TraceExporter.MEMORY:
+        return MemorySpanExporter()
+    return ConsoleSpanExporter()
+
+
+# None if tracing is disabled (FastAPI then uses the global OpenTelemetry provider)
+tracer_provider = (
+    LocalTracerProvider([_create_exporter(config.TRACING_EXPORTER)])
+    if config.TRACING_ENABLED
+    else None
+)
+tracer = tracer_provider.get_tracer(__name__) if tracer_provider else trace.NoOpTracer()
+
+
+def is_tracing() -> bool:
+    "Whether the current code runs within a recorded trace (e.g. a traced request)."
+    return tracer_provider is not None and trace.get_current_span().is_recording()
+
+
+# Listening on the Engine class - queries of all engines (also the tests ones)
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query_span(conn, cursor, statement, parameters, context, executemany):
+    if not is_tracing():
+        return
+    operation = statement.split(None, 1)[0].upper() if statement.strip() else "SQL"
+    span = tracer.start_span(
+        f"db.query {operation}",
+        kind=SpanKind.CLIENT,
+        attributes={
+            "db.system.name": conn.dialect.name,
+            "db.operation.name": operation,
+            "db.query.text": statement,
+            "db.executemany": executemany,
+        },
+    )
+    conn.info.setdefault("query_spans", []).append(span)
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _end_query_span(conn, cursor, statement, parameters, context, executemany):
+    spans = conn.info.get("query_spans")
+    if spans:
+        spans.pop().end()
+
+
+@event.listens_for(Engine, "handle_error")
+def _end_failed_query_span(exception_context):
+    connection = exception_context.connection
+    spans = connection.info.get("query_spans") if connection is not None else None
+    if spans:
+        span = spans.pop()
+        span.record_exception(exception_context.original_exception)
+        span.set_status(StatusCode.ERROR)
+        span.end()
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _trace_orm_execute(orm_execute_state: ORMExecuteState):
+    """Runs ORM SELECTs within an orm.execute span including loading of all rows
+    into objects (the result is frozen), so the ORM hydration time is visible."""
+    if not is_tracing() or not orm_execute_state.is_select:
+        return None
+    if orm_execute_state.execution_options.get("yield_per"):
+        return None  # rows are meant to be loaded in batches
+    with tracer.start_as_current_span("orm.execute") as span:
+        result = orm_execute_state.invoke_statement()
+        frozen = result.freeze()
+        span.set_attribute("db.response.returned_rows", len(frozen.data))
+    return frozen()
+
+
+@contextmanager
+def traced(name: str, **attributes) -> Iterator[trace.Span]:
+    "Records the block as a span (a no-op if tracing is disabled)."
+    if tracer_provider is None:
+        yield trace.INVALID_SPAN
+        return
+    with tracer.start_as_current_span(name, attributes=attributes) as span:
+        yield span
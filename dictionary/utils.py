@@ -1,7 +1,10 @@
 import logging
+from collections.abc import Callable
 from typing import NoReturn
 
+from fastapi import HTTPException, Query
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import InstrumentedAttribute
 
 from dictionary.exceptions import DatabaseConstraintError
 
@@ -12,5 +15,58 @@ def integrity_error_handler(exc_info: IntegrityError) -> NoReturn:
     logger.debug(
         f"⚠️  Database constraint violated. ERROR: {str(exc_info.orig).strip("\n").replace("\n", ". ")}"
     )
-    message = str(exc_info.orig)[str(exc_info.orig).find("DETAIL:") + 8 :].strip()
-    raise DatabaseConstraintError(extra_data=message)
+    raise DatabaseConstraintError(extra_data=constraint_violation(exc_info.orig))
+
+
+def constraint_violation(error: Exception) -> str:
+    """Describes the violated constraint of the DBAPI error (PostgreSQL or SQLite),
+    e.g. 'Key (word)=(pivot) already exists.'"""
+    # PostgreSQL - DETAIL of the error (with the values)
+    detail = getattr(getattr(error, "diag", None), "message_detail", None)
+    if detail:
+        return detail
+
+    # SQLite - e.g. 'UNIQUE constraint failed: word.word' (without the values)
+    message = str(error).strip().splitlines()[0]
+    kind, _, columns = message.partition(" constraint failed: ")
+    names = ", ".join(name.split(".")[-1] for name in columns.split(", "))
+    if kind == "UNIQUE":
+        return f"Key ({names}) already exists."
+    if kind == "NOT NULL":
+        return f"Column ({names}) can not be null."
+    if kind == "FOREIGN KEY constraint failed":
+        return "Referenced record does not exist."
+    return message
+
+
+def sparse_fields(
+    *columns: InstrumentedAttribute, parameter: str = "fields"
+) -> Callable[..., list]:
+    """Creates a dependency for the 'fields' query parameter (e.g. 'id,word') or
+    the given parameter name.
+    Returns the requested columns (all columns by default) to be selected."""
+    available = {column.key: column for column in columns}
+
+    def dependency(
+        fields: str | None = Query(
+            default=None,
+            alias=parameter,
+            description="Comma separated list of fields to return. Available: %s."
+            % ", ".join(available),
+            examples=[",".join(list(available)[:2])],
+        ),
+    ) -> list:
+        if not fields:
+            return list(available.values())
+
+        names = list(dict.fromkeys(n.strip() for n in fields.split(",") if n.strip()))
+        invalid = [name for name in names if name not in available]
+        if invalid or not names:
+            raise HTTPException(
+                400,
+                "Invalid fields: %s. Available fields: %s."
+                % (", ".join(invalid), ", ".join(available)),
+            )
+        return [available[name] for name in names]
+
+    return dependency
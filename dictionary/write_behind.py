@@ -0,0 +1,210 @@
+"""
+Write-behind buffer for the study updates (master level changes).
+
+Instead of committing each answer separately, updates are coalesced per word
+in memory (the latest master level wins) and written with one batched UPDATE
+every WRITE_BEHIND_FLUSH_INTERVAL_MS or as soon as WRITE_BEHIND_MAX_ITEMS words
+are pending. Remaining updates are flushed on application shutdown (lifespan).
+
+If WRITE_BEHIND_MAX_FAILED_FLUSHES flushes fail in a row (e.g. the database is
+not available), the buffer stops accepting updates - they are written directly
+(errors returned to the clients) until the buffered updates are flushed.
+
+NOTE: Buffered updates are kept in the memory of the process only - if the \
+process crashes (or is killed) before the flush, the changes of up to the last \
+WRITE_BEHIND_FLUSH_INTERVAL_MS (at most WRITE_BEHIND_MAX_ITEMS words) are lost, \
+or of up to WRITE_BEHIND_MAX_FAILED_FLUSHES intervals if the flushes fail.
+"""
+
+import asyncio
+import logging
+import threading
+from collections.abc import Callable, Iterable
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from dictionary.config import config
+from dictionary.database import SessionLocal
+from dictionary.enums import MasterLevel
+from dictionary.queries import update_word_levels
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        flush_interval_ms: int,
+        max_items: int,
+        max_failed_flushes: int = 3,
+    ):
+        if flush_interval_ms <= 0:
+            raise ValueError("Flush interval must be greater than 0 ms.")
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_items = max_items
+        self.max_failed_flushes = max_failed_flushes
+        # The latest master level of each word since the last flush
+        self._pending: dict[int, MasterLevel] = {}
+        # Flushing runs in the thread pool, recording in the event loop
+        self._lock = threading.Lock()
+        # One flush at a time (the background one, on a full buffer or on stop)
+        self._flush_lock = threading.Lock()
+        self._failed_flushes = 0  # in a row
+        # Changes being written by the running flush and the words of them written
+        # directly in the meantime (not to be written or put back by the flush)
+        self._flushing: dict[int, MasterLevel] = {}
+        self._discarded: set[int] = set()
+        self._flush_requested: asyncio.Event | None = None
+        self._stopping = False
+        self._task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    @property
+    def failing(self) -> bool:
+        "Whether the last max_failed_flushes flushes failed (updates not buffered)."
+        return self._failed_flushes >= self.max_failed_flushes
+
+    async def record(self, word_id: int, master_level: MasterLevel) -> bool:
+        """Buffers the master level change of the word (the latest change wins).
+        Returns False if the buffer is failing - the change is not buffered and
+        has to be written directly by the caller."""
+        if self.failing:
+            self.discard([word_id])
+            return False
+
+        with self._lock:
+            self._pending[word_id] = master_level
+            size = len(self._pending)
+
+        if size >= self.max_items:
+            if self._flush_requested:
+                self._flush_requested.set()
+            else:
+                # The background flushing is not running (e.g. no lifespan)
+                await run_in_threadpool(self.flush)
+        return True
+
+    def discard(self, word_ids: Iterable[int]):
+        """Drops the buffered changes of the words - called by each direct write
+        of master levels before its commit, so a flush does not overwrite the
+        direct write with an older level (the latest change wins).
+        NOTE: The changes are dropped even if the direct write is rolled back."""
+        with self._lock:
+            for word_id in word_ids:
+                self._pending.pop(word_id, None)
+                if word_id in self._flushing:
+                    self._discarded.add(word_id)
+
+    def flush(self) -> list[int]:
+        """Writes all pending updates with one statement.
+        If writing fails, the updates are put back to the buffer (unless
+        overwritten by newer ones in the meantime).
+        Returns IDs of the updated words."""
+        with self._flush_lock:
+            return self._flush()
+
+    def _flush(self) -> list[int]:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flushing, self._discarded = pending, set()
+        if not pending:
+            # Nothing buffered is at risk (the failing updates were written
+            # directly) - buffering again
+            self._failed_flushes = 0
+            return []
+
+        try:
+            with self.session_factory() as db:
+                word_ids = self._update_levels(db, pending)
+                db.commit()
+        except Exception:
+            self._failed_flushes += 1
+            logger.exception(
+                "Flushing master levels of %s words failed (%s in a row) - updates "
+                "kept in buffer.",
+                len(pending),
+                self._failed_flushes,
+            )
+            with self._lock:
+                kept = {
+                    word_id: level
+                    for word_id, level in pending.items()
+                    if word_id not in self._discarded
+                }
+                self._pending = kept | self._pending
+                self._flushing = {}
+            if self.failing:
+                logger.error(
+                    "Write-behind buffer failing - updates are written directly."
+                )
+            return []
+
+        with self._lock:
+            self._flushing = {}
+        self._failed_flushes = 0
+        logger.debug(
+            "Master levels flushed: %s buffered, %s updated.",
+            len(pending),
+            len(word_ids),
+        )
+
+        return word_ids
+
+    def _update_levels(self, db: Session, pending: dict[int, MasterLevel]) -> list[int]:
+        """Updates the levels without the words written directly during the flush.
+        The updated rows stay locked until the commit - a direct write discarding
+        them after the last check waits for the flush and comes after it."""
+        while True:
+            word_ids = update_word_levels(db, pending)
+            with self._lock:
+                discarded = self._discarded.intersection(pending)
+            if not discarded:
+                return word_ids
+            db.rollback()
+            pending = {
+                word_id: level
+                for word_id, level in pending.items()
+                if word_id not in discarded
+            }
+
+    async def _run(self):
+        "Flushes the buffer every flush_interval (or sooner when it is full)."
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(
+                    self._flush_requested.wait(), timeout=self.flush_interval
+                )
+            except TimeoutError:
+                pass
+            self._flush_requested.clear()
+            await run_in_threadpool(self.flush)
+
+    async def start(self):
+        "Starts the background flushing (called on application startup)."
+        self._stopping = False
+        self._flush_requested = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stops the background flushing (waiting for the running flush) and
+        flushes the remaining updates."""
+        if self._task:
+            self._stopping = True
+            self._flush_requested.set()
+            await self._task
+        self._task = None
+        self._flush_requested = None
+        await run_in_threadpool(self.flush)
+
+
+write_behind = WriteBehindBuffer(
+    SessionLocal,
+    flush_interval_ms=config.WRITE_BEHIND_FLUSH_INTERVAL_MS,
+    max_items=config.WRITE_BEHIND_MAX_ITEMS,
+    max_failed_flushes=config.WRITE_BEHIND_MAX_FAILED_FLUSHES,
+)